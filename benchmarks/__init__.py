@@ -0,0 +1,7 @@
+"""
+Benchmarks for the skill-crypto-values hot paths.
+Each module can be run as a script from the
+repository root, e.g.:
+
+    python -m benchmarks.coin_details
+"""
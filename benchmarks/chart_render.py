@@ -0,0 +1,111 @@
+"""
+Micro-benchmark of the image chart backend. It
+compares the previous pyplot code, which created a new
+figure for every chart and never closed it, with
+ImageRenderer, which reuses one figure template.
+It reports renders per second and the resident
+memory of the process after each batch of renders.
+
+The previous code leaks every figure, so it is run for
+fewer renders (--legacy-renders) by default.
+"""
+import io
+import time
+import argparse
+import matplotlib
+
+matplotlib.use('agg')
+
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+import matplotlib.ticker as ticker
+
+from skill.chart import ImageRenderer
+from skill.series import PriceSeries
+from benchmarks.coin_details import make_records
+
+
+def legacy_render(title, series):
+    """
+    Previous implementation of the image backend,
+    writing to a buffer instead of a file.
+    """
+    plt.figure(figsize=(10, 6), dpi=100)
+    plt.plot(series.dates_as_datetimes(), series.close)
+    plt.gca().xaxis_date()
+    plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%b %d, %Y'))
+    plt.gca().yaxis.set_major_formatter(ticker.FormatStrFormatter("$%d"))
+    plt.title(title)
+    plt.xlabel("Dates")
+    plt.ylabel("US Dollars")
+    plt.xticks(rotation=10)
+    plt.grid(linestyle="dotted")
+
+    buffer = io.BytesIO()
+    plt.savefig(buffer, transparent=True, dpi=100)
+    return buffer.getvalue()
+
+
+def rss():
+    """
+    Resident memory of the process, in megabytes.
+    """
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+
+    import resource
+    return pages * resource.getpagesize() / 2**20
+
+
+def measure(render, series, renders, every):
+    """
+    Renders `renders` charts, printing the throughput
+    and memory after every `every` renders.
+
+    Returns
+    -------
+    tuple
+        Tuple of (renders per second, RSS growth in MB).
+    """
+    before = rss()
+    started = time.perf_counter()
+    for i in range(1, renders + 1):
+        render(f'Coin {i % 10} Overall Closing Prices', series[i % len(series)])
+        if i % every == 0:
+            print(f'    {i:6} renders  {i / (time.perf_counter() - started):7.1f} renders/s  '
+                  f'RSS {rss():8.1f} MB')
+
+    return renders / (time.perf_counter() - started), rss() - before
+
+
+def main():
+    """
+    Runs the benchmark and prints the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--renders', type=int, default=10000)
+    parser.add_argument('--legacy-renders', type=int, default=500)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--every', type=int, default=500)
+    args = parser.parse_args()
+
+    series = [
+        PriceSeries.from_records(make_records(args.days - offset))
+        for offset in range(0, 10)
+    ]
+
+    print(f'legacy pyplot code, {args.legacy_renders} renders:')
+    legacy, legacy_growth = measure(
+        legacy_render, series, args.legacy_renders, min(args.every, args.legacy_renders))
+
+    print(f'ImageRenderer, {args.renders} renders:')
+    renderer = ImageRenderer()
+    current, growth = measure(renderer.render, series, args.renders, args.every)
+
+    print(f'  legacy:         {legacy:8.1f} renders/s  RSS +{legacy_growth:.1f} MB')
+    print(f'  ImageRenderer:  {current:8.1f} renders/s  RSS +{growth:.1f} MB')
+    print(f'  speedup:        {current / legacy:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Regression benchmark for the per-coin work done by
+Crypto.text(). It compares the previous pipeline, which
+walked a list of records four times per coin, with
+Crypto._coin_details(), which uses a PriceSeries.
+
+CoinMarketCap and the charting backend are replaced by
+in-memory stand-ins so that only the CPU time spent
+preparing the data is measured.
+"""
+import time
+import argparse
+
+from datetime import datetime, timedelta
+from skill.skill import Crypto
+from skill.series import PriceSeries
+
+
+def make_records(days=90):
+    """
+    Creates records with the same shape as the previous
+    output of CoinMarketCap.historic().
+    """
+    start = datetime(2018, 1, 1)
+    series = []
+    for day in range(days):
+        close = 6000.0 + day
+        series.append({
+            'date': (start + timedelta(days=day)).strftime('%Y-%m-%d'),
+            'open': close - 10, 'high': close + 20, 'low': close - 20,
+            'close': close, 'volume': 1e9, 'market_cap': 1e11
+        })
+
+    return series
+
+
+class StaticCoinMarketCap:
+    """
+    Returns the same data for every coin.
+    """
+    def __init__(self, series):
+        self.series = series
+
+    def historic(self, coin, start=None):
+        return self.series
+
+
+class StaticChart:
+    """
+    Returns constant chart URLs and titles.
+    """
+    def generate(self, coin, data):
+        return 'http://example.com/chart.png'
+
+    def generate_title(self, coin, data):
+        return f'{coin} Closing Prices'
+
+
+def collect_coin_data(records, dates_as_strings=True):
+    """
+    Previous implementation of Crypto._collect_coin_data().
+    """
+    plot_data = {'date': [], 'close': []}
+    for record in records:
+
+        if dates_as_strings:
+            date = record['date']
+        else:
+            date = datetime.strptime(record['date'], '%Y-%m-%d')
+
+        plot_data['date'].append(date)
+        plot_data['close'].append(record['close'])
+
+    return plot_data
+
+
+def legacy_details(skill, coin, name):
+    """
+    Per-coin work of Crypto.text() before the series
+    was shared: four walks over the records, three of
+    them parsing every date.
+    """
+    def collect(**kwargs):
+        return collect_coin_data(skill.coin_market_cap.historic(coin), **kwargs)
+
+    skill.chart.generate(coin=name, data=collect(dates_as_strings=False))
+    skill.chart.generate(coin=name, data=collect(dates_as_strings=False))
+    skill.chart.generate_title(coin=name, data=collect(dates_as_strings=False))
+
+    return {'prices': collect()}
+
+
+def measure(function, repeat):
+    """
+    Returns the CPU time per call, in microseconds.
+    """
+    started = time.process_time()
+    for _ in range(repeat):
+        function()
+
+    return (time.process_time() - started) / repeat * 1e6
+
+
+def main():
+    """
+    Runs the benchmark and prints the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    #
+    #  Crypto() is created without running its
+    #  initialization, which fetches listings.
+    #
+    records = make_records(args.days)
+
+    legacy_skill = Crypto.__new__(Crypto)
+    legacy_skill.coin_market_cap = StaticCoinMarketCap(records)
+    legacy_skill.chart = StaticChart()
+
+    skill = Crypto.__new__(Crypto)
+    skill.coin_market_cap = StaticCoinMarketCap(PriceSeries.from_records(records))
+    skill.chart = StaticChart()
+
+    #
+    #  Prices are serialized once, as they are at the
+    #  API boundary, so both sides produce JSON lists.
+    #
+    legacy = measure(lambda: legacy_details(legacy_skill, 'bitcoin', 'Bitcoin'), args.repeat)
+    current = measure(
+        lambda: skill._coin_details('bitcoin', 'Bitcoin')['prices'].to_dict(), args.repeat)
+
+    print(f'Series of {args.days} days, {args.repeat} repetitions.')
+    print(f'  legacy pipeline:  {legacy:10.1f} us/coin')
+    print(f'  _coin_details():  {current:10.1f} us/coin')
+    print(f'  speedup:          {legacy / current:10.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Accuracy and throughput benchmark for coin detection.
+It replays the labeled datasets in `data/` through
+Crypto.regex_crypto_currency_finder() and through each
+matcher, and reports span precision and recall,
+documents per second, per-document latency and peak
+memory.
+
+Coins are read from the lexicon file when it exists,
+otherwise from CoinMarketCap.listings().
+"""
+import os
+import csv
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+
+from skill.skill import Crypto
+from skill.utils import SpanMetrics
+from skill.lexicon import Lexicon, load_lexicon
+from skill.matcher import CoinMatcher, RegexCoinMatcher
+from skill.coinmarketcap import CoinMarketCap
+
+DATASETS = ['data/all_coins_dataset.csv', 'data/hashtag_dataset.csv']
+
+
+def load_dataset(path):
+    """
+    Loads a labeled dataset, grouping the spans
+    of each sentence.
+
+    Parameters
+    ----------
+    path: str
+        Location of a CSV file with the columns `sentence`,
+        `cryptocurrency`, `span_start` and `span_stop` (or
+        `span_end`). Sentences without a cryptocurrency
+        are negative examples.
+
+    Returns
+    -------
+    list
+        List of (sentence, spans) tuples, where spans is a
+        set of (cryptocurrency, start, stop) tuples.
+    """
+    documents = {}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            row = {k.strip(): (v or '').strip() for k, v in row.items() if k}
+            spans = documents.setdefault(row['sentence'], set())
+            if row['cryptocurrency']:
+                stop = row.get('span_stop') or row.get('span_end')
+                spans.add((row['cryptocurrency'], int(row['span_start']), int(stop)))
+
+    return list(documents.items())
+
+
+def load_coins(path):
+    """
+    Loads the coins searched for by Crypto().
+    """
+    lexicon = Lexicon.load(path)
+    if lexicon is None:
+        lexicon = load_lexicon(CoinMarketCap.listings(), path)
+
+    return lexicon.coins
+
+
+def make_finders(coins):
+    """
+    Creates the detection functions to compare,
+    keyed by name.
+    """
+    names = [c['name'] for c in coins]
+    symbols = [c['symbol'] for c in coins]
+    slugs = [c['website_slug'] for c in coins]
+
+    #
+    #  Crypto() is created without running its
+    #  initialization, which fetches listings.
+    #
+    skill = Crypto.__new__(Crypto)
+    skill.charting_backend = 'image'
+    skill.matcher = CoinMatcher(names, symbols, slugs)
+
+    return {
+        'crypto': skill.regex_crypto_currency_finder,
+        'automaton': CoinMatcher(names, symbols, slugs, incremental=False).find,
+        'regex': RegexCoinMatcher(names, symbols, slugs).find
+    }
+
+
+def run(find, documents):
+    """
+    Runs a finder over all documents.
+
+    Returns
+    -------
+    tuple
+        Tuple of (predicted spans, latencies in seconds).
+    """
+    Crypto.regex_crypto_currency_finder.cache.clear()
+
+    predicted, latencies = [], []
+    for sentence, _ in documents:
+        started = time.perf_counter()
+        results = find(sentence)
+        latencies.append(time.perf_counter() - started)
+        predicted.append(SpanMetrics.spans(results))
+
+    return predicted, latencies
+
+
+def peak_memory(find, documents):
+    """
+    Peak memory allocated while running a finder
+    over all documents, in bytes. It is measured in a
+    separate pass, as tracing slows every allocation.
+    """
+    Crypto.regex_crypto_currency_finder.cache.clear()
+
+    tracemalloc.start()
+    for sentence, _ in documents:
+        find(sentence)
+
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def evaluate(find, documents):
+    """
+    Measures accuracy, throughput, latency and memory
+    of a finder over a dataset.
+    """
+    predicted, latencies = run(find, documents)
+    precision, recall, f1 = SpanMetrics.precision_recall(
+        predicted, [spans for _, spans in documents])
+
+    latencies = np.asarray(latencies)
+    return {
+        'documents': len(documents),
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'documents_per_second': len(documents) / latencies.sum(),
+        'p50_ms': float(np.percentile(latencies, 50) * 1e3),
+        'p99_ms': float(np.percentile(latencies, 99) * 1e3),
+        'peak_memory_kb': peak_memory(find, documents) / 1024
+    }
+
+
+def main():
+    """
+    Runs the benchmark and prints the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dataset', action='append',
+                        help='Labeled CSV file. Defaults to every dataset in data/.')
+    parser.add_argument('--finder', action='append', choices=['crypto', 'automaton', 'regex'],
+                        help='Finder to evaluate. Defaults to all of them.')
+    parser.add_argument('--lexicon', default=os.getenv('LEXICON_PATH', 'data/lexicon.json'))
+    parser.add_argument('--output', help='Writes the results as JSON to this file.')
+    args = parser.parse_args()
+
+    finders = make_finders(load_coins(args.lexicon))
+    selected = args.finder or list(finders)
+
+    results = []
+    for path in args.dataset or DATASETS:
+        documents = load_dataset(path)
+        print(f'{path}: {len(documents)} documents')
+        for name in selected:
+            result = dict(dataset=path, finder=name, **evaluate(finders[name], documents))
+            results.append(result)
+            print(f'  {name:10} precision {result["precision"]:.3f}  '
+                  f'recall {result["recall"]:.3f}  '
+                  f'{result["documents_per_second"]:9.0f} docs/s  '
+                  f'p50 {result["p50_ms"]:7.3f} ms  '
+                  f'p99 {result["p99_ms"]:7.3f} ms  '
+                  f'peak {result["peak_memory_kb"]:8.1f} KB')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Local stand-in for CoinMarketCap. It serves the
+`listings`, `ticker` and `historical-data` responses
+used by CoinMarketCap() from fixture files, with
+configurable latency and error injection, so that the
+full /detect path can be load-tested offline:
+
+    python -m benchmarks.fake_coinmarketcap --port 8765 --latency 0.05
+    COINMARKETCAP_API_URL=http://localhost:8765/v2 \\
+    COINMARKETCAP_URL=http://localhost:8765 python run.py
+
+Fixtures live in a directory with the layout:
+
+    listings.json                   /v2/listings/
+    ticker/<id>.json                /v2/ticker/<id>/
+    historical-data/<slug>.html     /currencies/<slug>/historical-data/
+
+Only `listings.json` is required. Tickers and
+historical-data pages without a fixture are generated
+from the listing; generated prices only depend on the
+coin and the day, so overlapping ranges agree. Real
+responses can be recorded with `--record`.
+"""
+import os
+import json
+import math
+import random
+import asyncio
+import argparse
+import requests
+
+from datetime import datetime, timedelta
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'coinmarketcap')
+
+
+class FakeCoinMarketCap:
+    """
+    Builds the responses served by the stand-in.
+
+    Parameters
+    ----------
+    path: str, default FIXTURES_PATH
+        Directory with the fixture files.
+    """
+    def __init__(self, path=FIXTURES_PATH):
+        self.path = path
+
+        with open(os.path.join(path, 'listings.json')) as f:
+            self.listings = json.load(f)
+
+        self.coins = {c['id']: c for c in self.listings['data']}
+        self.slugs = {c['website_slug']: c for c in self.listings['data']}
+
+    def _fixture(self, *parts):
+        """
+        Contents of a fixture file, or None
+        if it doesn't exist.
+        """
+        try:
+            with open(os.path.join(self.path, *parts), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def price(coin, day):
+        """
+        Deterministic closing price of a coin on a day.
+        """
+        base = 10000 / (1 + coin['id'] % 97)
+        noise = random.Random(coin['id'] * 1000003 + day.toordinal()).uniform(-0.02, 0.02)
+        return base * (1 + 0.2 * math.sin(day.toordinal() / 15 + coin['id']) + noise)
+
+    def ticker(self, coin_id):
+        """
+        Body of /v2/ticker/<id>/, or None
+        for unknown coins.
+        """
+        content = self._fixture('ticker', f'{coin_id}.json')
+        if content is not None:
+            return content
+
+        coin = self.coins.get(coin_id)
+        if coin is None:
+            return None
+
+        today = datetime.now().date()
+        price = self.price(coin, today)
+        change = 100 * (price / self.price(coin, today - timedelta(days=1)) - 1)
+        supply = 1e9 / (1 + coin['id'] % 97)
+        data = {
+            'data': dict(coin, **{
+                'rank': list(self.coins).index(coin_id) + 1,
+                'circulating_supply': supply,
+                'total_supply': supply,
+                'max_supply': None,
+                'quotes': {
+                    'USD': {
+                        'price': round(price, 2),
+                        'volume_24h': round(price * supply / 20, 2),
+                        'market_cap': round(price * supply, 2),
+                        'percent_change_1h': round(change / 24, 2),
+                        'percent_change_24h': round(change, 2),
+                        'percent_change_7d': round(change * 3, 2)
+                    }
+                },
+                'last_updated': int(datetime.now().timestamp())
+            }),
+            'metadata': {'timestamp': int(datetime.now().timestamp()), 'error': None}
+        }
+        return json.dumps(data).encode('utf-8')
+
+    def historical_data(self, slug, start, stop):
+        """
+        Body of /currencies/<slug>/historical-data/, or
+        None for unknown coins. Rows are in descending
+        date order, like the website.
+
+        Parameters
+        ----------
+        slug: str
+            Website slug of the coin.
+
+        start, stop: str
+            Dates in the format YYYYMMDD.
+        """
+        content = self._fixture('historical-data', f'{slug}.html')
+        if content is not None:
+            return content
+
+        coin = self.slugs.get(slug)
+        if coin is None:
+            return None
+
+        start, stop = (datetime.strptime(d, '%Y%m%d').date() for d in (start, stop))
+        stop = min(stop, datetime.now().date())
+
+        rows = []
+        day = stop
+        while day >= start:
+            close = self.price(coin, day)
+            opening = self.price(coin, day - timedelta(days=1))
+            cells = [
+                opening, max(opening, close) * 1.01, min(opening, close) * 0.99, close,
+                close * 1e6 / (1 + coin['id'] % 97), close * 1e8 / (1 + coin['id'] % 97)
+            ]
+            rows.append(
+                '<tr class="text-right"><td class="text-left">{}</td>{}</tr>'.format(
+                    day.strftime('%b %d, %Y'),
+                    ''.join(f'<td>{v:,.2f}</td>' for v in cells[:4]) +
+                    ''.join(f'<td>{v:,.0f}</td>' for v in cells[4:])))
+            day -= timedelta(days=1)
+
+        return (
+            '<html><body><div class="table-responsive"><table class="table"><thead><tr>'
+            '<th class="text-left">Date</th><th>Open*</th><th>High</th><th>Low</th>'
+            '<th>Close**</th><th>Volume</th><th>Market Cap</th></tr></thead><tbody>'
+            + ''.join(rows) +
+            '</tbody></table></div></body></html>').encode('utf-8')
+
+
+def create_app(fake, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, seed=None):
+    """
+    Creates the Sanic application of the stand-in.
+
+    Parameters
+    ----------
+    fake: FakeCoinMarketCap
+        Source of the responses.
+
+    latency, jitter: float, default 0
+        Every response is delayed by `latency` plus a
+        uniform random value up to `jitter` seconds.
+
+    error_rate: float, default 0
+        Fraction of requests answered with `error_status`.
+
+    error_status: int, default 500
+        HTTP status of injected errors.
+
+    seed: int, default None
+        Seed of the latency and error generator.
+    """
+    from sanic import Sanic
+    from sanic.response import json as json_response, raw
+
+    app = Sanic(__name__)
+    generator = random.Random(seed)
+    listings_content = json.dumps(fake.listings).encode('utf-8')
+
+    async def respond(content, content_type):
+        await asyncio.sleep(latency + generator.uniform(0, jitter))
+        if generator.random() < error_rate:
+            return json_response({'error': 'Injected error.'}, status=error_status)
+
+        if content is None:
+            return json_response({'data': None, 'metadata': {'error': 'id not found'}}, status=404)
+
+        return raw(content, content_type=content_type)
+
+    @app.route('/v2/listings/')
+    async def listings(request):
+        return await respond(listings_content, 'application/json')
+
+    @app.route('/v2/ticker/<coin_id:int>/')
+    async def ticker(request, coin_id):
+        return await respond(fake.ticker(coin_id), 'application/json')
+
+    @app.route('/currencies/<slug>/historical-data/')
+    async def historical_data(request, slug):
+        today = datetime.now().strftime('%Y%m%d')
+        content = fake.historical_data(
+            slug, request.args.get('start', today), request.args.get('end', today))
+        return await respond(content, 'text/html; charset=utf-8')
+
+    return app
+
+
+def record(path, coins, days=90):
+    """
+    Records responses of the service configured in
+    skill.coinmarketcap as fixtures.
+
+    Parameters
+    ----------
+    path: str
+        Directory to write the fixtures to.
+
+    coins: list of str
+        Website slugs of the coins whose tickers and
+        historical-data pages are recorded.
+
+    days: int, default 90
+        Number of days of the recorded pages.
+    """
+    from skill.coinmarketcap import API_URL, WEBSITE_URL
+
+    def save(content, *parts):
+        os.makedirs(os.path.join(path, *parts[:-1]), exist_ok=True)
+        with open(os.path.join(path, *parts), 'wb') as f:
+            f.write(content)
+
+    response = requests.get(f'{API_URL}/listings/')
+    response.raise_for_status()
+    save(response.content, 'listings.json')
+
+    listings = {c['website_slug']: c for c in response.json()['data']}
+    stop = datetime.now()
+    start = (stop - timedelta(days=days)).strftime('%Y%m%d')
+    for coin in coins:
+        response = requests.get(f"{API_URL}/ticker/{listings[coin]['id']}/")
+        save(response.content, 'ticker', f"{listings[coin]['id']}.json")
+
+        response = requests.get(
+            f"{WEBSITE_URL}/currencies/{coin}/historical-data/"
+            f"?start={start}&end={stop.strftime('%Y%m%d')}")
+        save(response.content, 'historical-data', f'{coin}.html')
+
+
+def main():
+    """
+    Starts the stand-in, or records fixtures.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--fixtures', default=FIXTURES_PATH)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds added to every response.')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Maximum random seconds added on top of --latency.')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests that fail.')
+    parser.add_argument('--error-status', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--record', nargs='+', metavar='SLUG',
+                        help='Records fixtures for these coins from the real service and exits.')
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.fixtures, args.record)
+        return
+
+    app = create_app(FakeCoinMarketCap(args.fixtures), latency=args.latency,
+                     jitter=args.jitter, error_rate=args.error_rate,
+                     error_status=args.error_status, seed=args.seed)
+    app.run(host=args.host, port=args.port, workers=args.workers, access_log=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark of the parser of historical-data pages. It
+compares the previous parser, which parsed every page
+three times (BeautifulSoup, then pandas.read_html on the
+first table, then a conversion of every date), with
+the single-pass _parse_historic().
+
+Pages are read from --pages (saved historical-data
+HTML files) or, by default, generated by the offline
+stand-in in benchmarks/fake_coinmarketcap.py.
+"""
+import os
+import glob
+import time
+import argparse
+import pandas as pd
+
+from io import StringIO
+from bs4 import BeautifulSoup
+from datetime import datetime, timedelta
+from skill.series import PriceSeries
+from skill.coinmarketcap import _parse_historic
+from benchmarks.fake_coinmarketcap import FakeCoinMarketCap
+
+
+def legacy_parse_historic(content):
+    """
+    Previous implementation of _parse_historic().
+    """
+    soup = BeautifulSoup(content, 'lxml')
+    table = soup.find_all('table')[0]
+    df = pd.read_html(StringIO(str(table)))[0]
+
+    df['Date'] = pd.to_datetime(df['Date'], format='%b %d, %Y')
+    df['Volume'] = pd.to_numeric(df['Volume'], errors='coerce')
+    df.columns = ['date', 'open', 'high', 'low', 'close', 'volume', 'market_cap']
+
+    return PriceSeries.from_frame(df)
+
+
+def load_pages(path=None, days=90):
+    """
+    Loads saved pages, or generates one page
+    per coin of the stand-in listing.
+    """
+    if path:
+        pages = []
+        for name in sorted(glob.glob(os.path.join(path, '*.html'))):
+            with open(name, 'rb') as f:
+                pages.append(f.read())
+
+        return pages
+
+    fake = FakeCoinMarketCap()
+    stop = datetime.now()
+    start = (stop - timedelta(days=days)).strftime('%Y%m%d')
+    return [fake.historical_data(slug, start, stop.strftime('%Y%m%d')) for slug in fake.slugs]
+
+
+def measure(function, pages, repeat):
+    """
+    Returns the wall time per page, in milliseconds.
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            function(page)
+
+    return (time.perf_counter() - started) / (repeat * len(pages)) * 1e3
+
+
+def main():
+    """
+    Runs the benchmark and prints the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', help='Directory with saved historical-data pages.')
+    parser.add_argument('--days', type=int, default=90,
+                        help='Days in each generated page.')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages, args.days)
+
+    #
+    #  Both parsers must return the same series
+    #  before their speed is compared.
+    #
+    for page in pages:
+        assert _parse_historic(page) == legacy_parse_historic(page)
+
+    legacy = measure(legacy_parse_historic, pages, args.repeat)
+    current = measure(_parse_historic, pages, args.repeat)
+
+    print(f'{len(pages)} pages, {args.repeat} repetitions.')
+    print(f'  legacy parser:      {legacy:8.2f} ms/page')
+    print(f'  _parse_historic():  {current:8.2f} ms/page')
+    print(f'  speedup:            {legacy / current:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Micro-benchmark of incremental detection. It builds an
+article from the sentences of a labeled dataset, one
+paragraph every few sentences, and simulates an editor
+saving drafts: every save changes one paragraph and
+scans the whole article again.
+
+It reports the time per save with and without chunk
+caching, and checks that both return the same results.
+"""
+import time
+import random
+import argparse
+
+from skill.matcher import CoinMatcher, chunks
+from benchmarks.detection import load_dataset, load_coins, DATASETS
+
+
+def make_article(sentences, paragraphs, sentences_per_paragraph):
+    """
+    Joins sentences into newline-separated paragraphs.
+    """
+    return [
+        ' '.join(random.choice(sentences) for _ in range(sentences_per_paragraph))
+        for _ in range(paragraphs)
+    ]
+
+
+def edit(article, sentences):
+    """
+    Returns a copy of an article with one
+    sentence appended to a random paragraph.
+    """
+    article = list(article)
+    i = random.randrange(len(article))
+    article[i] = f'{article[i]} {random.choice(sentences)}'
+    return article
+
+
+def measure(matcher, drafts):
+    """
+    Scans every draft.
+
+    Returns
+    -------
+    tuple
+        Tuple of (milliseconds per draft, results).
+    """
+    started = time.perf_counter()
+    results = [matcher.find(draft) for draft in drafts]
+    return (time.perf_counter() - started) * 1000 / len(drafts), results
+
+
+def main():
+    """
+    Runs the benchmark and prints the results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dataset', default=DATASETS[0])
+    parser.add_argument('--lexicon', default='data/lexicon.json')
+    parser.add_argument('--paragraphs', type=int, default=40)
+    parser.add_argument('--sentences', type=int, default=4)
+    parser.add_argument('--saves', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    coins = load_coins(args.lexicon)
+    names = [c['name'] for c in coins]
+    symbols = [c['symbol'] for c in coins]
+    slugs = [c['website_slug'] for c in coins]
+
+    sentences = [sentence for sentence, _ in load_dataset(args.dataset)]
+    article = make_article(sentences, args.paragraphs, args.sentences)
+    drafts = []
+    for _ in range(args.saves):
+        article = edit(article, sentences)
+        drafts.append('\n\n'.join(article))
+
+    full, expected = measure(CoinMatcher(names, symbols, slugs, incremental=False), drafts)
+
+    chunks.clear()
+    incremental, results = measure(CoinMatcher(names, symbols, slugs), drafts)
+    assert results == expected, 'Incremental results differ from full scans.'
+
+    stats = chunks.stats()
+    print(f'article: {len(drafts[-1])} characters, {args.paragraphs} paragraphs, '
+          f'{args.saves} saves')
+    print(f'  full scan:    {full:8.2f} ms per save')
+    print(f'  incremental:  {incremental:8.2f} ms per save '
+          f'({stats["hits"]} chunks reused, {stats["misses"]} scanned)')
+    print(f'  speedup:      {full / incremental:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+"""
+End-to-end HTTP load test of the API. It drives
+/status, /detect and /detect/batch at controlled
+concurrency, over articles of different sizes and
+different `limit` values, and records throughput and
+latency histograms for each scenario.
+
+By default a server is started with `run.py` for every
+combination of --workers and --compress. Use --url to
+test a server that is already running instead. To run
+offline, start benchmarks/fake_coinmarketcap.py and
+pass its URLs with --coinmarketcap-api-url and
+--coinmarketcap-url.
+
+Results are written as JSON to --output.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import itertools
+import subprocess
+import aiohttp
+import requests
+import numpy as np
+
+from datetime import datetime
+from skill.metadata import __version__
+
+#
+#  Upper bounds of the latency histogram
+#  buckets, in milliseconds.
+#
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf'))
+
+ROUTES = ('status', 'detect', 'batch')
+
+
+def make_article(size, path='data/all_coins_dataset.csv'):
+    """
+    Creates an article of about `size` characters by
+    joining the sentences of a labeled dataset.
+    """
+    with open(path, newline='') as f:
+        sentences = [row['sentence'] for row in csv.DictReader(f)]
+
+    words, length = [], 0
+    for sentence in itertools.cycle(sentences):
+        if length >= size:
+            break
+
+        words.append(sentence)
+        length += len(sentence) + 1
+
+    return ' '.join(words)[:size]
+
+
+def make_request(route, article=None, limit=None, batch_size=10):
+    """
+    Method, path and JSON body of a request.
+    """
+    if route == 'status':
+        return 'GET', '/status', None
+
+    if route == 'detect':
+        return 'POST', '/detect', {'text': article, 'limit': limit}
+
+    documents = [{'id': str(i), 'text': article, 'limit': limit} for i in range(batch_size)]
+    return 'POST', '/detect/batch', {'documents': documents}
+
+
+class Histogram:
+    """
+    Latency histogram with fixed buckets.
+
+    Parameters
+    ----------
+    bounds: tuple, default BUCKETS
+        Upper bounds of the buckets, in milliseconds.
+    """
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+
+    def add(self, value):
+        """
+        Counts a latency, in milliseconds.
+        """
+        self.counts[int(np.searchsorted(self.bounds, value))] += 1
+
+    def to_dict(self):
+        """
+        Bucket bounds and counts, as JSON.
+        """
+        return {
+            'le': [b if b != float('inf') else '+Inf' for b in self.bounds],
+            'counts': self.counts
+        }
+
+
+async def drive(url, request, concurrency, total):
+    """
+    Sends `total` copies of a request, with at most
+    `concurrency` of them in flight.
+
+    Returns
+    -------
+    dict
+        Throughput, latency percentiles, histogram,
+        error count and mean response size.
+    """
+    method, path, body = request
+    data = json.dumps(body) if body is not None else None
+    headers = {'Content-Type': 'application/json'}
+
+    latencies, sizes, errors = [], [], 0
+    histogram = Histogram()
+    remaining = iter(range(total))
+
+    async def worker(session):
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                async with session.request(method, url + path, data=data,
+                                           headers=headers) as response:
+                    content = await response.read()
+                    if response.status != 200:
+                        errors += 1
+
+                    sizes.append(int(response.headers.get('Content-Length', len(content))))
+            except aiohttp.ClientError:
+                errors += 1
+
+            elapsed = (time.perf_counter() - started) * 1e3
+            latencies.append(elapsed)
+            histogram.add(elapsed)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*[worker(session) for _ in range(concurrency)])
+        duration = time.perf_counter() - started
+
+    latencies = np.asarray(latencies)
+    return {
+        'requests': total,
+        'errors': errors,
+        'duration_s': duration,
+        'requests_per_second': total / duration,
+        'latency_ms': {
+            'mean': float(latencies.mean()),
+            'p50': float(np.percentile(latencies, 50)),
+            'p90': float(np.percentile(latencies, 90)),
+            'p99': float(np.percentile(latencies, 99)),
+            'max': float(latencies.max())
+        },
+        'histogram_ms': histogram.to_dict(),
+        'response_bytes': float(np.mean(sizes)) if sizes else 0.0
+    }
+
+
+class ServerProcess:
+    """
+    Runs `run.py` in a subprocess for the duration
+    of a `with` block.
+
+    Parameters
+    ----------
+    port: int
+        Port to listen to.
+
+    workers: int
+        Number of Sanic workers.
+
+    compress: bool
+        If responses are compressed.
+
+    environment: dict, default None
+        Extra environment variables.
+
+    startup_timeout: float, default 120
+        Seconds to wait for /status to answer.
+    """
+    def __init__(self, port, workers, compress, environment=None, startup_timeout=120):
+        self.url = f'http://127.0.0.1:{port}'
+        self.environment = dict(os.environ, **(environment or {}))
+        self.environment.update({
+            'HOST': '127.0.0.1',
+            'PORT': str(port),
+            'WORKERS': str(workers),
+            'COMPRESS': 'true' if compress else 'false',
+            'ACCESS_LOG': 'false'
+        })
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, 'run.py'], env=self.environment,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        deadline = time.time() + self.startup_timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('Server exited during startup.')
+            try:
+                if requests.get(self.url + '/status', timeout=1).ok:
+                    return self
+            except requests.RequestException:
+                time.sleep(0.5)
+
+        self.__exit__()
+        raise RuntimeError(f'Server did not start in {self.startup_timeout} seconds.')
+
+    def __exit__(self, *args):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def scenarios(args):
+    """
+    Yields (route, size, limit, concurrency) tuples.
+    Sizes and limits don't apply to /status.
+    """
+    for route in args.routes:
+        sizes = [None] if route == 'status' else args.sizes
+        limits = [None] if route == 'status' else args.limits
+        for size, limit, concurrency in itertools.product(sizes, limits, args.concurrency):
+            yield route, size, limit, concurrency
+
+
+def run_scenarios(url, args, settings):
+    """
+    Runs every scenario against a server.
+
+    Parameters
+    ----------
+    url: str
+        Base URL of the server.
+
+    settings: dict
+        Server settings, stored with each result.
+    """
+    loop = asyncio.get_event_loop()
+    articles = {size: make_article(size) for size in args.sizes}
+
+    results = []
+    for route, size, limit, concurrency in scenarios(args):
+        request = make_request(route, articles.get(size), limit, args.batch_size)
+
+        #
+        #  Warm-up requests fill the caches, so that the
+        #  measurements reflect steady-state serving.
+        #
+        loop.run_until_complete(drive(url, request, concurrency, args.warmup))
+        result = loop.run_until_complete(drive(url, request, concurrency, args.requests))
+
+        result.update(settings, route=route, article_size=size, limit=limit,
+                      concurrency=concurrency)
+        results.append(result)
+        print(f"  {route:7} size={str(size):6} limit={str(limit):4} "
+              f"concurrency={concurrency:<4} {result['requests_per_second']:8.1f} req/s  "
+              f"p50 {result['latency_ms']['p50']:8.1f} ms  "
+              f"p99 {result['latency_ms']['p99']:8.1f} ms  "
+              f"errors {result['errors']}")
+
+    return results
+
+
+def main():
+    """
+    Runs the load test and writes the results.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Tests a running server instead of starting one.')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--compress', choices=['on', 'off'], nargs='+', default=['on', 'off'])
+    parser.add_argument('--routes', choices=ROUTES, nargs='+', default=list(ROUTES))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 5000, 50000],
+                        help='Article sizes, in characters.')
+    parser.add_argument('--limits', type=int, nargs='+', default=[1, 3, 10])
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Requests measured per scenario.')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--coinmarketcap-api-url')
+    parser.add_argument('--coinmarketcap-url')
+    parser.add_argument('--output', default='load-results.json')
+    args = parser.parse_args()
+
+    environment = {}
+    if args.coinmarketcap_api_url:
+        environment['COINMARKETCAP_API_URL'] = args.coinmarketcap_api_url
+    if args.coinmarketcap_url:
+        environment['COINMARKETCAP_URL'] = args.coinmarketcap_url
+
+    results = []
+    if args.url:
+        print(args.url)
+        results.extend(run_scenarios(args.url, args, {'workers': None, 'compress': None}))
+    else:
+        for workers, compress in itertools.product(args.workers, args.compress):
+            print(f'WORKERS={workers} COMPRESS={compress}')
+            with ServerProcess(args.port, workers, compress == 'on', environment) as server:
+                settings = {'workers': workers, 'compress': compress == 'on'}
+                results.extend(run_scenarios(server.url, args, settings))
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'version': __version__,
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'parameters': vars(args),
+            'results': results
+        }, f, indent=2)
+
+    print(f'Results written to {args.output}.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+Script that builds the coin lexicon used by
+Crypto() from the current CoinMarketCap listings
+and saves it as JSON. Names already present in an
+existing lexicon are not looked up in WordNet again.
+
+Usage:
+
+    python bin/build_lexicon.py [path]
+"""
+import os
+import sys
+
+repository_directory = os.path.dirname(os.path.realpath(__file__)).replace('bin', '')
+sys.path.append(repository_directory)
+
+from skill.coinmarketcap import CoinMarketCap
+from skill.lexicon import Lexicon, fingerprint
+
+path = sys.argv[1] if len(sys.argv) > 1 else os.getenv('LEXICON_PATH', 'data/lexicon.json')
+
+coins = CoinMarketCap.listings()
+previous = Lexicon.load(path)
+if previous is not None and previous.fingerprint == fingerprint(coins):
+    print(f'Lexicon at {path} is up to date.')
+else:
+    lexicon = Lexicon.build(coins, previous=previous)
+    lexicon.save(path)
+    print(f'Saved lexicon with {len(lexicon.coins)} of {len(lexicon)} coins to {path}.')
@@ -7,16 +7,38 @@ import os
 from skill.api.server import Server
 
 
+def flag(name, default=True):
+    """
+    Reads a boolean environment variable.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+
+    return value.lower() not in ('0', 'false', 'no', 'off')
+
 
 def main():
     """
     Wrapper function for starting a server.
     """
     print('Starting server.')
-    server = Server()
-    
+    server = Server(compress=flag('COMPRESS'))
+
     workers = int(os.getenv('WORKERS', 1))
-    server.run(host=os.getenv('HOST', '0.0.0.0'), access_log=True, workers=workers)
+
+    #
+    #  With more than one worker, caches are shared
+    #  through a local SQLite file and charts through
+    #  a local directory, unless other backends
+    #  are configured.
+    #
+    if workers > 1:
+        os.environ.setdefault('CACHE_BACKEND', 'sqlite')
+        os.environ.setdefault('ARTIFACT_STORE', 'directory')
+
+    server.run(host=os.getenv('HOST', '0.0.0.0'), port=int(os.getenv('PORT', 8000)),
+               access_log=flag('ACCESS_LOG'), workers=workers)
 
 if __name__ == '__main__':
     main()
@@ -2,14 +2,71 @@
 Creates public API methods. 
 """
 import os
+import time
+import asyncio
 import requests
 
 from skill import Crypto
+from skill.refresher import Refresher
+from skill.profiling import RequestProfiler
+from skill.artifacts import default_store
+from skill import metrics
+from skill.metrics import Histogram, STAGE_SECONDS
 from skill.metadata import (__version__, __release_date__, __skill_name__, 
                             __skill_description__)
 
 from sanic import response
-from sanic.response import json
+from sanic.response import json, json_dumps, stream, raw
+
+#
+#  Duration of requests, by route and status.
+#
+REQUEST_SECONDS = Histogram(
+    'http_request_seconds', 'Duration of HTTP requests.', labels=('route', 'status'))
+
+
+def route_name(request, status):
+    """
+    Label of a request in the request metrics. Charts
+    share one label, and paths without a route are
+    grouped, so that labels stay few.
+    """
+    if request.path.startswith('/charts/'):
+        return '/charts/<name>'
+    if status == 404:
+        return 'other'
+
+    return request.path
+
+
+def encode(payload, status=200):
+    """
+    JSON response whose encoding time is
+    recorded as the `encode` stage.
+    """
+    with STAGE_SECONDS.time(stage='encode'):
+        body = json_dumps(payload)
+
+    return response.HTTPResponse(body, status=status, content_type='application/json')
+
+
+def serialize(results):
+    """
+    Converts the price series of skill results
+    into JSON-serializable lists.
+
+    Parameters
+    ----------
+    results: list
+        Output of Crypto().text().
+
+    Returns
+    -------
+    list
+        Same results, with `prices` as a dictionary
+        of `date` and `close` lists.
+    """
+    return [{**result, 'prices': result['prices'].to_dict()} for result in results]
 
 
 def create_routes(app):
@@ -35,7 +92,37 @@ def create_routes(app):
         starts.
         """
         app.skill = Crypto(charting_backend=os.getenv('CHARTING_BACKEND', 'plotly'))
-        
+        app.refresher = Refresher(app.skill)
+        app.refresher.start(loop)
+        app.profiler = RequestProfiler()
+
+    @app.middleware('request')
+    async def start_timer(request):
+        """
+        Records when a request started.
+        """
+        request['started'] = time.perf_counter()
+
+    @app.middleware('response')
+    async def stop_timer(request, response):
+        """
+        Observes the duration of a request.
+        """
+        started = request.get('started')
+        if started is not None:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                route=route_name(request, response.status), status=response.status)
+
+    @app.listener('after_server_stop')
+    async def close_skill(app, loop):
+        """
+        Stops the refresher and closes the skill
+        connection pool after the server stops.
+        """
+        await app.refresher.stop()
+        await app.skill.async_coin_market_cap.close()
+
     @app.route('/')
     @app.route('/status')
     async def index(request):
@@ -66,6 +153,27 @@ def create_routes(app):
         }
         return json(r)
     
+    async def detect(text, limit, findings=None):
+        """
+        Runs the skill on a text and serializes
+        its results.
+        """
+        results = await app.skill.text_async(text=text, limit=limit, findings=findings)
+        app.refresher.track(results)
+        with STAGE_SECONDS.time(stage='serialize'):
+            return serialize(results)
+
+    async def profiled_detect(text, limit):
+        """
+        Same as detect(), but the text is scanned in
+        full, without the finder and chunk caches, so
+        that the profile shows the matcher itself.
+        """
+        with STAGE_SECONDS.time(stage='find'):
+            findings = app.skill.matcher.find(text, incremental=False)
+
+        return await detect(text, limit, findings)
+
     @app.route('/detect', methods=['GET', 'POST', 'OPTIONS'])
     async def estimate(request):
         """
@@ -83,10 +191,14 @@ def create_routes(app):
         Returns
         -------
         JSON with the summarization results. Results also
-        include a list of keywords.
+        include a list of keywords. Requests sending the
+        PROFILE_TOKEN in the `X-Profile` header or in the
+        `profile` query parameter are profiled, and the
+        JSON includes the profile under `profile`.
         """
         
         status = None
+        profile = None
         if request.method == 'GET':
             success = False
             results = []
@@ -115,7 +227,11 @@ def create_routes(app):
 
             else:
                 try:
-                    results = app.skill.text(text=text, limit=limit)
+                    if app.profiler.requested(request):
+                        results, profile = await app.profiler.run(
+                            lambda: profiled_detect(text, limit))
+                    else:
+                        results = await detect(text, limit)
                     message = 'Searched `text` data successfully.'
                     success = True
                 except (ValueError, KeyError) as e:
@@ -124,9 +240,149 @@ def create_routes(app):
                     message = e
                     success = False
 
+        payload = {
+            'success': success,
+            'message': message,
+            'results': results
+        }
+        if profile is not None:
+            payload['profile'] = profile
+
+        return encode(payload, status=status or 200)
+
+    @app.route('/detect/batch', methods=['POST', 'OPTIONS'])
+    async def estimate_batch(request):
+        """
+        Produces estimates for many documents in
+        a single request.
+
+        Parameters
+        ----------
+        documents: list
+            List of objects with the keys `id`, `text`
+            and, optionally, `limit` (default 3).
+
+        Returns
+        -------
+        JSON with results keyed by document ID. If the request
+        sends `Accept: application/x-ndjson`, results are
+        streamed instead: one JSON line per document, written
+        as soon as that document is ready.
+        """
+        status = None
+        if request.method == 'OPTIONS':
+            success = True
+            results = {}
+            message = 'Endpoint accepts CORS request.'
+
+        elif not request.json:
+            success = False
+            results = {}
+            message = 'Make request with JSON object.'
+            status = 400
+
+        else:
+            documents = request.json.get('documents')
+            if not documents or not isinstance(documents, list):
+                success = False
+                results = {}
+                message = 'Provide a `documents` list.'
+                status = 400
+
+            elif not all(isinstance(d, dict) and 'id' in d and d.get('text')
+                         for d in documents):
+                success = False
+                results = {}
+                message = 'Every document needs an `id` and a `text` parameter.'
+                status = 400
+
+            elif 'application/x-ndjson' in request.headers.get('accept', ''):
+
+                async def write_results(response):
+                    try:
+                        async for document_id, results in app.skill.iter_batch_async(documents):
+                            line = {'id': document_id, 'results': serialize(results)}
+                            response.write(json_dumps(line) + '\n')
+
+                            #
+                            #  Lets other requests run between
+                            #  documents whose charts are ready.
+                            #
+                            await asyncio.sleep(0)
+                    except (ValueError, KeyError) as e:
+                        line = {'success': False, 'message': str(e)}
+                        response.write(json_dumps(line) + '\n')
+
+                return stream(write_results, content_type='application/x-ndjson')
+
+            else:
+                try:
+                    results = {
+                        document_id: serialize(document_results)
+                        for document_id, document_results in (
+                            await app.skill.batch_async(documents)).items()
+                    }
+                    message = 'Searched {} documents successfully.'.format(len(documents))
+                    success = True
+                except (ValueError, KeyError) as e:
+                    status = 400
+                    results = {}
+                    message = str(e)
+                    success = False
+
         payload = {
             'success': success,
             'message': message,
             'results': results
         }
         return json(payload, status=status or 200)
+
+    @app.route('/charts/<name>')
+    async def chart(request, name):
+        """
+        Serves a chart from the artifact store. Charts
+        are addressed by the digest of their contents,
+        so they never change and clients may cache
+        them for as long as they want.
+
+        Parameters
+        ----------
+        name: str
+            Digest of the chart, followed by `.png`.
+
+        Returns
+        -------
+        PNG image, or JSON with an error if the chart
+        is not in the store.
+        """
+        key = name[:-len('.png')] if name.endswith('.png') else name
+        content = default_store().get(key)
+        if content is None:
+            payload = {
+                'success': False,
+                'message': f'Chart `{name}` not found.'
+            }
+            return json(payload, status=404)
+
+        headers = {
+            'ETag': f'"{key}"',
+            'Cache-Control': 'public, max-age=31536000, immutable'
+        }
+        if request.headers.get('if-none-match') in (f'"{key}"', key, '*'):
+            return raw(b'', status=304, headers=headers)
+
+        return raw(content, content_type='image/png', headers=headers)
+
+    @app.route('/metrics')
+    async def export_metrics(request):
+        """
+        Exports the metrics of the worker process in
+        the Prometheus text format.
+
+        Returns
+        -------
+        Text with stage and request durations, cache
+        counters, upstream requests and chart renders.
+        """
+        return response.text(metrics.render(),
+                             content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,243 @@
+"""
+Content-addressed stores for rendered charts.
+
+The store is selected with the `ARTIFACT_STORE`
+environment variable:
+
+    memory:     bytes kept in the process (default).
+    directory:  files in a local directory, shared by
+                the worker processes of a host.
+"""
+import os
+import re
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+
+#
+#  Artifacts are addressed by their SHA-1 hash. Keys
+#  coming from requests are checked against it before
+#  they are used in paths.
+#
+KEY = re.compile(r'^[0-9a-f]{40}$')
+
+
+def digest(content):
+    """
+    SHA-1 hash of an artifact, used as its address.
+    """
+    return hashlib.sha1(content).hexdigest()
+
+
+class MemoryArtifactStore:
+    """
+    Keeps artifacts in memory. When their total size
+    goes over `max_bytes`, the least recently used
+    ones are evicted.
+
+    Parameters
+    ----------
+    max_bytes: int, default os.getenv('ARTIFACT_MAX_BYTES', 128 MB)
+        Maximum total size of the artifacts.
+    """
+    def __init__(self, max_bytes=int(os.getenv('ARTIFACT_MAX_BYTES', 128 * 2**20))):
+        self.max_bytes = max_bytes
+        self.size = 0
+
+        self._artifacts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._artifacts)
+
+    def __contains__(self, key):
+        return key in self._artifacts
+
+    def put(self, content):
+        """
+        Stores an artifact.
+
+        Parameters
+        ----------
+        content: bytes
+            Contents of the artifact.
+
+        Returns
+        -------
+        str
+            Digest of the artifact.
+        """
+        key = digest(content)
+        with self._lock:
+            if key not in self._artifacts:
+                self._artifacts[key] = content
+                self.size += len(content)
+
+            self._artifacts.move_to_end(key)
+            while self.size > self.max_bytes and len(self._artifacts) > 1:
+                _, evicted = self._artifacts.popitem(last=False)
+                self.size -= len(evicted)
+
+        return key
+
+    def get(self, key):
+        """
+        Returns the contents of an artifact,
+        or None if it is missing.
+        """
+        with self._lock:
+            content = self._artifacts.get(key)
+            if content is not None:
+                self._artifacts.move_to_end(key)
+
+        return content
+
+
+class DirectoryArtifactStore:
+    """
+    Keeps artifacts as files named after their digest.
+    Files are written atomically, so concurrent workers
+    writing the same artifact never see partial files.
+    When the total size goes over `max_bytes`, the
+    least recently written files are deleted.
+
+    Parameters
+    ----------
+    path: str, default os.getenv('ARTIFACT_PATH', 'data/charts')
+        Directory of the artifacts. It is
+        created on first use.
+
+    max_bytes: int, default os.getenv('ARTIFACT_MAX_BYTES', 128 MB)
+        Maximum total size of the artifacts.
+    """
+    def __init__(self, path=os.getenv('ARTIFACT_PATH', 'data/charts'),
+                 max_bytes=int(os.getenv('ARTIFACT_MAX_BYTES', 128 * 2**20))):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = None
+
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._files())
+
+    def __contains__(self, key):
+        return bool(KEY.match(key)) and os.path.exists(self._location(key))
+
+    def _location(self, key):
+        """
+        Location of the file of an artifact.
+        """
+        if not KEY.match(key):
+            raise ValueError(f'Invalid artifact key `{key}`.')
+
+        return os.path.join(self.path, key[:2], key)
+
+    def _files(self):
+        """
+        List of (modified time, size, location)
+        tuples of all artifacts.
+        """
+        files = []
+        for directory, _, names in os.walk(self.path):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue
+
+                location = os.path.join(directory, name)
+                try:
+                    stat = os.stat(location)
+                except OSError:
+                    continue
+
+                files.append((stat.st_mtime, stat.st_size, location))
+
+        return files
+
+    def _evict(self):
+        """
+        Deletes the oldest files until the store
+        fits within `max_bytes`.
+        """
+        files = sorted(self._files())
+        self.size = sum(size for _, size, _ in files)
+        for _, size, location in files[:-1]:
+            if self.size <= self.max_bytes:
+                break
+
+            try:
+                os.remove(location)
+            except OSError:
+                pass
+
+            self.size -= size
+
+    def put(self, content):
+        """
+        Stores an artifact. See MemoryArtifactStore.put().
+        """
+        key = digest(content)
+        location = self._location(key)
+        with self._lock:
+            if os.path.exists(location):
+                os.utime(location)
+                return key
+
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            temporary = f'{location}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temporary, 'wb') as f:
+                f.write(content)
+
+            os.replace(temporary, location)
+
+            if self.size is None:
+                self._evict()
+            else:
+                self.size += len(content)
+                if self.size > self.max_bytes:
+                    self._evict()
+
+        return key
+
+    def get(self, key):
+        """
+        Returns the contents of an artifact,
+        or None if it is missing.
+        """
+        try:
+            with open(self._location(key), 'rb') as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+
+def create_store(name=None):
+    """
+    Creates the artifact store named by
+    `name` or ARTIFACT_STORE.
+    """
+    name = name or os.getenv('ARTIFACT_STORE', 'memory')
+    if name == 'memory':
+        return MemoryArtifactStore()
+    if name == 'directory':
+        return DirectoryArtifactStore()
+
+    raise ValueError(f'Artifact store `{name}` not available.')
+
+
+_store = None
+
+
+def default_store():
+    """
+    Artifact store shared by the charts and
+    the routes of a process.
+    """
+    global _store
+
+    if _store is None:
+        _store = create_store()
+
+    return _store
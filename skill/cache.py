@@ -0,0 +1,766 @@
+"""
+Bounded caches used to memoize the expensive
+methods of the skill.
+
+The storage backend is selected with the CACHE_BACKEND
+environment variable:
+
+    memory  In-process LRU storage (default).
+    sqlite  SQLite file at CACHE_PATH, shared by all
+            worker processes on the same host.
+    redis   Redis server at CACHE_URL, shared by all
+            workers and hosts. Needs the `redis` package.
+"""
+import os
+import time
+import pickle
+import asyncio
+import sqlite3
+import hashlib
+import inspect
+import threading
+import functools
+
+from collections import OrderedDict
+
+#
+#  Keys longer than this (e.g. whole articles) are
+#  replaced by a hash of their content.
+#
+MAX_KEY_LENGTH = 256
+
+#
+#  Default returned by Cache.get() for missing keys
+#  when None is a legitimate cached value.
+#
+MISSING = object()
+
+#
+#  Every cache created, by namespace.
+#  Used for reporting statistics.
+#
+registry = {}
+
+
+class MemoryBackend:
+    """
+    In-process storage with least-recently-used
+    eviction.
+
+    Parameters
+    ----------
+    maxsize: int, default 1024
+        Maximum number of entries. The least
+        recently used entry is evicted when
+        a new one doesn't fit.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """
+        Returns a (value, expires) tuple or
+        None if the key is missing.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+
+            return entry
+
+    def set(self, key, value, expires):
+        """
+        Stores a value until the `expires` timestamp.
+
+        Returns
+        -------
+        int
+            Number of entries evicted to make room.
+        """
+        evicted = 0
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+
+        return evicted
+
+    def delete(self, key):
+        """
+        Removes a key, if present.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """
+        Removes all keys.
+        """
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteBackend:
+    """
+    Storage in a SQLite file that can be shared by
+    several processes. Values are pickled. Entries are
+    evicted by least recent use once a namespace has
+    more than `maxsize` entries.
+
+    Reads only write to the database when the access
+    time of an entry is older than `touch_after`, so
+    that cache hits of concurrent workers don't queue
+    for the write lock.
+
+    Parameters
+    ----------
+    namespace: str
+        Namespace of the entries stored by
+        this backend.
+
+    path: str, default os.getenv('CACHE_PATH', 'data/cache.sqlite')
+        Location of the SQLite database.
+
+    maxsize: int, default 1024
+        Maximum number of entries in the namespace.
+
+    touch_after: float, default 60
+        Seconds after which a read updates the access
+        time of an entry. Recency is only tracked with
+        this precision.
+    """
+    def __init__(self, namespace, path=os.getenv('CACHE_PATH', 'data/cache.sqlite'),
+                 maxsize=1024, touch_after=60):
+        self.namespace = namespace
+        self.path = path
+        self.maxsize = maxsize
+        self.touch_after = touch_after
+
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """
+        SQLite connection, opened on first use so that
+        every worker process opens its own.
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB,
+                    expires REAL,
+                    accessed REAL,
+                    PRIMARY KEY (namespace, key)
+                )""")
+            connection.execute("""
+                CREATE INDEX IF NOT EXISTS cache_accessed
+                ON cache (namespace, accessed)""")
+            connection.commit()
+            self._connection = connection
+
+        return self._connection
+
+    def __len__(self):
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT COUNT(*) FROM cache WHERE namespace = ?',
+                (self.namespace,)).fetchone()
+
+        return row[0]
+
+    def get(self, key):
+        """
+        Returns a (value, expires) tuple or
+        None if the key is missing.
+        """
+        with self._lock, self.connection as connection:
+            row = connection.execute(
+                'SELECT value, expires, accessed FROM cache WHERE namespace = ? AND key = ?',
+                (self.namespace, key)).fetchone()
+            if row is None:
+                return None
+
+            now = time.time()
+            if row[2] is None or now - row[2] >= self.touch_after:
+                connection.execute(
+                    'UPDATE cache SET accessed = ? WHERE namespace = ? AND key = ?',
+                    (now, self.namespace, key))
+
+        return pickle.loads(row[0]), row[1]
+
+    def set(self, key, value, expires):
+        """
+        Stores a value until the `expires` timestamp.
+
+        Returns
+        -------
+        int
+            Number of entries evicted to make room.
+        """
+        value = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock, self.connection as connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, value, expires, time.time()))
+            size = connection.execute(
+                'SELECT COUNT(*) FROM cache WHERE namespace = ?',
+                (self.namespace,)).fetchone()[0]
+            if size <= self.maxsize:
+                return 0
+
+            evicted = connection.execute("""
+                DELETE FROM cache WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache WHERE namespace = ?
+                    ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )""", (self.namespace, self.namespace, self.maxsize)).rowcount
+
+        return evicted
+
+    def delete(self, key):
+        """
+        Removes a key, if present.
+        """
+        with self._lock, self.connection as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def clear(self):
+        """
+        Removes all keys of the namespace.
+        """
+        with self._lock, self.connection as connection:
+            connection.execute('DELETE FROM cache WHERE namespace = ?', (self.namespace,))
+
+
+class RedisBackend:
+    """
+    Storage in a Redis server (or anything that speaks
+    its protocol). Values are pickled and expire on the
+    server; eviction of entries without a time-to-live
+    follows the `maxmemory-policy` of the server.
+
+    Parameters
+    ----------
+    namespace: str
+        Namespace of the entries stored by
+        this backend.
+
+    url: str, default os.getenv('CACHE_URL', 'redis://localhost:6379/0')
+        Location of the Redis server.
+
+    client: object, default None
+        Client to use instead of creating one from `url`.
+        It needs the `get`, `set`, `delete` and `scan_iter`
+        methods of `redis.StrictRedis`.
+    """
+    def __init__(self, namespace, url=os.getenv('CACHE_URL', 'redis://localhost:6379/0'),
+                 client=None):
+        self.namespace = namespace
+        self.url = url
+
+        self._client = client
+
+    @property
+    def client(self):
+        """
+        Redis client, created on first use.
+        """
+        if self._client is None:
+            import redis
+            self._client = redis.StrictRedis.from_url(self.url)
+
+        return self._client
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=f'{self.namespace}:*'))
+
+    def get(self, key):
+        """
+        Returns a (value, expires) tuple or
+        None if the key is missing.
+        """
+        value = self.client.get(key)
+        if value is None:
+            return None
+
+        return pickle.loads(value)
+
+    def set(self, key, value, expires):
+        """
+        Stores a value until the `expires` timestamp.
+
+        Returns
+        -------
+        int
+            Always 0; the server evicts entries.
+        """
+        value = pickle.dumps((value, expires), protocol=pickle.HIGHEST_PROTOCOL)
+        if expires is None:
+            self.client.set(key, value)
+        else:
+            self.client.set(key, value, px=max(1, int((expires - time.time()) * 1000)))
+
+        return 0
+
+    def delete(self, key):
+        """
+        Removes a key, if present.
+        """
+        self.client.delete(key)
+
+    def clear(self):
+        """
+        Removes all keys of the namespace.
+        """
+        for key in self.client.scan_iter(match=f'{self.namespace}:*'):
+            self.client.delete(key)
+
+
+def create_backend(namespace, maxsize=1024, name=None):
+    """
+    Creates the storage backend selected with
+    the CACHE_BACKEND environment variable.
+
+    Parameters
+    ----------
+    namespace: str
+        Namespace of the cache.
+
+    maxsize: int, default 1024
+        Maximum number of entries, for backends
+        that enforce it.
+
+    name: str, default None
+        Name of the backend, {'memory', 'sqlite', 'redis'}.
+        Defaults to CACHE_BACKEND or 'memory'.
+    """
+    name = name or os.getenv('CACHE_BACKEND', 'memory')
+    if name == 'memory':
+        return MemoryBackend(maxsize=maxsize)
+    elif name == 'sqlite':
+        return SQLiteBackend(namespace, path=os.getenv('CACHE_PATH', 'data/cache.sqlite'),
+                             maxsize=maxsize)
+    elif name == 'redis':
+        return RedisBackend(namespace, url=os.getenv('CACHE_URL', 'redis://localhost:6379/0'))
+
+    raise ValueError(f'Cache backend `{name}` not available.')
+
+
+class Flight:
+    """
+    Call in progress for a key. See Cache.flight().
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class InFlight:
+    """
+    Coroutines in progress on an event loop, by key.
+    Concurrent callers asking for the same key await
+    one shared task instead of starting their own.
+
+    Parameters
+    ----------
+    cache: Cache, default None
+        Cache whose `coalesced` counter is
+        increased for every shared call.
+    """
+    def __init__(self, cache=None):
+        self.cache = cache
+
+        self._tasks = {}
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def _done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    async def run(self, key, fetch):
+        """
+        Awaits `fetch()`, or the task already
+        running it for `key`.
+
+        Parameters
+        ----------
+        key: str
+            Key of the fetched value.
+
+        fetch: callable
+            Function without arguments
+            returning a coroutine.
+
+        Returns
+        -------
+        object
+            Result of the coroutine.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+        elif self.cache is not None:
+            self.cache.coalesced += 1
+
+        #
+        #  A caller giving up doesn't cancel
+        #  the task shared with the others.
+        #
+        return await asyncio.shield(task)
+
+
+class Cache:
+    """
+    Namespaced cache with a default time-to-live and
+    hit, miss and eviction counters. Instances are used
+    as decorators to memoize functions and methods:
+
+        cached = Cache('chart', max_age=60*60)
+
+        @cached(max_age=60*60*10)
+        def generate(self, coin, data):
+            ...
+
+    Parameters
+    ----------
+    namespace: str
+        Name of the cache. Prefixes every key.
+
+    max_age: int, default None
+        Default time-to-live of entries, in seconds.
+        None means entries never expire.
+
+    maxsize: int, default 1024
+        Maximum number of entries of the default
+        backend.
+
+    backend: object, default None
+        Storage backend. Defaults to the one selected
+        with CACHE_BACKEND, created on first use.
+    """
+    def __init__(self, namespace, max_age=None, maxsize=1024, backend=None):
+        self.namespace = namespace
+        self.max_age = max_age
+        self.maxsize = maxsize
+
+        self._backend = backend
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+
+        registry[namespace] = self
+
+    def __repr__(self):
+        return f'Cache({self.namespace!r})'
+
+    @property
+    def backend(self):
+        """
+        Storage backend. It is created on first use so
+        that forked worker processes don't share
+        connections.
+        """
+        if self._backend is None:
+            self._backend = create_backend(self.namespace, maxsize=self.maxsize)
+
+        return self._backend
+
+    def make_key(self, name, arguments):
+        """
+        Creates a key from a function name and its
+        arguments. Long keys are replaced by their hash.
+
+        Parameters
+        ----------
+        name: str
+            Qualified name of the function.
+
+        arguments: tuple
+            Values of the arguments.
+
+        Returns
+        -------
+        str
+            Key in the namespace of the cache.
+        """
+        key = f'{name}{arguments!r}'
+        if len(key) > MAX_KEY_LENGTH:
+            key = f'{name}:' + hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+        return f'{self.namespace}:{key}'
+
+    def get(self, key, default=None):
+        """
+        Returns the value of a key, or `default`
+        if it is missing or has expired.
+        """
+        entry = self.backend.get(key)
+        if entry is not None and entry[1] is not None and entry[1] < time.time():
+            self.backend.delete(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return entry[0]
+
+    def set(self, key, value, max_age=None):
+        """
+        Stores a value.
+
+        Parameters
+        ----------
+        key: str
+            Key of the value.
+
+        value: object
+            Value to store.
+
+        max_age: int, default None
+            Time-to-live in seconds. Defaults
+            to the one of the cache.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        expires = None if max_age is None else time.time() + max_age
+        self.evictions += self.backend.set(key, value, expires)
+
+    def ttl(self, key):
+        """
+        Seconds until a key expires.
+
+        Returns
+        -------
+        float or None
+            Remaining time-to-live. It is `inf` for keys
+            that never expire and None for keys that are
+            missing or have expired.
+        """
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+
+        if entry[1] is None:
+            return float('inf')
+
+        remaining = entry[1] - time.time()
+        return remaining if remaining > 0 else None
+
+    def delete(self, key):
+        """
+        Removes a key.
+        """
+        self.backend.delete(key)
+
+    @property
+    def shared(self):
+        """
+        If entries are kept outside the process, so
+        that reading and writing them blocks on disk
+        or network I/O.
+        """
+        return not isinstance(self.backend, MemoryBackend)
+
+    async def offload(self, func, *args):
+        """
+        Awaits `func(*args)`, usually a method of the
+        cache. Shared caches run it in the default
+        executor, so that coroutines never block the
+        event loop on their backend, e.g. while SQLite
+        waits for a lock. In-process caches run it
+        right away.
+
+        Parameters
+        ----------
+        func: callable
+            Function doing backend I/O.
+
+        Returns
+        -------
+        object
+            Return value of `func(*args)`.
+        """
+        if not self.shared:
+            return func(*args)
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args))
+
+    def flight(self, key, func):
+        """
+        Calls `func()` once for all threads asking for
+        the same key at the same time. The first caller
+        runs it; the others wait and share its result or
+        its exception. Used to compute missing entries,
+        so that concurrent misses make a single call.
+
+        Parameters
+        ----------
+        key: str
+            Key of the computed value.
+
+        func: callable
+            Function without arguments.
+
+        Returns
+        -------
+        object
+            Return value of `func()`.
+        """
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.value
+
+        try:
+            flight.value = func()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+
+            flight.done.set()
+
+        return flight.value
+
+    def clear(self):
+        """
+        Removes all keys and resets counters.
+        """
+        self.backend.clear()
+        self.hits = self.misses = self.evictions = self.coalesced = 0
+
+    def stats(self):
+        """
+        Returns a dictionary with the usage
+        counters of the cache and its hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'namespace': self.namespace,
+            'size': len(self.backend),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'coalesced': self.coalesced,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def __call__(self, max_age=None):
+        """
+        Decorator that memoizes a function. Arguments are
+        bound to the function signature, so positional and
+        keyword calls share the same entry.
+
+        Concurrent calls missing the same entry share
+        a single call of the function. See flight().
+
+        Besides `key` and `cache`, the decorated function
+        has three attributes taking the same arguments as
+        the function: `ttl()`, the seconds until the entry
+        expires, `refresh()`, which calls the function
+        and replaces the entry whether it expired or not,
+        and `call_async()`, a coroutine reading and
+        writing the entry off the event loop. See offload().
+
+        Parameters
+        ----------
+        max_age: int, default None
+            Time-to-live of entries, in seconds. Defaults
+            to the one of the cache.
+        """
+        def decorator(func):
+            signature = inspect.signature(func)
+            name = f'{func.__module__}.{func.__qualname__}'
+
+            def key(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                return self.make_key(name, tuple(bound.arguments.values()))
+
+            def update(k, args, kwargs):
+                value = func(*args, **kwargs)
+                self.set(k, value, max_age)
+                return value
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                k = key(*args, **kwargs)
+                value = self.get(k, MISSING)
+                if value is MISSING:
+                    value = self.flight(k, lambda: update(k, args, kwargs))
+
+                return value
+
+            def ttl(*args, **kwargs):
+                return self.ttl(key(*args, **kwargs))
+
+            def refresh(*args, **kwargs):
+                k = key(*args, **kwargs)
+                return self.flight(k, lambda: update(k, args, kwargs))
+
+            async def call_async(*args, **kwargs):
+                k = key(*args, **kwargs)
+                value = await self.offload(self.get, k, MISSING)
+                if value is MISSING:
+                    value = func(*args, **kwargs)
+                    await self.offload(self.set, k, value, max_age)
+
+                return value
+
+            wrapper.key = key
+            wrapper.cache = self
+            wrapper.ttl = ttl
+            wrapper.refresh = refresh
+            wrapper.call_async = call_async
+            return wrapper
+
+        return decorator
+
+
+def stats():
+    """
+    Returns the usage counters of all caches.
+    """
+    return [cache.stats() for cache in registry.values()]
@@ -3,6 +3,10 @@ Classes and methods for creating Bertie-embedable charts.
 """
 import io
 import os
+import re
+import asyncio
+import hashlib
+import threading
 import tinys3
 import plotly
 import matplotlib
@@ -10,24 +14,287 @@ import plotly.plotly as py
 
 from sanic.log import logger
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
 matplotlib.use('agg')
 
-import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.ticker as ticker
-import timeout_decorator as timeout
+
+#
+#  `from plotly.graph_objs import *` below brings
+#  plotly's Figure, used by plotly_chart().
+#
+from matplotlib.figure import Figure as MplFigure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 
-from slugify import slugify
 from sanic.log import logger
-from memoize import Memoizer
+from skill.cache import Cache, InFlight, MISSING
+from skill.artifacts import default_store
 from plotly.graph_objs import *
 from plotly.graph_objs import layout
-from timeout_decorator.timeout_decorator import TimeoutError
+from skill.series import PriceSeries
+from skill.metrics import Counter, Histogram
+
+cached = Cache('chart', max_age=60*60*10, maxsize=1024)
+
+#
+#  Charts being rendered by generate_async(), shared
+#  by all charts of a process. Concurrent requests for
+#  the same chart wait for a single render.
+#
+rendering = InFlight(cached)
+
+#
+#  Charts rendered, by backend and outcome
+#  (`ok` or `failed`), and their duration.
+#
+RENDERS = Counter(
+    'chart_renders_total', 'Charts rendered.', labels=('backend', 'outcome'))
+RENDER_SECONDS = Histogram(
+    'chart_render_seconds', 'Duration of chart renders.', labels=('backend',))
+
+#
+#  URLs of charts kept in the artifact store. Their
+#  cache entries are dropped when the artifact
+#  was evicted from the store.
+#
+ARTIFACT_URL = re.compile(r'/charts/([0-9a-f]{40})\.png$')
+
+#
+#  Errors after which a chart is reported as
+#  missing instead of failing the request.
+#
+RENDER_ERRORS = (plotly.exceptions.PlotlyRequestError, TimeoutError,
+                 asyncio.TimeoutError, BrokenProcessPool)
+
+#
+#  Process pools rendering charts, by backend. Each
+#  backend has its own pool, so that hung plotly
+#  uploads never hold up the image fallback.
+#
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def render_pool(workers, backend='plotly'):
+    """
+    Process pool rendering the charts of a backend,
+    shared by all charts of a process. It is created
+    on first use, and again after a fork, after a
+    worker died or after it was recycled.
+
+    Parameters
+    ----------
+    workers: int
+        Number of rendering processes.
+
+    backend: str, default 'plotly'
+        Backend rendered by the pool.
+
+    Returns
+    -------
+    ProcessPoolExecutor
+    """
+    global _pools_pid
+
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+
+        pool = _pools.get(backend)
+        if pool is None or getattr(pool, '_broken', False):
+            pool = _pools[backend] = ProcessPoolExecutor(max_workers=workers)
+
+        return pool
+
+
+def recycle_pool(pool):
+    """
+    Terminates the processes of a pool. Jobs that
+    already started can't be cancelled, so this is the
+    only way to free the workers of a job that timed
+    out. Other jobs of the pool fail, and their charts
+    are reported as missing. The next render creates
+    a new pool.
+
+    Parameters
+    ----------
+    pool: ProcessPoolExecutor
+        Pool returned by render_pool().
+    """
+    with _pools_lock:
+        for backend, current in list(_pools.items()):
+            if current is pool:
+                del _pools[backend]
+
+    for process in list((getattr(pool, '_processes', None) or {}).values()):
+        process.terminate()
+
+    pool.shutdown(wait=False)
+
+
+def plotly_chart(coin, series):
+    """
+    Generates a plot using Plotly as a backend.
+    Plotly will generate an online plot and then
+    return that plot's URL. 
+
+    Parameters
+    ----------
+    coin: str
+        Coin name, used in the title.
+
+    series: PriceSeries
+        Series to plot.
+
+    Returns
+    -------
+    str
+        URL for a given plot. This URL
+        is what Bertie uses to create embeds.
+    """
+    plot_data = [
+        Scatter(x=series.dates_as_datetimes(), y=series.close,
+        mode='lines',
+        line=dict(
+            color='#2192ff',
+            width = 3
+        ))]
+    
+    start = series.start.strftime('%B %d, %Y')
+    stop = series.stop.strftime('%B %d, %Y')
+    plot_layout = Layout(
+        title=f'{coin} Closing Prices from {start} to {stop}',
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        height=100,
+        margin=layout.Margin(
+            l=40,
+            r=40,
+            b=40,
+            t=50,
+            pad=4
+        ),
+        xaxis=dict(
+            title='Source: CoinMarketCap (http://www.coinmarketcap.com)',
+            titlefont=dict(
+                    size=10,
+                    color='#7f7f7f'
+            )
+        )
+    )
+
+    config = {'showLink':'testing config!'}
+    fig = Figure(data=plot_data, layout=plot_layout)
+    plot = py.plot(fig, auto_open=False, config=config)
 
-store = {}
-cached = Memoizer(store)
+    return plot
+
+
+class ImageRenderer:
+    """
+    Renders closing prices as PNG images. The figure,
+    axes, formatters and labels are created once; each
+    render only swaps the line data and the title, then
+    draws with Agg straight into an in-memory buffer.
+
+    Figures are not registered with pyplot, so nothing
+    is kept alive between renders. Renders are
+    serialized with a lock, as the template
+    is shared.
+    """
+    def __init__(self, size=(10, 6), dpi=100):
+        self.dpi = dpi
+        self.lock = threading.Lock()
+
+        self.figure = MplFigure(figsize=size, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+
+        axes = self.figure.add_subplot(1, 1, 1)
+        axes.xaxis_date()
+        axes.xaxis.set_major_formatter(mdates.DateFormatter('%b %d, %Y'))
+        axes.yaxis.set_major_formatter(ticker.FormatStrFormatter("$%d"))
+        axes.set_xlabel("Dates")
+        axes.set_ylabel("US Dollars")
+        axes.tick_params(axis='x', labelrotation=10)
+        axes.grid(linestyle="dotted")
+
+        self.axes = axes
+        self.line, = axes.plot([], [])
+
+    def render(self, title, series):
+        """
+        Renders a series.
+
+        Parameters
+        ----------
+        title: str
+            Title of the chart.
+
+        series: PriceSeries
+            Series to plot.
+
+        Returns
+        -------
+        bytes
+            PNG image.
+        """
+        with self.lock:
+            self.line.set_data(mdates.date2num(series.dates_as_datetimes()), series.close)
+            self.axes.set_title(title)
+            self.axes.relim()
+            self.axes.autoscale_view()
+
+            buffer = io.BytesIO()
+            self.figure.savefig(buffer, format='png', transparent=True, dpi=self.dpi)
+            return buffer.getvalue()
+
+
+_renderer = None
+
+
+def image_renderer():
+    """
+    Renderer shared by the image charts of a process.
+    """
+    global _renderer
+
+    if _renderer is None:
+        _renderer = ImageRenderer()
+
+    return _renderer
+
+
+def image_chart(coin, series):
+    """
+    Generates a plot using Image as a backend.
+    MatPlotLib renders the plot offline, as a PNG
+    image that is published by Chart() in its
+    artifact store.
+
+    Parameters
+    ----------
+    coin: str
+        Coin name, used in the title.
+
+    series: PriceSeries
+        Series to plot.
+
+    Returns
+    -------
+    bytes
+        PNG image of the plot.
+    """
+    start = series.start.strftime('%B %d, %Y')
+    stop = series.stop.strftime('%B %d, %Y')
+    title = f'{coin} Overall Closing Prices from {start} to {stop}'
+
+    return image_renderer().render(title, series)
 
 
 class Chart:
@@ -46,15 +313,42 @@ class Chart:
     auth: str or tuple
         Authentication for the required backend.
         For Plotly use (username, api_key).
+
+    workers: int, default os.getenv('CHART_WORKERS', 2)
+        Number of processes rendering the charts of
+        each backend, shared by all charts of a process.
+        With zero, charts are rendered in the
+        calling thread.
+
+    timeout: float, default os.getenv('CHART_TIMEOUT', os.getenv('PLOTLY_TIMEOUT', 5))
+        Seconds to wait for a chart before
+        reporting it as missing.
+
+    base_url: str, default os.getenv('CHART_BASE_URL', '')
+        Public URL of the service, prefixed to the
+        URLs of the charts kept in the artifact store.
+
+    retry_after: int, default os.getenv('CHART_RETRY_AFTER', 60)
+        Seconds during which a chart that failed to
+        render is reported as missing before it is
+        rendered again.
     """
 
     def __init__(self, backend='plotly',
-                 auth=(os.getenv('PLOTLY_USERNAME'), os.getenv('PLOTLY_API_KEY'))):
+                 auth=(os.getenv('PLOTLY_USERNAME'), os.getenv('PLOTLY_API_KEY')),
+                 workers=int(os.getenv('CHART_WORKERS', 2)),
+                 timeout=float(os.getenv('CHART_TIMEOUT', os.getenv('PLOTLY_TIMEOUT', 5))),
+                 base_url=os.getenv('CHART_BASE_URL', ''),
+                 retry_after=int(os.getenv('CHART_RETRY_AFTER', 60))):
 
         self.backend = backend
+        self.workers = workers
+        self.timeout = timeout
+        self.base_url = base_url.rstrip('/')
+        self.retry_after = retry_after
         self.available_backends = {
-            'plotly': self.__generate_plotly_graph,
-            'image': self.__generate_matplotlib_image
+            'plotly': plotly_chart,
+            'image': image_chart
         }
 
         if backend == 'plotly':
@@ -77,118 +371,200 @@ class Chart:
             #     secret_key=os.getenv('S3_SECRET'),
             #     default_bucket=self.s3_bucket)
 
+        self.backend_method = self._method(backend)
+
+    def __repr__(self):
+        return f'Chart(backend={self.backend!r})'
+
+    def _method(self, backend):
+        """
+        Function rendering charts with a backend.
+        """
         try:
-            self.backend_method = self.available_backends[backend]
+            return self.available_backends[backend]
         except KeyError:
             raise ValueError(f'Backend `{backend} not available.')
-            
-            
-    @timeout.timeout(int(os.getenv("PLOTLY_TIMEOUT",5)), use_signals=True)
-    def __generate_plotly_graph(self):
-        """
-        Generates a plot using Plotly as a backend.
-        Plotly will generate an online plot and then
-        return that plot's URL. 
+
+    def _render(self, coin, series, backend):
+        """
+        Renders a chart in the process pool of its
+        backend, waiting at most `timeout` seconds. Time
+        limits don't rely on signals, so they work in any
+        thread. The pool is recycled after a timeout, so
+        that the job stops holding a worker.
+        """
+        method = self._method(backend)
+        if not self.workers:
+            return self._publish(method(coin, series))
+
+        pool = render_pool(self.workers, backend)
+        future = pool.submit(method, coin, series)
+        try:
+            return self._publish(future.result(timeout=self.timeout))
+        except TimeoutError:
+            recycle_pool(pool)
+            raise
+
+    async def _render_async(self, coin, series, backend):
+        """
+        Same as _render(), but awaits the result
+        without blocking the event loop.
+        """
+        method = self._method(backend)
+        if not self.workers:
+            return self._publish(method(coin, series))
+
+        loop = asyncio.get_event_loop()
+        pool = render_pool(self.workers, backend)
+        future = loop.run_in_executor(pool, method, coin, series)
+        try:
+            return self._publish(await asyncio.wait_for(future, self.timeout))
+        except asyncio.TimeoutError:
+            recycle_pool(pool)
+            raise
+
+    def _publish(self, result):
+        """
+        Backends rendering images return their bytes;
+        these are kept in the artifact store and served
+        by the `/charts` route. URLs of hosted charts
+        are returned as-is.
+        """
+        if isinstance(result, bytes):
+            key = default_store().put(result)
+            return f'{self.base_url}/charts/{key}.png'
+
+        return result
+
+    def _failed(self, backend, error):
+        """
+        Logs a chart that could not be rendered.
+        """
+        logger.error(f'Failed to generate chart with backend `{backend}`.')
+        logger.error(f'Error: {error!r}')
+
+    def _store(self, key, backend, result):
+        """
+        Counts a render and caches its result. Failures
+        are cached for `retry_after` seconds only, so
+        that a load spike doesn't hide charts for the
+        lifetime of a chart.
+        """
+        RENDERS.inc(backend=backend, outcome='ok' if result else 'failed')
+        cached.set(key, result, None if result else self.retry_after)
+
+    @staticmethod
+    def _series(data):
+        """
+        Converts chart data to a PriceSeries.
+        """
+        return data if isinstance(data, PriceSeries) else PriceSeries.from_dict(data)
+
+    def key(self, coin, data, backend=None):
+        """
+        Cache key of a chart. Charts are addressed by their
+        content: a hash of the coin, the backend, the date
+        range and the last closing price. Equal series from
+        different requests share an entry, and a new day of
+        prices produces a new one.
+
+        Parameters
+        ----------
+        coin: str
+            Coin name.
+
+        data: PriceSeries or dict
+            Series of the chart.
+
+        backend: str, default None
+            Backend of the chart. Defaults to
+            the one of the instance.
+
         Returns
         -------
         str
-            URL for a given plot. This URL
-            is what Bertie uses to create embeds.
-        """
-        plot_data = [
-            Scatter(x=self.data['date'], y=self.data['close'], 
-            mode='lines',
-            line=dict(
-                color='#2192ff',
-                width = 3
-            ))]
-        
-        start = min(self.data['date']).strftime('%B %d, %Y')
-        stop = max(self.data['date']).strftime('%B %d, %Y')
-        plot_layout = Layout(
-            title=f'{self.coin} Closing Prices from {start} to {stop}',
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            height=100,
-            margin=layout.Margin(
-                l=40,
-                r=40,
-                b=40,
-                t=50,
-                pad=4
-            ),
-            xaxis=dict(
-                title='Source: CoinMarketCap (http://www.coinmarketcap.com)',
-                titlefont=dict(
-                        size=10,
-                        color='#7f7f7f'
-                )
-            )
-        )
+            Key in the chart cache.
+        """
+        series = self._series(data)
+        content = '|'.join(str(part) for part in (
+            coin, backend or self.backend, series.start, series.stop,
+            float(series.close[-1]) if len(series) else None))
+
+        return cached.make_key('generate', (hashlib.sha1(content.encode('utf-8')).hexdigest(),))
+
+    def _lookup(self, key):
+        """
+        Cached chart of a key, or MISSING. Entries whose
+        artifact was evicted from the store are dropped,
+        so that the chart is rendered again.
+        """
+        result = cached.get(key, MISSING)
+        if isinstance(result, str):
+            match = ARTIFACT_URL.search(result)
+            if match and match.group(1) not in default_store():
+                cached.delete(key)
+
+                #
+                #  The chart has to be rendered again,
+                #  so the lookup counts as a miss.
+                #
+                cached.hits -= 1
+                cached.misses += 1
+                return MISSING
+
+        return result
 
-        config = {'showLink':'testing config!'}
-        fig = Figure(data=plot_data, layout=plot_layout)
-        plot = py.plot(fig, auto_open=False, config=config)
+    def ttl(self, coin, data, backend=None):
+        """
+        Seconds until the cached chart expires,
+        or None if it is not cached.
+        """
+        return cached.ttl(self.key(coin, data, backend))
 
-        return plot
-      
-    @timeout.timeout(int(os.getenv("PLOTLY_TIMEOUT",3)), use_signals=True)  
-    def __generate_matplotlib_image(self):
+    def refresh(self, coin, data, backend=None):
         """
-        Generates a plot using Image as a backend.
-        MatPlotLib will generate an offline plot and then
-        upload it to the Amazon S3 bucket.
+        Renders a chart and replaces its cache entry,
+        whether it expired or not. Charts that fail to
+        render are cached as None for `retry_after`
+        seconds.
+
         Returns
         -------
-        str
-            URL for a given plot. This URL
-            is what Bertie uses to create embeds.
+        str or None
+            URL of the chart.
         """
-        
-        
-        start = min(self.data['date']).strftime('%B %d, %Y')
-        stop = max(self.data['date']).strftime('%B %d, %Y')
-        title = f'{self.coin} Overall Closing Prices from {start} to {stop}'
-
-        file_name = slugify(title) + '.png'
-        
-        #
-        # First, we create a MatplotLib image graph
-        # and save it to root.
-        #
-        
-    
-            
-            
-        plt.figure(figsize=(10, 6), dpi=100)
-        plt.plot(self.data['date'], self.data['close'])
-        plt.gca().xaxis_date()
-        plt.gca().xaxis.set_major_formatter(mdates.DateFormatter('%b %d, %Y'))
-        plt.gca().yaxis.set_major_formatter(ticker.FormatStrFormatter("$%d"))
-        plt.title(title)
-        plt.xlabel("Dates")
-        plt.ylabel("US Dollars")
-        plt.xticks(rotation=10)
-        plt.grid(linestyle="dotted")
-        plt.savefig(file_name, transparent=True, dpi=100)
-        
-        
-        
-        
+        backend = backend or self.backend
+        series = self._series(data)
+        try:
+            with RENDER_SECONDS.time(backend=backend):
+                result = self._render(coin, series, backend)
+        except RENDER_ERRORS as e:
+            self._failed(backend, e)
+            result = None
 
-        
-        return file_name
+        self._store(self.key(coin, series, backend), backend, result)
+        return result
 
-    @cached(max_age=60*60*10)
-    def generate(self, coin, data):
+    def generate(self, coin, data, backend=None):
         """
-        Generates plot using class backend.
+        Generates plot using a backend. The method keeps
+        no state on the instance, so a single chart is
+        safely shared by concurrent requests.
         
         Parameters
         ----------
         coin: str
             Coin name. This name will be used
             to generate the title of the plot.
+
+        data: PriceSeries or dict
+            Series to plot. Dictionaries need the
+            keys `date` and `close`.
+
+        backend: str, default None, {'plotly', 'image'}
+            Backend to use instead of the one of the
+            instance, e.g. as a fallback. Charts of all
+            backends share the same cache.
         
         Returns
         -------
@@ -197,20 +573,41 @@ class Chart:
             can be used by Bertie to create an
             embeddable figure.
         """
-        self.coin = coin
-        self.data = data
-        
-        try:
-            result = self.backend_method()
-        except (plotly.exceptions.PlotlyRequestError, TimeoutError) as e:
-            logger.error(f'Failed to generate chart with backend `{self.backend}`.')
-            logger.error(f'Error: {e}')
+        key = self.key(coin, data, backend)
+        result = self._lookup(key)
+        if result is MISSING:
+            result = cached.flight(key, lambda: self.refresh(coin, data, backend))
 
-            result = None
+        return result
+
+    async def generate_async(self, coin, data, backend=None):
+        """
+        Same as generate(), but the chart is awaited
+        without blocking the event loop, so the charts
+        of many coins can be rendered concurrently.
+        Both methods share the same cache entries.
+        """
+        backend = backend or self.backend
+        series = self._series(data)
+        key = self.key(coin, series, backend)
+
+        async def update():
+            try:
+                with RENDER_SECONDS.time(backend=backend):
+                    result = await self._render_async(coin, series, backend)
+            except RENDER_ERRORS as e:
+                self._failed(backend, e)
+                result = None
+
+            await cached.offload(self._store, key, backend, result)
+            return result
+
+        result = await cached.offload(self._lookup, key)
+        if result is MISSING:
+            result = await rendering.run(key, update)
 
         return result
 
-    @cached(max_age=60*60*10)
     def generate_title(self, coin, data):
         """
         Generates chart title. This is useful for creating
@@ -221,21 +618,19 @@ class Chart:
         coin: str
             Slug of cryptocurrency to use.
 
-        data: dict
-            Dictionary with at least one key: `date`.
-            That key contains a list of strings representing
-            ISO-formatted dates.
+        data: PriceSeries or dict
+            Series of the chart. Dictionaries need at
+            least one key: `date`, with a list of dates.
 
         Returns
         -------
         title: str
             Title of chart. 
         """
-        self.coin = coin
-        self.data = data 
+        series = self._series(data)
 
-        start = min(self.data['date']).strftime('%B %d, %Y')
-        stop = max(self.data['date']).strftime('%B %d, %Y')
-        title = f'{self.coin} Closing Prices from {start} to {stop}' 
+        start = series.start.strftime('%B %d, %Y')
+        stop = series.stop.strftime('%B %d, %Y')
+        title = f'{coin} Closing Prices from {start} to {stop}' 
 
-        return title 
\ No newline at end of file
+        return title
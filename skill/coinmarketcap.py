@@ -2,16 +2,180 @@
 Logic for collecting data directly from the 
 CoinMarketCap API.
 """
+import os
+import time
+import asyncio
+import aiohttp
 import requests
-import pandas as pd
+import numpy as np
 
-from memoize import Memoizer
-from bs4 import BeautifulSoup
+from io import BytesIO
+from lxml import etree
+from skill.cache import Cache, InFlight, MISSING
+from skill.index import CoinIndex
 from functools import lru_cache
 from datetime import datetime, timedelta
+from skill.store import PriceStore
+from skill.series import PriceSeries
+from skill.metrics import Counter, Histogram, STAGE_SECONDS
+
+cached = Cache('coinmarketcap', maxsize=2048)
+
+#
+#  Requests made to CoinMarketCap, by endpoint and
+#  HTTP status. Requests that got no response are
+#  counted with the status `error`.
+#
+UPSTREAM_REQUESTS = Counter(
+    'coinmarketcap_requests_total', 'Requests made to CoinMarketCap.',
+    labels=('endpoint', 'status'))
+UPSTREAM_SECONDS = Histogram(
+    'coinmarketcap_request_seconds', 'Duration of requests made to CoinMarketCap.',
+    labels=('endpoint',))
+
+#
+#  Errors of requests made with AsyncCoinMarketCap(),
+#  after which a coin is reported as unavailable
+#  instead of failing the request.
+#
+UPSTREAM_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+#
+#  Cache key of the listings of AsyncCoinMarketCap().
+#
+LISTINGS_KEY = ('listings',)
+
+#
+#  Base URLs of the API and of the website. They can
+#  point to a local stand-in, such as the one in
+#  benchmarks/fake_coinmarketcap.py.
+#
+API_URL = os.getenv('COINMARKETCAP_API_URL', 'https://api.coinmarketcap.com/v2')
+WEBSITE_URL = os.getenv('COINMARKETCAP_URL', 'https://coinmarketcap.com')
+
+
+def _historic_url(coin, start, stop):
+    """
+    URL of the historical-data page of a coin.
+
+    Parameters
+    ----------
+    coin: str
+        Website slug of the coin.
+
+    start, stop: datetime.date
+        Range of the page.
+    """
+    start, stop = start.strftime('%Y%m%d'), stop.strftime('%Y%m%d')
+    return f"{WEBSITE_URL}/currencies/{coin}/historical-data/?start={start}&end={stop}"
+
+
+#
+#  Month abbreviations used in the dates of
+#  the historical-data table (e.g. `Jun 01, 2018`).
+#
+MONTHS = {
+    'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06',
+    'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12'
+}
+
+
+def _get(endpoint, url):
+    """
+    Makes a GET request, counting it in
+    the upstream metrics.
+    """
+    with UPSTREAM_SECONDS.time(endpoint=endpoint):
+        try:
+            response = requests.get(url)
+        except requests.RequestException:
+            UPSTREAM_REQUESTS.inc(endpoint=endpoint, status='error')
+            raise
+
+    UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+
+def _parse(content):
+    """
+    Parses a historical-data page, timing it.
+    See _parse_historic().
+    """
+    with STAGE_SECONDS.time(stage='parse'):
+        return _parse_historic(content)
+
+
+def _parse_historic(content):
+    """
+    Parses the historical-data page of a coin in a
+    single pass. Cells of the first table are streamed
+    into columns and parsing stops at the end of that
+    table. Dates and values are then converted
+    in bulk.
+
+    Parameters
+    ----------
+    content: bytes
+        HTML of the historical-data page.
+
+    Returns
+    -------
+    PriceSeries
+        Records in the page, in ascending date order.
+    """
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+
+    rows, cells = [], []
+    events = etree.iterparse(BytesIO(content), events=('end',),
+                             tag=('td', 'tr', 'table'), html=True)
+    for _, element in events:
+        if element.tag == 'td':
+            cells.append(''.join(element.itertext()).strip())
+        elif element.tag == 'tr':
+            if len(cells) >= 7:
+                rows.append(cells[:7])
+            cells = []
+        else:
+            break
+
+        element.clear()
+
+    if not rows:
+        raise ValueError('Page has no historical-data table.')
+
+    #
+    #  Cleans variables from the original. Values
+    #  reported as `-` (e.g. missing volumes)
+    #  become NaN.
+    #
+    columns = list(zip(*rows))
+    date = np.array([_to_iso(d) for d in columns[0]], dtype='datetime64[D]')
+    values = [
+        np.array([_to_float(v) for v in column], dtype='float64')
+        for column in columns[1:]
+    ]
+    return PriceSeries._sorted(date, **dict(zip(PriceSeries.columns, values)))
+
+
+def _to_iso(value):
+    """
+    Converts a date such as `Jun 1, 2018`
+    into ISO format.
+    """
+    month, day, year = value.replace(',', ' ').split()
+    return f'{year}-{MONTHS[month[:3]]}-{day.zfill(2)}'
+
 
-store = {}
-cached = Memoizer(store)
+def _to_float(value):
+    """
+    Converts a number with thousands separators,
+    returning NaN when it isn't a number.
+    """
+    try:
+        return float(value.replace(',', ''))
+    except ValueError:
+        return np.nan
 
 
 class CoinMarketCap:
@@ -20,8 +184,15 @@ class CoinMarketCap:
     Original data can be found at:
 
         https://coinmarketcap.com/
-    
+
+    Historic prices are kept in a PriceStore, so only
+    days that were never requested are scraped.
     """
+    price_store = PriceStore()
+
+    _index = None
+    _index_expires = 0
+
     def __repr__(self):
         message = """
         Crypto-currency data comes from the website CoinMarketCap.
@@ -44,34 +215,29 @@ class CoinMarketCap:
     def __find_coin(self, coin):
         """
         Maps numberic coin IDs to string slugs and
-        vice-versa.
+        vice-versa. See CoinIndex.find().
+        """
+        return self.index().find(coin)
 
-        Parameters
-        ----------
-        coin: str or int
-            Either string or integer that represents
-            a coin slug or ID.
+    @classmethod
+    def index(cls):
+        """
+        Index of the current listings. It is kept in the
+        process until the cached listings expire, so
+        lookups don't read the cache, and it is shared
+        by every caller until then.
 
         Returns
         -------
-        result: dict
-            A dictionary with both the coin ID and
-            its slug. Example:
-                { 'id': 1, 'slug': 'bitcoin' }
+        CoinIndex
         """
-        try:
-            if isinstance(coin, int):
-                match = next((c for c in self.listings() if c['id'] == coin))
-            elif isinstance(coin, str):
-                match = next((c for c in self.listings() if c['website_slug'] == coin))
-        except StopIteration:
-            raise ValueError(f'Coin `{coin}` does not exist.')
-
-        result = {
-            'id': match['id'],
-            'website_slug': match['website_slug']
-        }
-        return result
+        if cls._index is None or time.time() >= cls._index_expires:
+            listings = cls.listings()
+            ttl = cls.listings.ttl(cls)
+            cls._index = CoinIndex.build(listings, previous=cls._index)
+            cls._index_expires = time.time() + (ttl or 0)
+
+        return cls._index
 
     
     @property
@@ -87,12 +253,11 @@ class CoinMarketCap:
         bool:
             Boolean representing the status of the API.
         """
-        url = 'https://api.coinmarketcap.com/v2/listings/'
-        response = requests.get(url)
+        url = f'{API_URL}/listings/'
+        response = _get('listings', url)
         return response.ok
 
     @property
-    @cached(max_age=60*60*24)
     def coin_ids(self):
         """
         Property that represents an interable of 
@@ -101,13 +266,12 @@ class CoinMarketCap:
 
         Returns
         -------
-        list
-            List of strings representing coin IDs.
+        tuple
+            Tuple of integers representing coin IDs.
         """
-        return [c['id'] for c in self.listings()]
+        return self.index().ids
     
     @property
-    @cached(max_age=60*60*24)
     def coin_slugs(self):
         """
         Property that represents an interable of "slugs"
@@ -116,11 +280,11 @@ class CoinMarketCap:
 
         Returns
         -------
-        list
-            List of strings representing coin "slugs".
+        tuple
+            Tuple of strings representing coin "slugs".
 
         """
-        return [c['website_slug'] for c in self.listings()]
+        return self.index().slugs
 
     @classmethod
     @cached(max_age=60*60*5)
@@ -129,7 +293,8 @@ class CoinMarketCap:
                  stop=datetime.now().strftime('%Y%m%d')):
         """
         Retrieves historic data within a time
-        period.
+        period. Days already in the price store
+        are not requested again.
 
         Parameters
         ----------
@@ -143,32 +308,21 @@ class CoinMarketCap:
 
         Returns
         -------
-        list
-            List of dictionaries representing the records
-            scraped from CoinMarketCap.
+        PriceSeries
+            Columnar series with the records scraped
+            from CoinMarketCap. Iterating over it yields
+            one dictionary per day.
         """
         ticker = cls.__find_coin(cls, ticker)
+        coin = ticker['website_slug']
+        start, stop = (datetime.strptime(d, '%Y%m%d').date() for d in (start, stop))
 
-        url = f"https://coinmarketcap.com/currencies/{ticker['website_slug']}/historical-data/?start={start}&end={stop}"
-        r = requests.get(url)
-
-        soup = BeautifulSoup(r.content, 'lxml')
-        table = soup.find_all('table')[0]
-        df = pd.read_html(str(table))[0]
-
-        #
-        #  Cleans variables from the original.
-        #
-        df['Date'] = df['Date'].apply(lambda x: datetime.strptime(x, '%b %d, %Y').strftime('%Y-%m-%d'))
-        df['Volume'] = df['Volume'].apply(lambda x: None if x == '-' else x)
-        df.columns = ['date', 'open', 'high', 'low', 'close', 'volume', 'market_cap']
+        for missing_start, missing_stop in cls.price_store.missing(coin, start, stop):
+            r = _get('historic', _historic_url(coin, missing_start, missing_stop))
+            series = _parse(r.content)
+            cls.price_store.save(coin, series, missing_start, missing_stop)
 
-        #
-        #  Ordering dates in ascending order.
-        #
-        result = df.sort_values('date').to_dict(orient='records')
-
-        return result
+        return cls.price_store.load(coin, start, stop)
 
     @classmethod
     @cached(max_age=60*60*24)
@@ -188,8 +342,8 @@ class CoinMarketCap:
         --------
         List with all available coin information.
         """
-        url = 'https://api.coinmarketcap.com/v2/listings/'
-        response = requests.get(url)
+        url = f'{API_URL}/listings/'
+        response = _get('listings', url)
 
         return response.json()['data']
 
@@ -204,8 +358,218 @@ class CoinMarketCap:
         Dictionary with a single record form the 
         """
         ticker = cls.__find_coin(cls, ticker)
-        url = f"https://api.coinmarketcap.com/v2/ticker/{ticker['id']}/"
+        url = f"{API_URL}/ticker/{ticker['id']}/"
 
-        response = requests.get(url)
+        response = _get('ticker', url)
 
         return response.json()
+
+
+class AsyncCoinMarketCap:
+    """
+    Asyncio-native interface to CoinMarketCap data. It
+    exposes the same methods as CoinMarketCap() as
+    coroutines. All requests share one keep-alive
+    connection pool, so calls made from the Sanic
+    handlers never block the event loop.
+
+    Parameters
+    ----------
+    limit: int, default 100
+        Maximum number of open connections.
+
+    limit_per_host: int, default 10
+        Maximum number of open connections to
+        the same host.
+
+    timeout: float, default 10
+        Maximum number of seconds for a
+        single request.
+
+    price_store: PriceStore, default None
+        Store for historic prices. Defaults to
+        the one used by CoinMarketCap().
+    """
+    def __init__(self,
+                 limit=int(os.getenv('COINMARKETCAP_CONNECTIONS', 100)),
+                 limit_per_host=int(os.getenv('COINMARKETCAP_CONNECTIONS_PER_HOST', 10)),
+                 timeout=float(os.getenv('COINMARKETCAP_TIMEOUT', 10)),
+                 price_store=None):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.price_store = price_store or CoinMarketCap.price_store
+
+        self._session = None
+        self._index = None
+        self._index_expires = 0
+        self.cache = Cache('coinmarketcap.async', maxsize=2048)
+        self.in_flight = InFlight(self.cache)
+
+    @property
+    def session(self):
+        """
+        Shared aiohttp session. It is created on first use
+        because it has to be bound to a running loop.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+        return self._session
+
+    async def close(self):
+        """
+        Closes the connection pool.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _cached(self, key, max_age, fetch, refresh_within=0):
+        """
+        Returns the value stored under `key`, awaiting
+        `fetch()` if it is missing or older than
+        `max_age` seconds. Values expiring within
+        `refresh_within` seconds are fetched again.
+        Concurrent misses of a key share one fetch.
+        """
+        key = self.cache.make_key('AsyncCoinMarketCap', key)
+        value = await self.cache.offload(self.cache.get, key, MISSING)
+        if value is not MISSING and refresh_within:
+            ttl = await self.cache.offload(self.cache.ttl, key)
+            if ttl is None or ttl < refresh_within:
+                value = MISSING
+
+        if value is MISSING:
+
+            async def update():
+                value = await fetch()
+                await self.cache.offload(self.cache.set, key, value, max_age)
+                return value
+
+            value = await self.in_flight.run(key, update)
+
+        return value
+
+    async def _get(self, endpoint, url, as_json=True):
+        """
+        Makes a GET request using the shared session,
+        counting it in the upstream metrics.
+        """
+        with UPSTREAM_SECONDS.time(endpoint=endpoint):
+            try:
+                async with self.session.get(url) as response:
+                    UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=response.status)
+                    response.raise_for_status()
+                    if as_json:
+                        return await response.json()
+
+                    return await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                UPSTREAM_REQUESTS.inc(endpoint=endpoint, status='error')
+                raise
+
+    async def status(self):
+        """
+        Retrieves the status of the CoinMarketCap API.
+        See CoinMarketCap.status.
+        """
+        async def fetch():
+            try:
+                async with self.session.get(f'{API_URL}/listings/') as response:
+                    return response.status < 400
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                return False
+
+        return await self._cached(('status',), 60*60*24, fetch)
+
+    async def listings(self):
+        """
+        Returns a full list of available coins.
+        See CoinMarketCap.listings().
+        """
+        async def fetch():
+            response = await self._get('listings', f'{API_URL}/listings/')
+            return response['data']
+
+        return await self._cached(LISTINGS_KEY, 60*60*24, fetch)
+
+    async def index(self):
+        """
+        Index of the current listings, kept in the
+        process until they expire.
+        See CoinMarketCap.index().
+        """
+        if self._index is None or time.time() >= self._index_expires:
+            listings = await self.listings()
+            ttl = await self.cache.offload(
+                self.cache.ttl, self.cache.make_key('AsyncCoinMarketCap', LISTINGS_KEY))
+            self._index = CoinIndex.build(listings, previous=self._index)
+            self._index_expires = time.time() + (ttl or 0)
+
+        return self._index
+
+    async def current(self, ticker):
+        """
+        Fetches current prices from CoinMarketCap.
+        See CoinMarketCap.current().
+        """
+        ticker = (await self.index()).find(ticker)
+
+        async def fetch():
+            return await self._get('ticker', f"{API_URL}/ticker/{ticker['id']}/")
+
+        return await self._cached(('current', ticker['id']), 60*60*24, fetch)
+
+    async def historic(self, ticker, start=None, stop=None, refresh_within=0):
+        """
+        Retrieves historic data within a time period.
+        See CoinMarketCap.historic(). Pages are parsed and
+        the price store is accessed in the default
+        executor to keep the loop free.
+
+        Cached data expiring within `refresh_within`
+        seconds is fetched again, which lets callers
+        refresh it before requests find it expired.
+
+        Data of website slugs is looked up in the cache
+        before the listings; numeric IDs are mapped to
+        their slug first.
+        """
+        if isinstance(ticker, str):
+            coin = ticker
+        else:
+            coin = (await self.index()).find(ticker)['website_slug']
+
+        start = start or (datetime.now() - timedelta(days=90)).strftime('%Y%m%d')
+        stop = stop or datetime.now().strftime('%Y%m%d')
+
+        async def fetch():
+
+            #
+            #  Unknown coins raise ValueError
+            #  before any request is made.
+            #
+            (await self.index()).find(coin)
+
+            loop = asyncio.get_event_loop()
+            first, last = (datetime.strptime(d, '%Y%m%d').date() for d in (start, stop))
+
+            missing = await loop.run_in_executor(
+                None, self.price_store.missing, coin, first, last)
+            for missing_start, missing_stop in missing:
+                content = await self._get(
+                    'historic', _historic_url(coin, missing_start, missing_stop), as_json=False)
+                series = await loop.run_in_executor(None, _parse, content)
+                await loop.run_in_executor(
+                    None, self.price_store.save, coin, series, missing_start, missing_stop)
+
+            return await loop.run_in_executor(None, self.price_store.load, coin, first, last)
+
+        key = ('historic', coin, start, stop)
+        return await self._cached(key, 60*60*5, fetch, refresh_within=refresh_within)
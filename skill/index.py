@@ -0,0 +1,123 @@
+"""
+Index of the coins in a CoinMarketCap listing.
+"""
+
+
+class CoinIndex:
+    """
+    Snapshot of a coin listing with constant-time
+    lookups by ID, website slug, symbol and lowercase
+    name. Indexes are never modified after they are
+    built; a new listing produces a new index, which
+    replaces the previous one in a single assignment.
+
+    Parameters
+    ----------
+    coins: list
+        Output of CoinMarketCap.listings(), or any list
+        of dictionaries with the keys `id`, `name`,
+        `symbol` and `website_slug`.
+    """
+    def __init__(self, coins):
+        self.listings = coins
+        self.coins = tuple(coins)
+
+        self.ids = tuple(c['id'] for c in self.coins)
+        self.names = tuple(c['name'] for c in self.coins)
+        self.symbols = tuple(c['symbol'] for c in self.coins)
+        self.slugs = tuple(c['website_slug'] for c in self.coins)
+
+        #
+        #  Symbols are not unique; they map to every coin
+        #  using them, in listing order. For names, the
+        #  first coin in the listing wins.
+        #
+        self._by_id = {c['id']: c for c in reversed(self.coins)}
+        self._by_slug = {c['website_slug']: c for c in reversed(self.coins)}
+        self._by_name = {c['name'].lower(): c for c in reversed(self.coins)}
+        self._by_symbol = {}
+        for coin in self.coins:
+            self._by_symbol.setdefault(coin['symbol'], []).append(coin)
+
+    def __len__(self):
+        return len(self.coins)
+
+    def __contains__(self, coin):
+        return coin in self._by_id or coin in self._by_slug
+
+    @classmethod
+    def build(cls, coins, previous=None):
+        """
+        Builds an index for a listing.
+
+        Parameters
+        ----------
+        coins: list
+            Output of CoinMarketCap.listings().
+
+        previous: CoinIndex, default None
+            Index of an older listing. It is returned
+            as-is if the listing didn't change.
+
+        Returns
+        -------
+        CoinIndex
+        """
+        if previous is not None and (previous.listings is coins or previous.listings == coins):
+            return previous
+
+        return cls(coins)
+
+    def find(self, coin):
+        """
+        Finds a coin by numeric ID or website slug.
+
+        Parameters
+        ----------
+        coin: str or int
+            Either string or integer that represents
+            a coin slug or ID.
+
+        Returns
+        -------
+        dict
+            Listing entry of the coin, with at least
+            the keys `id` and `website_slug`.
+        """
+        if isinstance(coin, int):
+            match = self._by_id.get(coin)
+        elif isinstance(coin, str):
+            match = self._by_slug.get(coin)
+        else:
+            match = None
+
+        if match is None:
+            raise ValueError(f'Coin `{coin}` does not exist.')
+
+        return match
+
+    def by_id(self, coin_id):
+        """
+        Listing entry of a coin ID, or None.
+        """
+        return self._by_id.get(coin_id)
+
+    def by_slug(self, slug):
+        """
+        Listing entry of a website slug, or None.
+        """
+        return self._by_slug.get(slug)
+
+    def by_name(self, name):
+        """
+        Listing entry of a coin name (case
+        insensitive), or None.
+        """
+        return self._by_name.get(name.lower())
+
+    def by_symbol(self, symbol):
+        """
+        Listing entries of all coins using a
+        symbol, in listing order.
+        """
+        return list(self._by_symbol.get(symbol, []))
@@ -0,0 +1,216 @@
+"""
+Precomputed lexicon of the coin names and symbols
+searched for by Crypto().
+"""
+import os
+import json
+import hashlib
+
+from sanic.log import logger
+
+#
+#  Version of the lexicon file format. Files with
+#  another version are ignored and rebuilt.
+#
+LEXICON_VERSION = 1
+
+#
+#  Coins never searched for, on top of the ones
+#  whose names are dictionary words.
+#
+UNDESIRABLE_COINS = ['Crypto', 'ICOS', 'Naviaddress', 'B2BX']
+
+
+def fingerprint(coins):
+    """
+    Hash of the fields of a listing used
+    by the lexicon.
+
+    Parameters
+    ----------
+    coins: list
+        Output of CoinMarketCap.listings().
+
+    Returns
+    -------
+    str
+        SHA-1 hash of the listing.
+    """
+    fields = [[c['id'], c['name'], c['symbol'], c['website_slug']] for c in coins]
+    return hashlib.sha1(json.dumps(fields).encode('utf-8')).hexdigest()
+
+
+def is_dictionary_word(name):
+    """
+    Checks if a name has a definition in WordNet.
+    The corpus is only loaded when this is called.
+    """
+    from nltk.corpus import wordnet as wn
+    return bool(wn.synsets(name))
+
+
+class Lexicon:
+    """
+    Names, symbols and slugs of all listed coins, with
+    a flag for coins excluded from searches because
+    their names are dictionary words. Lexicons are
+    saved as JSON files that load in milliseconds,
+    so WordNet only has to be consulted when the
+    listings change.
+
+    Parameters
+    ----------
+    entries: list
+        List of dictionaries with the keys `id`, `name`,
+        `symbol`, `website_slug` and `excluded`.
+
+    fingerprint: str
+        Fingerprint of the listing the lexicon
+        was built from.
+
+    version: int, default LEXICON_VERSION
+        Version of the lexicon format.
+    """
+    def __init__(self, entries, fingerprint, version=LEXICON_VERSION):
+        self.entries = entries
+        self.fingerprint = fingerprint
+        self.version = version
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def coins(self):
+        """
+        Entries that are not excluded,
+        in listing order.
+        """
+        return [e for e in self.entries if not e['excluded']]
+
+    @classmethod
+    def build(cls, coins, previous=None, is_word=is_dictionary_word):
+        """
+        Builds a lexicon from a listing.
+
+        Parameters
+        ----------
+        coins: list
+            Output of CoinMarketCap.listings().
+
+        previous: Lexicon, default None
+            Lexicon of an older listing. Names found in it
+            reuse its exclusion flags instead of being
+            checked again.
+
+        is_word: callable, default is_dictionary_word
+            Function that tells if a name is
+            a dictionary word.
+
+        Returns
+        -------
+        Lexicon
+        """
+        known = {}
+        if previous is not None:
+            known = {e['name']: e['excluded'] for e in previous.entries}
+
+        entries = []
+        for coin in coins:
+            name = coin['name']
+            if name in known:
+                excluded = known[name]
+            else:
+                excluded = name in UNDESIRABLE_COINS or is_word(name)
+
+            entries.append({
+                'id': coin['id'],
+                'name': name,
+                'symbol': coin['symbol'],
+                'website_slug': coin['website_slug'],
+                'excluded': excluded
+            })
+
+        return cls(entries, fingerprint(coins))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a lexicon file.
+
+        Parameters
+        ----------
+        path: str
+            Location of the lexicon file.
+
+        Returns
+        -------
+        Lexicon or None
+            None if the file doesn't exist or has
+            another format version.
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if data.get('version') != LEXICON_VERSION:
+            return None
+
+        return cls(data['entries'], data['fingerprint'], version=data['version'])
+
+    def save(self, path):
+        """
+        Saves the lexicon as JSON. The file is replaced
+        atomically, so concurrent readers never see a
+        partial file.
+
+        Parameters
+        ----------
+        path: str
+            Location of the lexicon file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({
+                'version': self.version,
+                'fingerprint': self.fingerprint,
+                'entries': self.entries
+            }, f)
+
+        os.replace(temporary, path)
+
+
+def load_lexicon(coins, path):
+    """
+    Loads the lexicon saved at `path`, rebuilding and
+    saving it if it was built from another listing.
+
+    Parameters
+    ----------
+    coins: list
+        Output of CoinMarketCap.listings().
+
+    path: str
+        Location of the lexicon file.
+
+    Returns
+    -------
+    Lexicon
+    """
+    lexicon = Lexicon.load(path)
+    if lexicon is not None and lexicon.fingerprint == fingerprint(coins):
+        return lexicon
+
+    logger.info('Coin listings changed. Rebuilding lexicon.')
+    lexicon = Lexicon.build(coins, previous=lexicon)
+    try:
+        lexicon.save(path)
+    except OSError as e:
+        logger.error(f'Failed to save lexicon to `{path}`: {e}')
+
+    return lexicon
@@ -0,0 +1,566 @@
+"""
+Matchers for finding cryptocurrency names, plurals
+and symbols in a body of text.
+"""
+import os
+import re
+import bisect
+import hashlib
+
+from collections import deque
+from skill.cache import Cache, MemoryBackend
+
+
+#
+#  Kinds of patterns added to the automaton. Plurals
+#  are matched as their own pattern (name + `s`).
+#
+SINGULAR, PLURAL, SYMBOL = 0, 1, 2
+
+#
+#  Texts are split into chunks after runs of newlines.
+#  Names and symbols never contain newlines, so no
+#  occurrence spans two chunks, and word boundaries at
+#  the edges of a chunk are the same as in the text.
+#
+CHUNK_BOUNDARY = re.compile(r'\n+')
+
+#
+#  Sentences end at runs of `.`, `!` or `?` followed
+#  by whitespace or by the end of the text, and at
+#  newlines.
+#
+SENTENCE_END = re.compile(r'[.!?]+(?=\s|$)|\n')
+
+#
+#  Hits of every chunk scanned, by chunk content. Edited
+#  documents only scan the chunks that changed. Lookups
+#  are frequent and cheap, so they stay in memory.
+#
+chunks = Cache('matcher.chunks', backend=MemoryBackend(
+    maxsize=int(os.getenv('MATCHER_CHUNKS', 8192))))
+
+
+def _is_word(char):
+    """
+    Mirrors the definition of `\\w` used by the
+    `re` module for unicode strings.
+    """
+    return char.isalnum() or char == '_'
+
+
+def _fold(text):
+    """
+    Lowercases text while keeping a one-to-one mapping
+    between characters, so that offsets found on the
+    folded text are valid offsets on the original.
+    """
+    folded = text.lower()
+    if len(folded) != len(text) or 'Σ' in text:
+        folded = ''.join([c.lower() if len(c.lower()) == 1 else c for c in text])
+
+    return folded
+
+
+def split(text):
+    """
+    Splits text into chunks after runs of newlines.
+
+    Yields
+    ------
+    tuple
+        Tuples of (offset, chunk), in which offset is
+        the position of the chunk in the text.
+    """
+    start = 0
+    for boundary in CHUNK_BOUNDARY.finditer(text):
+        yield start, text[start:boundary.end()]
+        start = boundary.end()
+
+    if start < len(text):
+        yield start, text[start:]
+
+
+class Sentences:
+    """
+    Sentence boundaries of a text, found in a single
+    pass of SENTENCE_END. Leading and trailing
+    whitespace is not part of a sentence.
+
+    Parameters
+    ----------
+    text: str, default ''
+        Text to split into sentences.
+    """
+    def __init__(self, text=''):
+        self.starts = []
+        self.ends = []
+
+        start = 0
+        for boundary in SENTENCE_END.finditer(text):
+            end = boundary.start() if boundary.group() == '\n' else boundary.end()
+            self._add(text, start, end)
+            start = boundary.end()
+
+        self._add(text, start, len(text))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def extend(self, other, offset):
+        """
+        Appends the sentences of a chunk
+        found at `offset` in the text.
+        """
+        self.starts.extend(start + offset for start in other.starts)
+        self.ends.extend(end + offset for end in other.ends)
+
+    def _add(self, text, start, end):
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+
+        if start < end:
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def span(self, start, end):
+        """
+        Boundaries of the sentences containing
+        the text between `start` and `end`.
+
+        Returns
+        -------
+        tuple
+            Tuple of (sentence start, sentence end).
+        """
+        first = max(bisect.bisect_right(self.starts, start) - 1, 0)
+        last = max(bisect.bisect_right(self.starts, end - 1) - 1, first)
+        return self.starts[first], self.ends[last]
+
+    def finding(self, kind, start, end):
+        """
+        Finding of an occurrence, with the offsets
+        of the occurrence and of its sentence.
+
+        Parameters
+        ----------
+        kind: str, {'name', 'symbol'}
+            Prefix of the occurrence offsets.
+
+        start, end: int
+            Offsets of the occurrence.
+
+        Returns
+        -------
+        dict
+        """
+        sentence_start, sentence_end = self.span(start, end)
+        return {
+            f'{kind}_start': start,
+            f'{kind}_end': end,
+            'sentence_start': sentence_start,
+            'sentence_end': sentence_end
+        }
+
+
+class Automaton:
+    """
+    Aho-Corasick automaton. All patterns are added
+    with `add()` and compiled with `build()`, after
+    which `finditer()` reports every (possibly
+    overlapping) occurrence in a single pass over
+    the text.
+    """
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+
+    def add(self, word, value):
+        """
+        Adds a pattern to the automaton.
+
+        Parameters
+        ----------
+        word: str
+            Pattern to search for.
+
+        value: object
+            Value reported back for every occurrence
+            of `word`.
+        """
+        state = 0
+        for char in word:
+            following = self.goto[state].get(char)
+            if following is None:
+                following = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = following
+
+            state = following
+
+        self.output[state].append((len(word), value))
+
+    def build(self):
+        """
+        Computes failure links with a breadth-first
+        walk over the trie.
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self.goto[state].items():
+                queue.append(following)
+
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+
+                self.fail[following] = self.goto[fallback].get(char, 0)
+                self.output[following] = self.output[following] + \
+                                         self.output[self.fail[following]]
+
+    def finditer(self, text):
+        """
+        Scans text for all patterns.
+
+        Yields
+        ------
+        tuple
+            Tuples of (start, end, value) in order
+            of their end offsets.
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+
+            state = goto[state].get(char, 0)
+            for length, value in output[state]:
+                yield position + 1 - length, position + 1, value
+
+
+class CoinMatcher:
+    """
+    Finds coins in text using one Aho-Corasick
+    automaton over coin names and their plurals
+    (case insensitive) and another over symbols
+    (case sensitive). The cost of a search grows with
+    the size of the text, not with the number of coins.
+
+    Parameters
+    ----------
+    names, symbols, slugs: list of str
+        Parallel lists with the name, symbol and
+        website slug of each coin.
+
+    incremental: bool, default True
+        If texts are scanned in chunks whose hits are
+        cached, so that documents edited and scanned
+        again only scan the chunks that changed.
+    """
+    def __init__(self, names, symbols, slugs, incremental=True):
+        self.names = list(names)
+        self.symbols = list(symbols)
+        self.slugs = list(slugs)
+        self.incremental = incremental
+
+        #
+        #  Chunk hits are only valid for
+        #  the same coins.
+        #
+        coins = '\0'.join(f'{name}\1{symbol}' for name, symbol in zip(self.names, self.symbols))
+        self.fingerprint = hashlib.sha1(coins.encode('utf-8', 'surrogatepass')).hexdigest()
+
+        self.name_automaton = Automaton()
+        self.symbol_automaton = Automaton()
+        for i, (name, symbol) in enumerate(zip(self.names, self.symbols)):
+            if name:
+                self.name_automaton.add(_fold(name), (i, SINGULAR))
+                self.name_automaton.add(_fold(name + 's'), (i, PLURAL))
+            if symbol:
+                self.symbol_automaton.add(symbol, (i, SYMBOL))
+
+        self.name_automaton.build()
+        self.symbol_automaton.build()
+
+    @staticmethod
+    def _collect(automaton, text, scanned, hits):
+        """
+        Adds occurrences delimited by word boundaries
+        to `hits`, keyed by (coin index, kind).
+        """
+        size = len(text)
+        for start, end, key in automaton.finditer(scanned):
+            left = start > 0 and _is_word(text[start - 1])
+            if left == _is_word(text[start]):
+                continue
+
+            right = end < size and _is_word(text[end])
+            if right == _is_word(text[end - 1]):
+                continue
+
+            hits.setdefault(key, []).append((start, end))
+
+    def scan(self, text):
+        """
+        Scans text for names, plurals and symbols.
+
+        Parameters
+        ----------
+        text: str
+            Text to scan.
+
+        Returns
+        -------
+        hits: dict
+            Dictionary keyed by (coin index, kind) with
+            lists of (start, end) offsets.
+        """
+        hits = {}
+        self._collect(self.name_automaton, text, _fold(text), hits)
+        self._collect(self.symbol_automaton, text, text, hits)
+
+        #
+        #  Like `re.finditer()`, occurrences of the
+        #  same pattern do not overlap each other.
+        #
+        for key, spans in hits.items():
+            spans.sort()
+            kept, last_end = [], -1
+            for start, end in spans:
+                if start >= last_end:
+                    kept.append((start, end))
+                    last_end = end
+            hits[key] = kept
+
+        return hits
+
+    def scan_chunks(self, text):
+        """
+        Same as scan(), but the text is scanned in chunks,
+        which are also split into sentences. Sentences
+        end at newlines, so none spans two chunks. Hits
+        and sentences of chunks scanned before are reused,
+        with their offsets shifted to the position of the
+        chunk in the text.
+
+        Returns
+        -------
+        tuple
+            Tuple of (hits, Sentences).
+        """
+        hits = {}
+        sentences = Sentences()
+        for offset, chunk in split(text):
+            digest = hashlib.sha1(chunk.encode('utf-8', 'surrogatepass')).hexdigest()
+            key = chunks.make_key(self.fingerprint, (digest,))
+
+            scanned = chunks.get(key)
+            if scanned is None:
+                scanned = (self.scan(chunk), Sentences(chunk))
+                chunks.set(key, scanned)
+
+            chunk_hits, chunk_sentences = scanned
+            for hit, spans in chunk_hits.items():
+                hits.setdefault(hit, []).extend(
+                    (start + offset, end + offset) for start, end in spans)
+
+            if chunk_hits:
+                sentences.extend(chunk_sentences, offset)
+
+        return hits, sentences
+
+    def find(self, text, incremental=None):
+        """
+        Finds coins in text.
+
+        Parameters
+        ----------
+        text: str
+            Text to search.
+
+        incremental: bool, default None
+            If the text is scanned in cached chunks.
+            Defaults to the setting of the matcher.
+
+        Returns
+        -------
+        results: list
+            List of dictionaries with the keys
+            `cryptocurrency`, `name` and `findings`. Findings
+            hold the offsets of an occurrence (`name_start`
+            and `name_end`, or `symbol_start` and `symbol_end`)
+            and of its sentence (`sentence_start` and
+            `sentence_end`).
+        """
+        if incremental is None:
+            incremental = self.incremental
+
+        if incremental:
+            hits, sentences = self.scan_chunks(text)
+        else:
+            hits, sentences = self.scan(text), None
+
+        return self.assemble(text, hits, sentences)
+
+    def assemble(self, text, hits, sentences=None):
+        """
+        Groups the hits of a text into results.
+
+        Parameters
+        ----------
+        text: str
+            Text that was scanned.
+
+        hits: dict
+            Output of scan(), or hits of scan_chunks().
+
+        sentences: Sentences, default None
+            Sentences of the chunks with hits, as returned
+            by scan_chunks(). Found in the text when None.
+
+        Returns
+        -------
+        results: list
+            See find().
+        """
+        results = []
+        if not hits:
+            return results
+
+        by_name = {}
+        caught_coin = set()
+        if sentences is None:
+            sentences = Sentences(text)
+
+        def append(i, finding):
+            for result in by_name[self.names[i]]:
+                result['findings'].append(finding)
+
+        def create(i, finding):
+            result = {
+                "cryptocurrency": self.slugs[i],
+                "name": self.names[i],
+                "findings": [finding]
+            }
+            results.append(result)
+            by_name.setdefault(self.names[i], []).append(result)
+
+        #
+        #  Names and plurals are reported first, in
+        #  coin order. The first occurrence creates a
+        #  result; the following ones are appended to
+        #  every result with the same name.
+        #
+        for i in sorted({i for i, kind in hits if kind != SYMBOL}):
+            spans = hits.get((i, SINGULAR), []) + hits.get((i, PLURAL), [])
+            start, end = spans[0]
+            create(i, sentences.finding('name', start, end))
+            for start, end in spans[1:]:
+                append(i, sentences.finding('name', start, end))
+
+            caught_coin.add(i)
+
+        #
+        #  Symbols of coins already found by name are added
+        #  to their findings. Otherwise only the first symbol
+        #  occurrence is reported.
+        #
+        for i in sorted(i for i, kind in hits if kind == SYMBOL):
+            spans = hits[(i, SYMBOL)]
+            if i in caught_coin:
+                for start, end in spans:
+                    append(i, sentences.finding('name', start, end))
+            else:
+                start, end = spans[0]
+                create(i, sentences.finding('symbol', start, end))
+
+        return results
+
+
+class RegexCoinMatcher:
+    """
+    Reference matcher that runs one regular expression
+    per coin name, plural and symbol. It is much slower
+    than CoinMatcher and is kept for benchmarks and
+    for checking that both matchers agree.
+
+    Parameters
+    ----------
+    names, symbols, slugs: list of str
+        Parallel lists with the name, symbol and
+        website slug of each coin.
+    """
+    def __init__(self, names, symbols, slugs):
+        self.names = list(names)
+        self.symbols = list(symbols)
+        self.slugs = list(slugs)
+
+    def find(self, text):
+        """
+        Finds coins in text.
+
+        Parameters
+        ----------
+        text: str
+            Text to search.
+
+        Returns
+        -------
+        results: list
+            Same output as CoinMatcher.find().
+        """
+        results = []
+        caught_coin = []
+        sentences = Sentences(text)
+
+        def append(i, finding):
+            for result in results:
+                if result['name'] == self.names[i]:
+                    result['findings'].append(finding)
+
+        for i, name in enumerate(self.names):
+            if not name:
+                continue
+
+            count = 0
+            for pattern in (r"\b{}\b", r"\b{}s\b"):
+                regex = pattern.format(re.escape(name))
+                for match in re.finditer(regex, text, re.I | re.M):
+                    finding = sentences.finding('name', match.start(), match.end())
+                    if count == 0:
+                        results.append({
+                            "cryptocurrency": self.slugs[i],
+                            "name": self.names[i],
+                            "findings": [finding]
+                        })
+                        count = count + 1
+                    else:
+                        append(i, finding)
+
+            if count > 0:
+                caught_coin.append(i)
+
+        for i, symbol in enumerate(self.symbols):
+            if not symbol:
+                continue
+
+            regex = r"\b{}\b".format(re.escape(symbol))
+            for count, match in enumerate(re.finditer(regex, text)):
+                if i in caught_coin:
+                    append(i, sentences.finding('name', match.start(), match.end()))
+                elif count == 0:
+                    results.append({
+                        "cryptocurrency": self.slugs[i],
+                        "name": self.names[i],
+                        "findings": [sentences.finding('symbol', match.start(), match.end())]
+                    })
+
+        return results
@@ -0,0 +1,318 @@
+"""
+Counters and histograms of the hot paths of the
+skill, exposed in the Prometheus text format by the
+`/metrics` route.
+
+Recording a value only updates a few numbers under a
+lock; text is only produced when the route is scraped.
+Metrics are kept per process, so with several workers
+each scrape reports the worker that answered it.
+"""
+import time
+import bisect
+import asyncio
+import threading
+
+from collections import OrderedDict
+from skill import cache
+
+#
+#  Upper bounds of the histogram buckets, in seconds.
+#  They go from a cached lookup to a slow scrape.
+#
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+#
+#  Every metric created, by name.
+#  Used for rendering.
+#
+registry = OrderedDict()
+
+#
+#  Durations recorded for the tasks being
+#  traced, by task. See Trace().
+#
+_traces = {}
+
+
+def _current_task():
+    """
+    Task running in the current thread, or None.
+    """
+    try:
+        if hasattr(asyncio, 'current_task'):
+            return asyncio.current_task()
+
+        return asyncio.Task.current_task()
+    except RuntimeError:
+        return None
+
+
+def _escape(value):
+    """
+    Escapes a label value.
+    """
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _sample(name, labels, value):
+    """
+    Formats a sample line.
+    """
+    if labels:
+        pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+        name = f'{name}{{{pairs}}}'
+
+    return f'{name} {float(value)!r}'
+
+
+class Counter:
+    """
+    Monotonic count of events, such as
+    requests or errors.
+
+    Parameters
+    ----------
+    name: str
+        Name of the metric.
+
+    description: str
+        Help text of the metric.
+
+    labels: tuple, default ()
+        Names of the labels. Every call to
+        `inc()` gives a value for each of them.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+
+        self._values = {}
+        self._lock = threading.Lock()
+
+        registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def inc(self, amount=1, **labels):
+        """
+        Increments the count of a set of labels.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """
+        Current count of a set of labels.
+        """
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        """
+        Yields (name, labels, value) tuples.
+        """
+        with self._lock:
+            values = sorted(self._values.items())
+
+        for key, value in values:
+            yield self.name, tuple(zip(self.labels, key)), value
+
+
+class Histogram:
+    """
+    Distribution of durations, counted in
+    fixed buckets.
+
+    Parameters
+    ----------
+    name: str
+        Name of the metric.
+
+    description: str
+        Help text of the metric.
+
+    labels: tuple, default ()
+        Names of the labels.
+
+    buckets: tuple, default BUCKETS
+        Sorted upper bounds of the buckets.
+
+    traced: bool, default False
+        If timers of the histogram also report to
+        the Trace() of the task they run in.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=BUCKETS, traced=False):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self.traced = traced
+
+        self._values = {}
+        self._lock = threading.Lock()
+
+        registry[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def observe(self, value, **labels):
+        """
+        Counts a value in its bucket.
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+
+            entry[0][index] += 1
+            entry[1] += value
+
+    def time(self, **labels):
+        """
+        Context manager observing the time
+        spent in its block.
+        """
+        return Timer(self, labels)
+
+    def count(self, **labels):
+        """
+        Number of values observed for a set of labels.
+        """
+        entry = self._values.get(self._key(labels))
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        """
+        Yields (name, labels, value) tuples, with
+        cumulative buckets, sum and count.
+        """
+        with self._lock:
+            values = sorted((k, (list(counts), total)) for k, (counts, total) in self._values.items())
+
+        for key, (counts, total) in values:
+            labels = tuple(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + (('le', bound),), cumulative
+
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Timer:
+    """
+    Observes the seconds spent in a `with`
+    block in a histogram.
+    """
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.started
+        self.histogram.observe(seconds, **self.labels)
+
+        if _traces and self.histogram.traced:
+            durations = _traces.get(_current_task())
+            if durations is not None:
+                key = ','.join(str(self.labels[label]) for label in self.histogram.labels)
+                durations[key] = durations.get(key, 0) + seconds
+
+        return False
+
+
+class Trace:
+    """
+    Collects the durations observed by the timers of
+    traced histograms while the current task is in a
+    `with` block, summed by label values. Tasks that
+    are not traced only pay for a check of an empty
+    dictionary.
+
+    Parameters
+    ----------
+    durations: dict, default None
+        Dictionary receiving the durations.
+    """
+    def __init__(self, durations=None):
+        self.durations = OrderedDict() if durations is None else durations
+        self.task = None
+
+    def __enter__(self):
+        self.task = _current_task()
+        _traces[self.task] = self.durations
+        return self
+
+    def __exit__(self, *exc_info):
+        _traces.pop(self.task, None)
+        return False
+
+
+#
+#  Time spent in each stage of a request: scanning
+#  text, collecting prices, parsing pages, rendering
+#  charts and encoding responses.
+#
+STAGE_SECONDS = Histogram(
+    'crypto_stage_seconds', 'Time spent in each stage of a request.',
+    labels=('stage',), traced=True)
+
+
+def _cache_metrics():
+    """
+    Yields (name, kind, description, samples) for the
+    counters of every cache, read at scrape time.
+    """
+    stats = cache.stats()
+    for field, kind, description in (
+            ('hits', 'counter', 'Cache lookups that found an entry.'),
+            ('misses', 'counter', 'Cache lookups that found no entry.'),
+            ('evictions', 'counter', 'Cache entries evicted to make room.'),
+            ('coalesced', 'counter', 'Cache misses that shared a call in progress.'),
+            ('size', 'gauge', 'Entries in the cache.'),
+            ('hit_rate', 'gauge', 'Ratio of cache lookups that found an entry.')):
+        name = f'cache_{field}_total' if kind == 'counter' else f'cache_{field}'
+        samples = [(name, (('cache', s['namespace']),), s[field]) for s in stats]
+        yield name, kind, description, samples
+
+
+def render():
+    """
+    Renders all metrics in the Prometheus
+    text exposition format.
+
+    Returns
+    -------
+    str
+        Text of the metrics.
+    """
+    metrics = [
+        (metric.name, metric.kind, metric.description, metric.samples())
+        for metric in list(registry.values())
+    ]
+    metrics.extend(_cache_metrics())
+
+    lines = []
+    for name, kind, description, samples in metrics:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(_sample(*sample) for sample in samples)
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,123 @@
+"""
+Opt-in profiling of single requests, for diagnosing
+slow inputs in production without redeploying.
+"""
+import os
+import hmac
+import time
+import asyncio
+import pstats
+import cProfile
+
+from skill.metrics import Trace
+
+
+class RequestProfiler:
+    """
+    Runs single requests under cProfile when they ask
+    for it, and reports their hottest functions and the
+    time spent in each stage.
+
+    Requests ask for a profile by sending the token in the
+    `X-Profile` header or in the `profile` query parameter.
+    Profiled requests run one at a time, because a thread
+    can only have one active profiler. Other requests
+    handled by the same loop meanwhile are included in
+    the functions reported.
+
+    Parameters
+    ----------
+    token: str, default os.getenv('PROFILE_TOKEN')
+        Secret that requests have to send. Profiling
+        is disabled when it is not set.
+
+    top: int, default os.getenv('PROFILE_TOP', 25)
+        Number of functions reported.
+    """
+    def __init__(self, token=os.getenv('PROFILE_TOKEN'),
+                 top=int(os.getenv('PROFILE_TOP', 25))):
+        self.token = token
+        self.top = top
+
+        self._lock = None
+
+    def requested(self, request):
+        """
+        If a request asks for a profile with
+        the right token.
+        """
+        if not self.token:
+            return False
+
+        value = request.headers.get('x-profile') or request.args.get('profile')
+        if not value:
+            return False
+
+        #
+        #  Strings with non-ASCII characters can't be
+        #  compared directly, so bytes are compared.
+        #
+        return hmac.compare_digest(value.encode('utf-8'), self.token.encode('utf-8'))
+
+    async def run(self, function):
+        """
+        Awaits `function()` under the profiler.
+
+        Parameters
+        ----------
+        function: callable
+            Function without arguments returning
+            the coroutine to profile.
+
+        Returns
+        -------
+        tuple
+            Tuple of (result, report). See report().
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            with Trace() as trace:
+                profiler.enable()
+                try:
+                    result = await function()
+                finally:
+                    profiler.disable()
+
+            seconds = time.perf_counter() - started
+
+        return result, self.report(profiler, trace.durations, seconds)
+
+    def report(self, profiler, stages, seconds):
+        """
+        Summarizes a profile.
+
+        Returns
+        -------
+        dict
+            Dictionary with the keys `seconds` (wall time),
+            `stages` (seconds spent in each stage) and
+            `functions`: the `top` functions with the most
+            time spent in their own code, with their number
+            of calls and their total and cumulative seconds.
+        """
+        stats = pstats.Stats(profiler).stats
+        hottest = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+
+        functions = []
+        for function, (_, calls, total, cumulative, _) in hottest[:self.top]:
+            functions.append({
+                'function': pstats.func_std_string(function),
+                'calls': calls,
+                'total': round(total, 6),
+                'cumulative': round(cumulative, 6)
+            })
+
+        return {
+            'seconds': round(seconds, 6),
+            'stages': {stage: round(s, 6) for stage, s in stages.items()},
+            'functions': functions
+        }
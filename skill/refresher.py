@@ -0,0 +1,170 @@
+"""
+Background refresh of the prices and charts of
+the most requested coins.
+"""
+import os
+import asyncio
+import schedule
+
+from collections import Counter, OrderedDict
+from sanic.log import logger
+
+
+class Refresher:
+    """
+    Keeps the data of the most requested coins warm.
+    Handlers report the coins they return with `track()`.
+    A job run by a `schedule.Scheduler` on the server loop
+    then refreshes the historic prices and charts of the
+    hottest coins shortly before their cache entries
+    expire, so that requests never find them expired
+    and pay for scraping and rendering.
+
+    Request counts decay at every run, so coins that
+    stop being requested are eventually dropped.
+
+    Like requests, the refresher falls back to the
+    `image` backend when the chart of the default
+    backend failed, so that the image charts served
+    in its place are also kept warm.
+
+    Parameters
+    ----------
+    skill: Crypto
+        Skill whose caches are refreshed.
+
+    top: int, default os.getenv('REFRESH_TOP', 20)
+        Number of coins kept warm.
+
+    interval: int, default os.getenv('REFRESH_INTERVAL', 60)
+        Seconds between runs. Zero disables
+        the refresher.
+
+    margin: int, default os.getenv('REFRESH_MARGIN', 1800)
+        Entries expiring within this many seconds
+        are refreshed.
+
+    decay: float, default os.getenv('REFRESH_DECAY', 0.99)
+        Factor applied to request counts at every run.
+        Coins are dropped when their count falls below
+        0.1; with the defaults, a coin requested once
+        is kept warm for almost four hours.
+    """
+    def __init__(self, skill,
+                 top=int(os.getenv('REFRESH_TOP', 20)),
+                 interval=int(os.getenv('REFRESH_INTERVAL', 60)),
+                 margin=int(os.getenv('REFRESH_MARGIN', 60*30)),
+                 decay=float(os.getenv('REFRESH_DECAY', 0.99))):
+        self.skill = skill
+        self.top = top
+        self.interval = interval
+        self.margin = margin
+        self.decay = decay
+
+        self.requests = Counter()
+        self.names = {}
+        self.scheduler = schedule.Scheduler()
+
+        self._task = None
+        self._running = None
+
+    def track(self, results):
+        """
+        Counts the coins returned by a request.
+
+        Parameters
+        ----------
+        results: list
+            Output of Crypto().text_async().
+        """
+        for result in results:
+            self.requests[result['id']] += 1
+            self.names[result['id']] = result['name']
+
+    def hot(self):
+        """
+        Website slugs of the most requested coins.
+        """
+        return [coin for coin, _ in self.requests.most_common(self.top)]
+
+    def refresh_chart(self, coin, name, series):
+        """
+        Renders the chart of a coin again if its entry
+        is about to expire. The `image` entry is only
+        checked when the default backend has no chart,
+        since requests are only served from it then.
+        """
+        chart = self.skill.chart
+        for backend in OrderedDict.fromkeys((chart.backend, 'image')):
+            ttl = chart.ttl(coin=name, data=series, backend=backend)
+            if ttl is None or ttl < self.margin:
+                url = chart.refresh(coin=name, data=series, backend=backend)
+            else:
+                url = chart.generate(coin=name, data=series, backend=backend)
+
+            if url:
+                break
+
+    async def refresh(self):
+        """
+        Refreshes the historic prices and the charts of
+        the hottest coins. Failures are logged and
+        retried at the next run.
+        """
+        coins = self.hot()
+        for coin in list(self.requests):
+            self.requests[coin] *= self.decay
+            if self.requests[coin] < 0.1:
+                del self.requests[coin]
+
+        loop = asyncio.get_event_loop()
+        for coin in coins:
+            try:
+                series = await self.skill.async_coin_market_cap.historic(
+                    coin, refresh_within=self.margin)
+                await loop.run_in_executor(
+                    None, self.refresh_chart, coin, self.names[coin], series)
+            except Exception as e:
+                logger.error(f'Failed to refresh `{coin}`: {e}')
+
+    def _spawn(self, loop):
+        """
+        Starts a run unless the previous one
+        is still going.
+        """
+        if self._running is None or self._running.done():
+            self._running = loop.create_task(self.refresh())
+
+    async def _run(self):
+        """
+        Runs pending jobs of the scheduler.
+        """
+        while True:
+            self.scheduler.run_pending()
+            await asyncio.sleep(1)
+
+    def start(self, loop):
+        """
+        Schedules runs every `interval` seconds
+        on an event loop.
+        """
+        if self.interval <= 0:
+            return
+
+        self.scheduler.every(self.interval).seconds.do(self._spawn, loop)
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        """
+        Cancels scheduled and running jobs.
+        """
+        self.scheduler.clear()
+        for task in (self._task, self._running):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+        self._task = self._running = None
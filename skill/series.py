@@ -0,0 +1,186 @@
+"""
+Compact, columnar representation of daily
+cryptocurrency prices.
+"""
+import hashlib
+import numpy as np
+
+from datetime import datetime
+
+
+class PriceSeries:
+    """
+    Daily prices of a single cryptocurrency stored as
+    NumPy columns: `datetime64[D]` dates and float64
+    values. Missing values (e.g. volumes reported as `-`)
+    are stored as NaN.
+
+    Iterating over a series yields one dictionary per day,
+    the same records returned by CoinMarketCap.historic()
+    before this class existed.
+
+    Parameters
+    ----------
+    date: array-like
+        Dates of each record.
+
+    open, high, low, close, volume, market_cap: array-like, default None
+        Values of each record. Missing columns
+        are filled with NaN.
+    """
+    __slots__ = ('date', 'open', 'high', 'low', 'close', 'volume', 'market_cap', '_digest')
+
+    columns = ('open', 'high', 'low', 'close', 'volume', 'market_cap')
+
+    def __init__(self, date, open=None, high=None, low=None, close=None,
+                 volume=None, market_cap=None):
+        self.date = np.asarray(date, dtype='datetime64[D]')
+        self._digest = None
+
+        values = (open, high, low, close, volume, market_cap)
+        for column, value in zip(self.columns, values):
+            if value is None:
+                value = np.full(len(self.date), np.nan)
+
+            setattr(self, column, np.asarray(value, dtype='float64'))
+
+    def __len__(self):
+        return len(self.date)
+
+    def __iter__(self):
+        return iter(self.to_records())
+
+    def __eq__(self, other):
+        return isinstance(other, PriceSeries) and self.digest == other.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        """
+        Representation based on the series content. It is
+        short and stable, which makes it suitable as part
+        of cache keys.
+        """
+        if not len(self):
+            return 'PriceSeries(empty)'
+
+        return 'PriceSeries({}..{}, {} days, {})'.format(
+            self.date[0], self.date[-1], len(self), self.digest)
+
+    @property
+    def digest(self):
+        """
+        SHA-1 hash of the dates and values.
+        """
+        if self._digest is None:
+            sha = hashlib.sha1(self.date.astype('int64').tobytes())
+            for column in self.columns:
+                sha.update(getattr(self, column).tobytes())
+
+            self._digest = sha.hexdigest()
+
+        return self._digest
+
+    @property
+    def start(self):
+        """
+        First date in the series, as a datetime.date.
+        """
+        return self.date.min().astype(datetime)
+
+    @property
+    def stop(self):
+        """
+        Last date in the series, as a datetime.date.
+        """
+        return self.date.max().astype(datetime)
+
+    @classmethod
+    def _sorted(cls, date, **columns):
+        """
+        Creates a series in ascending date order.
+        """
+        date = np.asarray(date, dtype='datetime64[D]')
+        order = np.argsort(date, kind='mergesort')
+        columns = {
+            k: None if v is None else np.asarray(v, dtype='float64')[order]
+            for k, v in columns.items()
+        }
+        return cls(date[order], **columns)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Creates a series from a list of dictionaries
+        with the keys `date`, `open`, `high`, `low`,
+        `close`, `volume` and `market_cap`.
+        """
+        date = [r['date'] for r in records]
+        columns = {
+            column: [np.nan if r.get(column) is None else r[column] for r in records]
+            for column in cls.columns
+        }
+        return cls._sorted(date, **columns)
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Creates a series from a pandas DataFrame with
+        a `date` column and numeric value columns.
+        """
+        columns = {c: df[c].values for c in cls.columns if c in df}
+        return cls._sorted(df['date'].values, **columns)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Creates a series from a dictionary of lists
+        with at least the keys `date` and `close`,
+        as used by the Chart() class.
+        """
+        columns = {c: data[c] for c in cls.columns if c in data}
+        return cls._sorted(data['date'], **columns)
+
+    def dates_as_strings(self):
+        """
+        Returns dates as ISO strings (YYYY-MM-DD).
+        """
+        return np.datetime_as_string(self.date, unit='D').tolist()
+
+    def dates_as_datetimes(self):
+        """
+        Returns dates as a list of datetime.datetime
+        objects, as expected by the charting libraries.
+        """
+        return self.date.astype('datetime64[us]').astype(datetime).tolist()
+
+    def to_dict(self, columns=('close',)):
+        """
+        Converts the series into JSON-serializable lists.
+
+        Parameters
+        ----------
+        columns: tuple, default ('close',)
+            Value columns to include alongside `date`.
+
+        Returns
+        -------
+        dict
+            Dictionary with ISO dates under `date` and
+            one list per column. NaN becomes None.
+        """
+        result = {'date': self.dates_as_strings()}
+        for column in columns:
+            values = getattr(self, column)
+            result[column] = [None if v != v else v for v in values.tolist()]
+
+        return result
+
+    def to_records(self):
+        """
+        Converts the series into a list of dictionaries,
+        one for each day.
+        """
+        data = self.to_dict(columns=self.columns)
+        return [dict(zip(data, values)) for values in zip(*data.values())]
@@ -1,24 +1,23 @@
 """
 Skill can find cryptocurrencies in text, and give their current listings.
 """
-import re
 import os
 import time 
+import asyncio
 import gensim
-import schedule
 import plotly
 import plotly.plotly as py
 
 from isoweek import Week
 from sanic.log import logger
-from memoize import Memoizer
+from skill.cache import Cache
+from skill.metrics import STAGE_SECONDS
 from skill.chart import Chart
-from nltk.corpus import wordnet as wn
-from datetime import datetime, timedelta
-from skill.coinmarketcap import CoinMarketCap
+from skill.matcher import CoinMatcher
+from skill.lexicon import load_lexicon
+from skill.coinmarketcap import CoinMarketCap, AsyncCoinMarketCap, UPSTREAM_ERRORS
 
-store = {}
-cached = Memoizer(store)
+cached = Cache('skill', maxsize=256)
 
 
 class Crypto:
@@ -44,87 +43,63 @@ class Crypto:
         The charting backend to instantiate the Chart()
         class with. It can be either 'plotly' or 'image'
 
+    lexicon_path: str, default os.getenv('LEXICON_PATH', 'data/lexicon.json')
+        Location of the precomputed coin lexicon. It is
+        rebuilt when the coin listings change.
+
     """
 
-    def __init__(self, charting_backend='plotly'):
+    def __init__(self, charting_backend='plotly',
+                 lexicon_path=os.getenv('LEXICON_PATH', 'data/lexicon.json')):
 
 
+        self.charting_backend = charting_backend
+        self.lexicon_path = lexicon_path
         self.__initialize_variables()
         self.chart = Chart(backend=charting_backend)
 
+    def __repr__(self):
+        """
+        Stable representation, used in cache keys
+        shared by worker processes.
+        """
+        return f'Crypto(charting_backend={self.charting_backend!r})'
 
     def __initialize_variables(self):
         """
         Restricts currencies to only currencies without a definition in WordNet.
+        Definitions are looked up when the lexicon is rebuilt, not at every start.
         Returns
         -------
+        self.index
+            CoinIndex of the current listings, shared with CoinMarketCap().
+        self.coins
+            Listing entries of the coins searched for.
         self.currencies,self.symbols,self.website_slugs
             These variables contain the name, symbols, and website_slugs.
+            They are the parallel columns of self.coins.
+        self.matcher
+            CoinMatcher built over those names and symbols.
         """
 
 
-        coins = CoinMarketCap.listings()
-        currencies = [currency['name'] for currency in coins]
-        # symbols = [currency['symbol']for currency in coins]
-        coin_removal = []
-        undesirable_coins = ['Crypto', 'ICOS', 'Naviaddress', 'B2BX']
-
-        for i, currency in enumerate(currencies):
-            if wn.synsets(currency) or currency in undesirable_coins:
-                coin_removal.append(i)
-
-        for index in sorted(coin_removal, reverse=True):
-            del coins[index]
+        self.lexicon = load_lexicon(CoinMarketCap.listings(), self.lexicon_path)
+        self.index = CoinMarketCap.index()
 
-        self.coins = coins
-        self.currencies = [currency['name'] for currency in coins]
-        self.symbols = [currency['symbol'] for currency in coins]
-        self.website_slugs = [currency['website_slug'] for currency in coins]
+        self.coins = tuple(self.lexicon.coins)
+        self.currencies = tuple(c['name'] for c in self.coins)
+        self.symbols = tuple(c['symbol'] for c in self.coins)
+        self.website_slugs = tuple(c['website_slug'] for c in self.coins)
+        self.matcher = CoinMatcher(self.currencies, self.symbols, self.website_slugs)
         self.coin_market_cap = CoinMarketCap()
-
-    def _collect_coin_data(self,
-                            coin,
-                            start=(datetime.now() - timedelta(days=90)).strftime('%Y%m%d'),
-                            dates_as_strings=True):
-        """
-        Simple method for collecting cryptocurrency data
-        using CoinMarketCap().historic() and for parsing
-        that data into the format expected by the
-        Chart() class.
-        Parameters
-        ----------
-        coin: str
-            ID that identifies a unique cryptocurrency in
-            CoinMarketCap.
-        start: str, default datetime.now() - timedelta(days=90)
-            String with a date value with ISO formatting.
-        Returns
-        -------
-        plot_data: dict
-            Dictionary with two keys: `date` and `close`.
-            These keys contain lists of the dates and
-            values for each cryptocurrency.
-        """
-        series = self.coin_market_cap.historic(coin, start=start)
-        plot_data = {'date': [], 'close': []}
-        for record in series:
-
-            if dates_as_strings:
-                date = record['date']
-            else:
-                date = datetime.strptime(record['date'], '%Y-%m-%d')
-
-            plot_data['date'].append(date)
-            plot_data['close'].append(record['close'])
-
-        return plot_data
+        self.async_coin_market_cap = AsyncCoinMarketCap()
 
     @cached(max_age=60 * 60 * 10)
     def regex_crypto_currency_finder(self, string):
         '''
-        This uses a regex to find a given currency, and place it in a list. 
-        The list then places its results in the results dictionary. 
-        This is done for regular currencies, its plurals, and its' symbols.
+        Finds currencies, their plurals and their symbols in a single
+        pass over the text using the matcher built at initialization.
+        Every currency found is placed in the results list.
         Parameters
         ----------
         text: str
@@ -132,105 +107,13 @@ class Crypto:
         Returns
         -------
         result: Array of Objects
-            Contains currency detected, its location, and the original sentence.
+            Contains currency detected, its location, and the location
+            of its sentence.
         '''
 
-        results = []
-        matches = {}
-        caught_coin = []
-        logger.info('Running regex on input')
-
-        for i, currency in enumerate(self.currencies):
-            regex = r"\b{}\b".format(currency)
-            pattern = list(re.finditer(regex, string, re.I | re.M))
-
-            count = 0
-            # SINGULAR
-            for match in pattern:
-                if count == 0:
-                    results.append({
-                        "sentence": string,
-                        "cryptocurrency": self.website_slugs[i],
-                        "name": self.currencies[i],
-                        "findings": [{
-                            "name_start": match.start(),
-                            "name_end": match.end()
-                        }]
-                    })
-                    count = count + 1
-                else:
-                    matches.update({'name_start': match.start()})
-                    matches.update({'name_end': match.end()})
-                    for result in results:
-                        if result['name'] == self.currencies[i]:
-                            result['findings'].append(matches)
-                        else:
-                            pass
-                    matches = {}
-
-            regex_plural = r"\b{}s\b".format(currency)
-            pattern_plural = list(
-                re.finditer(regex_plural, string, re.I | re.M))
-
-            #PLURAL
-            for match in pattern_plural:
-                if count == 0:
-                    results.append({
-                        "sentence": string,
-                        "cryptocurrency": self.website_slugs[i],
-                        "name": self.currencies[i],
-                        "findings": [{
-                            "name_start": match.start(),
-                            "name_end": match.end()
-                        }]
-                    })
-                    count = count + 1
-                else:
-                    matches.update({'name_start': match.start()})
-                    matches.update({'name_end': match.end()})
-                    for result in results:
-                        if result['name'] == self.currencies[i]:
-                            result['findings'].append(matches)
-                        else:
-                            pass
-                    matches = {}
-
-            if count > 0:
-                caught_coin.append(i)
-            else:
-                pass
-            count = 0
-
-        count = 0
-        #SYMBOL
-
-        for i, symbol in enumerate(self.symbols):
-            regex_symbol = r"\b{}\b".format(symbol)
-            pattern_symbol = list(re.finditer(regex_symbol, string))
-
-            for match in pattern_symbol:
-                if count == 0 and i not in caught_coin:
-                    results.append({
-                        "sentence": string,
-                        "cryptocurrency": self.website_slugs[i],
-                        "name": self.currencies[i],
-                        "findings": [{
-                            "symbol_start": match.start(),
-                            "symbol_end": match.end()
-                        }]
-                    })
-                    count = count + 1
-                elif i in caught_coin:
-                    matches.update({'name_start': match.start()})
-                    matches.update({'name_end': match.end()})
-
-                    for result in results:
-                        if result['name'] == self.currencies[i]:
-                            result['findings'].append(matches)
-                        else:
-                            pass
-                    matches = {}
-            count = 0
+        logger.info('Running matcher on input')
+        with STAGE_SECONDS.time(stage='find'):
+            results = self.matcher.find(string)
 
         if not results:
             logger.info(
@@ -242,6 +125,138 @@ class Crypto:
 
         return results
 
+    def _top_findings(self, findings, limit):
+        """
+        Limits findings to the currencies with
+        the most finds.
+
+        Parameters
+        ----------
+        findings: list
+            Output of regex_crypto_currency_finder().
+
+        limit: int
+            Number of currencies to keep.
+
+        Returns
+        -------
+        list
+            Findings of the `limit` currencies with the
+            most finds, in their original order.
+        """
+        sorted_findings = sorted(
+            [{
+                'coin': d['cryptocurrency'],
+                'n': len(d['findings'])
+            } for d in findings],
+            key=lambda x: x['n'],
+            reverse=True)
+        top_coins = [x['coin'] for x in sorted_findings[:limit]]
+
+        return [d for d in findings if d['cryptocurrency'] in top_coins]
+
+    def _coin_details(self, coin, name, series=None):
+        """
+        Collects prices and a chart for a single
+        cryptocurrency.
+
+        Parameters
+        ----------
+        coin: str
+            Website slug of the cryptocurrency.
+
+        name: str
+            Name of the cryptocurrency. Used in
+            the chart title.
+
+        series: PriceSeries, default None
+            Series already returned by historic(). It
+            is fetched when None.
+
+        Returns
+        -------
+        details: dict
+            Dictionary with the keys `prices` and `chart`.
+            Prices are the PriceSeries itself; it is only
+            converted to lists when serialized to JSON.
+        """
+        if series is None:
+            with STAGE_SECONDS.time(stage='historic'):
+                series = self.coin_market_cap.historic(coin)
+
+        logger.info("Running Chart with Plotly backend.")
+
+        with STAGE_SECONDS.time(stage='chart'):
+            chart_url = self.chart.generate(coin=name, data=series)
+
+            if not chart_url:
+
+                logger.info("Running Chart with Image backend.")
+
+                chart_url = self.chart.generate(coin=name, data=series, backend='image')
+
+        return self._details(name, series, chart_url)
+
+    async def _historic_async(self, coin):
+        """
+        Historic prices of a coin, or None if they could
+        not be collected. Failures are logged, so that the
+        other coins of a request are still returned.
+        """
+        try:
+            return await self.async_coin_market_cap.historic(coin)
+        except UPSTREAM_ERRORS as e:
+            logger.error(f'Failed to collect prices of `{coin}`: {e!r}')
+            return None
+
+    async def _coin_details_async(self, coin, name, series):
+        """
+        Same as _coin_details(), but the chart is
+        rendered without blocking the event loop.
+        """
+        chart_url = await self.chart.generate_async(coin=name, data=series)
+
+        if not chart_url:
+
+            logger.info("Running Chart with Image backend.")
+
+            chart_url = await self.chart.generate_async(coin=name, data=series, backend='image')
+
+        return self._details(name, series, chart_url)
+
+    def _details(self, name, series, chart_url):
+        """
+        Assembles the details of a coin once
+        its chart is generated.
+        """
+        logger.info(f' → Chart generated: {chart_url}')
+
+        related = []
+
+        chart_title = self.chart.generate_title(coin=name, data=series)
+
+        try:
+            related = self.comparison_results[name.lower()][:10]
+
+            logger.info(related)
+            for related_coin in related:
+                related_coin['url'] = self.__fetch_latest_post_url(related_coin['name'])
+        except KeyError:
+            related = []
+
+        except AttributeError:
+            pass
+
+        details = {
+            'prices': series,
+            'chart': {
+                "url": chart_url,
+                "caption": chart_title,
+                "source": "CoinMarketCap.com"
+            }
+        }
+        return details
+
     @cached(max_age=60*60*10)
     def text(self, text, limit):
         """
@@ -263,75 +278,230 @@ class Crypto:
 
         logger.info('Running skill. Input size: {} characters'.format(len(text)))
 
-        findings = self.regex_crypto_currency_finder(text)
+        with STAGE_SECONDS.time(stage='text'):
+            findings = self.regex_crypto_currency_finder(text)
 
-        sorted_findings = sorted(
-            [{
-                'coin': d['cryptocurrency'],
-                'n': len(d['findings'])
-            } for d in findings],
-            key=lambda x: x['n'],
-            reverse=True)
-        top_coins = [x['coin'] for x in sorted_findings[:limit]]
+            results = []
+            for finding in self._top_findings(findings, limit):
+                details = self._coin_details(
+                    coin=finding['cryptocurrency'], name=finding['name'])
+
+                results.append({
+                    'id': finding['cryptocurrency'],
+                    'name': finding['name'],
+                    'matches': finding['findings'],
+                    **details
+                })
+
+        return results
+
+    async def text_async(self, text, limit, findings=None):
+        """
+        Same as text(), but historic data for all top
+        coins is fetched concurrently and without blocking
+        the event loop, using AsyncCoinMarketCap(). Their
+        charts are then rendered concurrently in the
+        chart process pool. Coins whose prices can't be
+        collected are left out of the results.
+
+        Parameters
+        ----------
+        text: str
+            Textual content to search for cryptocurrencies.
+        limit: int
+            Limits regex output to value of int.
+
+        findings: list, default None
+            Output of regex_crypto_currency_finder()
+            for the text. It is looked up when None.
+
+        Returns
+        -------
+        result: Array of Objects
+            Same as the output of text().
+        """
+        logger.info('Running skill. Input size: {} characters'.format(len(text)))
+
+        with STAGE_SECONDS.time(stage='text'):
+            if findings is None:
+                findings = await self.regex_crypto_currency_finder.call_async(self, text)
+
+            findings = self._top_findings(findings, limit)
+
+            coins = list({finding['cryptocurrency'] for finding in findings})
+            with STAGE_SECONDS.time(stage='historic'):
+                series = await asyncio.gather(*[self._historic_async(coin) for coin in coins])
+            series = dict(zip(coins, series))
+
+            #
+            #  Coins whose prices could not be
+            #  collected are left out.
+            #
+            findings = [f for f in findings if series[f['cryptocurrency']] is not None]
+
+            #
+            #  Charts of all coins are rendered
+            #  concurrently.
+            #
+            with STAGE_SECONDS.time(stage='chart'):
+                details = await asyncio.gather(*[
+                    self._coin_details_async(
+                        coin=finding['cryptocurrency'], name=finding['name'],
+                        series=series[finding['cryptocurrency']])
+                    for finding in findings
+                ])
+
+            results = []
+            for finding, details in zip(findings, details):
+                results.append({
+                    'id': finding['cryptocurrency'],
+                    'name': finding['name'],
+                    'matches': finding['findings'],
+                    **details
+                })
+
+        return results
+
+    def iter_batch(self, documents):
+        """
+        Runs detection over many documents, yielding
+        the results of each document as soon as they
+        are ready. Every document is scanned once and
+        prices and charts are collected only once for
+        each coin found across all documents.
+
+        Parameters
+        ----------
+        documents: list
+            List of dictionaries with the keys `id`, `text`
+            and, optionally, `limit` (default 3).
+
+        Yields
+        ------
+        tuple
+            Tuples of (document ID, results), in which
+            results are the same as the output of text().
+        """
+        logger.info('Running skill in batch. Documents: {}'.format(len(documents)))
+
+        details = {}
+        for document in documents:
+            findings = self.regex_crypto_currency_finder(document['text'])
+
+            results = []
+            for finding in self._top_findings(findings, document.get('limit', 3)):
+                coin = finding['cryptocurrency']
+                if coin not in details:
+                    details[coin] = self._coin_details(coin=coin, name=finding['name'])
+
+                results.append({
+                    'id': coin,
+                    'name': finding['name'],
+                    'matches': finding['findings'],
+                    **details[coin]
+                })
 
-        top_findings = [
-            d for d in findings if d['cryptocurrency'] in top_coins
+            yield document['id'], results
+
+    async def iter_batch_async(self, documents):
+        """
+        Same as iter_batch(), but without blocking the
+        event loop. Documents are scanned first. Then, for
+        each top coin of all documents, a task fetches its
+        historic data using AsyncCoinMarketCap() and renders
+        its chart in the chart process pool. Results of
+        each document are yielded as soon as the tasks of
+        its own coins are done. Coins whose prices can't
+        be collected are left out.
+
+        Parameters
+        ----------
+        documents: list
+            List of dictionaries with the keys `id`, `text`
+            and, optionally, `limit` (default 3).
+
+        Yields
+        ------
+        tuple
+            Tuples of (document ID, results), in which
+            results are the same as the output of text().
+        """
+        logger.info('Running skill in batch. Documents: {}'.format(len(documents)))
+
+        findings = [
+            self._top_findings(
+                await self.regex_crypto_currency_finder.call_async(self, document['text']),
+                document.get('limit', 3))
+            for document in documents
         ]
 
-        results = []
+        names = {}
+        for document_findings in findings:
+            for finding in document_findings:
+                names.setdefault(finding['cryptocurrency'], finding['name'])
+
+        async def collect(coin, name):
+            with STAGE_SECONDS.time(stage='historic'):
+                series = await self._historic_async(coin)
+            if series is None:
+                return None
+
+            return await self._coin_details_async(coin=coin, name=name, series=series)
+
+        #
+        #  Prices and charts of all coins are collected
+        #  concurrently; documents only wait for the
+        #  prices and charts of their own coins.
+        #
+        details = {
+            coin: asyncio.ensure_future(collect(coin, name))
+            for coin, name in names.items()
+        }
+        try:
+            for document, document_findings in zip(documents, findings):
+                results = []
+                for finding in document_findings:
+                    coin_details = await details[finding['cryptocurrency']]
+                    if coin_details is None:
+                        continue
 
-        for finding in top_findings:
+                    results.append({
+                        'id': finding['cryptocurrency'],
+                        'name': finding['name'],
+                        'matches': finding['findings'],
+                        **coin_details
+                    })
 
-            logger.info("Running Chart with Plotly backend.")
-            
-            chart_url = self.chart.generate(
-                coin=finding['name'],
-                data=self._collect_coin_data(
-                    coin=finding['cryptocurrency'], 
-                    dates_as_strings=False))
-            
-            if not chart_url:
+                yield document['id'], results
+        finally:
+            for task in details.values():
+                task.cancel()
 
-                logger.info("Running Chart with Image backend.")
+    def batch(self, documents):
+        """
+        Runs detection over many documents at once.
+        See iter_batch().
 
-                self.chart = Chart(backend='image')
-                chart_url = self.chart.generate(
-                    coin=finding['name'],
-                    data=self._collect_coin_data(
-                        coin=finding['cryptocurrency'], 
-                        dates_as_strings=False))
-            
-            logger.info(f' → Chart generated: {chart_url}')
-            
-            related = []
+        Parameters
+        ----------
+        documents: list
+            List of dictionaries with the keys `id`, `text`
+            and, optionally, `limit` (default 3).
+
+        Returns
+        -------
+        results: dict
+            Dictionary keyed by document ID. Values are
+            the same as the output of text().
+        """
+        return dict(self.iter_batch(documents))
 
-            chart_title = self.chart.generate_title(
-                coin=finding['name'],data=self._collect_coin_data(
-                    coin=finding['cryptocurrency'], dates_as_strings=False))
-
-            try:
-                related = self.comparison_results[finding['name'].lower()][:10]
-
-                logger.info(related)
-                for coin in related:
-                    coin['url'] = self.__fetch_latest_post_url(coin['name'])
-            except KeyError:
-                related = []
-
-            except AttributeError:
-                pass
-            
-            results.append({
-                'id': finding['cryptocurrency'],
-                'name': finding['name'],
-                'matches': finding['findings'],
-                'prices': self._collect_coin_data(
-                    coin=finding['cryptocurrency']),
-                'chart': {
-                    "url": chart_url,
-                    "caption": chart_title,
-                    "source": "CoinMarketCap.com"
-                }
-            })
-                    
-        return results
\ No newline at end of file
+    async def batch_async(self, documents):
+        """
+        Same as batch(), but without blocking the
+        event loop. See iter_batch_async().
+        """
+        return {
+            document_id: results
+            async for document_id, results in self.iter_batch_async(documents)
+        }
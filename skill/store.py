@@ -0,0 +1,196 @@
+"""
+Persistent, on-disk store of daily cryptocurrency
+prices backed by SQLite.
+"""
+import os
+import sqlite3
+import threading
+
+from datetime import date, timedelta
+from skill.series import PriceSeries
+
+
+class PriceStore:
+    """
+    Keeps every daily record ever fetched from
+    CoinMarketCap, alongside the date range that was
+    requested for each coin. Ranges that were already
+    requested are served from disk; only the days
+    outside them have to be fetched again.
+
+    The database uses write-ahead logging, so it can
+    be shared by several worker processes.
+
+    Parameters
+    ----------
+    path: str, default os.getenv('PRICE_STORE_PATH', 'data/prices.sqlite')
+        Location of the SQLite database. It is created
+        on first use.
+    """
+    def __init__(self, path=os.getenv('PRICE_STORE_PATH', 'data/prices.sqlite')):
+        self.path = path
+
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """
+        SQLite connection, opened on first use.
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS prices (
+                    coin TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL,
+                    volume REAL, market_cap REAL,
+                    PRIMARY KEY (coin, date)
+                )""")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS coverage (
+                    coin TEXT PRIMARY KEY,
+                    start TEXT NOT NULL,
+                    stop TEXT NOT NULL
+                )""")
+            connection.commit()
+            self._connection = connection
+
+        return self._connection
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def coverage(self, coin):
+        """
+        Date range already requested for a coin.
+
+        Parameters
+        ----------
+        coin: str
+            Website slug of the coin.
+
+        Returns
+        -------
+        tuple or None
+            Tuple of (start, stop) datetime.date
+            objects, or None if nothing is stored.
+        """
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT start, stop FROM coverage WHERE coin = ?', (coin,)).fetchone()
+
+        if row is None:
+            return None
+
+        return tuple(date(*map(int, value.split('-'))) for value in row)
+
+    def missing(self, coin, start, stop):
+        """
+        Date ranges that have to be fetched to answer a
+        request. Ranges are contiguous with the coverage
+        of the coin, so that it never has gaps. The last
+        covered day is fetched again if it is today, as
+        it may have been incomplete when it was stored.
+
+        Parameters
+        ----------
+        coin: str
+            Website slug of the coin.
+
+        start, stop: datetime.date
+            Requested range, inclusive.
+
+        Returns
+        -------
+        list
+            List of (start, stop) tuples.
+        """
+        covered = self.coverage(coin)
+        if covered is None:
+            return [(start, stop)]
+
+        ranges = []
+        if start < covered[0]:
+            ranges.append((start, covered[0] - timedelta(days=1)))
+        if stop > covered[1] or (stop == covered[1] and stop >= date.today()):
+            ranges.append((covered[1], stop))
+
+        return ranges
+
+    def save(self, coin, series, start, stop):
+        """
+        Stores a series and extends the coverage of the
+        coin with the range it was requested for.
+
+        Parameters
+        ----------
+        coin: str
+            Website slug of the coin.
+
+        series: PriceSeries
+            Records to store. Existing records for
+            the same days are replaced.
+
+        start, stop: datetime.date
+            Range the series was requested for.
+        """
+        rows = [
+            (coin, r['date'], r['open'], r['high'], r['low'],
+             r['close'], r['volume'], r['market_cap'])
+            for r in series
+        ]
+        with self._lock:
+            connection = self.connection
+            covered = connection.execute(
+                'SELECT start, stop FROM coverage WHERE coin = ?', (coin,)).fetchone()
+            if covered:
+                start = min(start.isoformat(), covered[0])
+                stop = max(stop.isoformat(), covered[1])
+            else:
+                start, stop = start.isoformat(), stop.isoformat()
+
+            with connection:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                connection.execute(
+                    'INSERT OR REPLACE INTO coverage VALUES (?, ?, ?)', (coin, start, stop))
+
+    def load(self, coin, start, stop):
+        """
+        Loads stored records within a date range.
+
+        Parameters
+        ----------
+        coin: str
+            Website slug of the coin.
+
+        start, stop: datetime.date
+            Range to load, inclusive.
+
+        Returns
+        -------
+        PriceSeries
+            Stored records in ascending date order.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                'SELECT date, open, high, low, close, volume, market_cap FROM prices '
+                'WHERE coin = ? AND date BETWEEN ? AND ? ORDER BY date',
+                (coin, start.isoformat(), stop.isoformat())).fetchall()
+
+        columns = list(zip(*rows)) or [[]] * 7
+        values = [[float('nan') if v is None else v for v in column] for column in columns[1:]]
+        return PriceSeries(columns[0], *values)
@@ -99,3 +99,74 @@ class LossFunctions:
             of the original data.
         """
         return np.round(np.square(np.subtract(A, B)).mean(), 2)
+
+
+class SpanMetrics:
+    """
+    Metrics to evaluate the spans found by search
+    algorithms against labeled spans. Spans are
+    tuples of (cryptocurrency, start, stop).
+
+    Methods
+    -------
+    spans:
+        Spans found by a matcher.
+    precision_recall:
+        Precision, recall and F1 score.
+    """
+    @staticmethod
+    def spans(results):
+        """
+        Extracts spans from the output of
+        Crypto().regex_crypto_currency_finder().
+
+        Parameters
+        ----------
+        results: list
+            List of dictionaries with the keys
+            `cryptocurrency` and `findings`.
+
+        Returns
+        -------
+        set
+            Set of (cryptocurrency, start, stop) tuples.
+        """
+        found = set()
+        for result in results:
+            for finding in result['findings']:
+                start = finding.get('name_start', finding.get('symbol_start'))
+                stop = finding.get('name_end', finding.get('symbol_end'))
+                found.add((result['cryptocurrency'], start, stop))
+
+        return found
+
+    @staticmethod
+    def precision_recall(predicted, expected):
+        """
+        Calculates precision, recall and F1 score
+        of predicted spans.
+
+        Parameters
+        ----------
+        predicted, expected: iterable
+            Iterables with one set of spans per
+            document, for the predicted (found)
+            and expected (labeled) spans.
+
+        Returns
+        -------
+        tuple
+            Tuple of floats (precision, recall, f1)
+            in the domain [0, 1].
+        """
+        true_positives = n_predicted = n_expected = 0
+        for found, labeled in zip(predicted, expected):
+            true_positives += len(set(found) & set(labeled))
+            n_predicted += len(found)
+            n_expected += len(labeled)
+
+        precision = true_positives / n_predicted if n_predicted else 0.0
+        recall = true_positives / n_expected if n_expected else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+        return precision, recall, f1
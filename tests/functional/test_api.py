@@ -6,8 +6,11 @@ import json
 import plotly
 import unittest
 
+from unittest import mock
 from tests.data import article_data
 from skill.api.server import Server
+from skill.profiling import RequestProfiler
+from skill.artifacts import default_store
 
 
 class CryptoTestCase(unittest.TestCase):
@@ -106,4 +109,83 @@ class CryptoTestCase(unittest.TestCase):
         """
         _, response = self.server.post('/detect?text=foo')
         self.assertTrue(response.status == 400)
-    
\ No newline at end of file
+    
+    def test_batch_returns_results_keyed_by_id(self):
+        """
+        /detect/batch returns results keyed by document ID.
+        """
+        data = {
+            'documents': [
+                {'id': 'a', 'text': 'Bitcoin is up.'},
+                {'id': 'b', 'text': 'Litecoin and Bitcoin are down.', 'limit': 1}
+            ]
+        }
+        _, response = self.server.post('/detect/batch', data=json.dumps(data))
+
+        self.assertTrue(response.json.get('success'))
+        self.assertEqual(sorted(response.json.get('results').keys()), ['a', 'b'])
+        self.assertEqual(len(response.json.get('results')['b']), 1)
+
+    def test_batch_requires_documents(self):
+        """
+        /detect/batch requires a list of documents with `id` and `text`.
+        """
+        _, response = self.server.post('/detect/batch', data=json.dumps({'foo': 'bar'}))
+        self.assertTrue(response.status == 400)
+
+        data = {'documents': [{'text': 'Bitcoin'}]}
+        _, response = self.server.post('/detect/batch', data=json.dumps(data))
+        self.assertTrue(response.status == 400)
+
+    def test_batch_streams_ndjson(self):
+        """
+        /detect/batch streams one JSON line per document when asked for NDJSON.
+        """
+        data = {
+            'documents': [
+                {'id': 'a', 'text': 'Bitcoin is up.'},
+                {'id': 'b', 'text': 'Nothing to see here.'}
+            ]
+        }
+        _, response = self.server.post('/detect/batch', data=json.dumps(data),
+                                       headers={'Accept': 'application/x-ndjson'})
+
+        self.assertTrue(response.status == 200)
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual([line['id'] for line in lines], ['a', 'b'])
+        self.assertEqual(lines[1]['results'], [])
+
+    def test_charts_are_served_with_etag(self):
+        """
+        /charts serves stored charts with an ETag and answers 304 when it matches.
+        """
+        key = default_store().put(b'\x89PNG chart')
+
+        _, response = self.server.get(f'/charts/{key}.png')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Type'], 'image/png')
+        self.assertEqual(response.headers['ETag'], f'"{key}"')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+
+        _, response = self.server.get(f'/charts/{key}.png',
+                                      headers={'If-None-Match': f'"{key}"'})
+        self.assertEqual(response.status, 304)
+
+        _, response = self.server.get(f'/charts/{"0" * 40}.png')
+        self.assertEqual(response.status, 404)
+
+    def test_profiled_requests_scan_the_text(self):
+        """
+        /detect profiles the matcher scan even for a text seen before.
+        """
+        data = {'text': '\n\n'.join(['Bitcoin is up and Litecoin is down.'] * 500)}
+        self.server.post('/detect', data=json.dumps(data))
+
+        with mock.patch('skill.api.routes.RequestProfiler',
+                        lambda: RequestProfiler(token='secret', top=50)):
+            _, response = self.server.post('/detect', data=json.dumps(data),
+                                           headers={'X-Profile': 'secret'})
+
+        self.assertTrue(response.json.get('success'))
+        functions = [f['function'] for f in response.json['profile']['functions']]
+        assert any('matcher.py' in f and 'finditer' in f for f in functions)
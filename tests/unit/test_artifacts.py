@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the artifact stores.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from skill.artifacts import MemoryArtifactStore, DirectoryArtifactStore, digest
+
+
+class MemoryArtifactStoreTestCase(unittest.TestCase):
+    """
+    Test case for the MemoryArtifactStore() class.
+    """
+    def test_put_returns_digest(self):
+        """
+        MemoryArtifactStore().put() stores artifacts under their digest.
+        """
+        store = MemoryArtifactStore()
+        key = store.put(b'chart')
+
+        assert key == digest(b'chart')
+        assert store.get(key) == b'chart'
+        assert store.put(b'chart') == key and len(store) == 1
+
+    def test_least_recently_used_artifact_is_evicted(self):
+        """
+        MemoryArtifactStore() evicts the least recently used artifact when full.
+        """
+        store = MemoryArtifactStore(max_bytes=20)
+        a = store.put(b'a' * 8)
+        b = store.put(b'b' * 8)
+        store.get(a)
+        c = store.put(b'c' * 8)
+
+        assert a in store and c in store
+        assert b not in store
+        assert store.size == 16
+
+
+class DirectoryArtifactStoreTestCase(unittest.TestCase):
+    """
+    Test case for the DirectoryArtifactStore() class.
+    """
+    def setUp(self):
+        """
+        Creates a temporary directory for artifacts.
+        """
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """
+        Removes the temporary directory.
+        """
+        shutil.rmtree(self.directory)
+
+    def test_artifacts_are_shared_between_stores(self):
+        """
+        DirectoryArtifactStore() artifacts written by one store are read by another.
+        """
+        key = DirectoryArtifactStore(path=self.directory).put(b'chart')
+
+        store = DirectoryArtifactStore(path=self.directory)
+        assert store.get(key) == b'chart'
+        assert os.path.exists(os.path.join(self.directory, key[:2], key))
+
+    def test_oldest_artifacts_are_evicted(self):
+        """
+        DirectoryArtifactStore() deletes the oldest files when full.
+        """
+        store = DirectoryArtifactStore(path=self.directory, max_bytes=20)
+        a = store.put(b'a' * 8)
+        b = store.put(b'b' * 8)
+        os.utime(store._location(a), (0, 0))
+        c = store.put(b'c' * 8)
+
+        assert a not in store
+        assert b in store and c in store
+
+    def test_invalid_keys_are_rejected(self):
+        """
+        DirectoryArtifactStore().get() ignores keys that are not digests.
+        """
+        store = DirectoryArtifactStore(path=self.directory)
+
+        assert store.get('../../etc/passwd') is None
+        assert '../../etc/passwd' not in store
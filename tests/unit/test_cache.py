@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the Cache class.
+"""
+import os
+import time
+import shutil
+import asyncio
+import threading
+import fnmatch
+import tempfile
+import unittest
+
+from skill.cache import Cache, InFlight, SQLiteBackend, RedisBackend, MAX_KEY_LENGTH
+
+
+class LocalRedis:
+    """
+    In-memory stand-in for a Redis client.
+    """
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires < time.time():
+            return None
+
+        return value
+
+    def set(self, key, value, px=None):
+        self.data[key] = (value, None if px is None else time.time() + px / 1000)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def scan_iter(self, match='*'):
+        return [k for k in list(self.data) if fnmatch.fnmatch(k, match)]
+
+
+class CacheTestCase(unittest.TestCase):
+    """
+    Test case for the Cache() class.
+    """
+    def setUp(self):
+        """
+        Creates a small cache for every test.
+        """
+        self.cache = Cache('test', maxsize=2)
+        self.calls = []
+
+    def test_decorator_memoizes_calls(self):
+        """
+        Cache() decorator calls the function once per distinct argument.
+        """
+        @self.cache(max_age=60)
+        def square(x, power=2):
+            self.calls.append(x)
+            return x ** power
+
+        assert square(3) == 9
+        assert square(x=3) == 9
+        assert square(3, power=2) == 9
+        assert self.calls == [3]
+        assert self.cache.stats()['hits'] == 2
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """
+        Cache() evicts the least recently used entry when full.
+        """
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        assert self.cache.get('a') == 1
+        assert self.cache.get('b') is None
+        assert self.cache.stats()['evictions'] == 1
+        assert self.cache.stats()['size'] == 2
+
+    def test_entries_expire(self):
+        """
+        Cache() entries expire after their time-to-live.
+        """
+        self.cache.set('a', 1, max_age=0.01)
+        time.sleep(0.02)
+
+        assert self.cache.get('a') is None
+        assert self.cache.stats()['size'] == 0
+
+    def test_ttl_reports_remaining_time(self):
+        """
+        Cache().ttl() returns the seconds until an entry expires.
+        """
+        self.cache.set('a', 1, max_age=60)
+        self.cache.set('b', 2)
+
+        assert 59 < self.cache.ttl('a') <= 60
+        assert self.cache.ttl('b') == float('inf')
+        assert self.cache.ttl('c') is None
+
+    def test_decorator_refresh_replaces_entry(self):
+        """
+        Cache() decorator refresh() recomputes an entry before it expires.
+        """
+        @self.cache(max_age=60)
+        def square(x):
+            self.calls.append(x)
+            return x ** 2
+
+        square(3)
+        self.cache.set(square.key(3), 9, max_age=1)
+        assert square.ttl(3) <= 1
+
+        assert square.refresh(3) == 9
+        assert square.ttl(x=3) > 59
+        assert self.calls == [3, 3]
+
+    def test_concurrent_misses_share_one_call(self):
+        """
+        Cache() decorator calls the function once for concurrent misses of a key.
+        """
+        @self.cache(max_age=60)
+        def fetch(coin):
+            self.calls.append(coin)
+            time.sleep(0.05)
+            return {'coin': coin}
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(fetch('bitcoin')))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert self.calls == ['bitcoin']
+        assert results == [{'coin': 'bitcoin'}] * 8
+        assert self.cache.stats()['coalesced'] == 7
+
+    def test_failed_flight_raises_for_every_caller(self):
+        """
+        Cache().flight() shares exceptions and lets the next caller try again.
+        """
+        def fail():
+            self.calls.append('fail')
+            raise ValueError('upstream is down')
+
+        with self.assertRaises(ValueError):
+            self.cache.flight('a', fail)
+
+        assert self.cache.flight('a', lambda: 1) == 1
+
+    def test_long_keys_are_hashed(self):
+        """
+        Cache().make_key() hashes long arguments, such as whole articles.
+        """
+        key = self.cache.make_key('text', ('Bitcoin ' * 10000, 3))
+        other = self.cache.make_key('text', ('Litecoin ' * 10000, 3))
+
+        assert len(key) < MAX_KEY_LENGTH
+        assert key != other
+
+
+class InFlightTestCase(unittest.TestCase):
+    """
+    Test case for the InFlight() class.
+    """
+    def setUp(self):
+        """
+        Creates an event loop for every test.
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_concurrent_callers_await_one_task(self):
+        """
+        InFlight().run() starts one task for concurrent callers of a key.
+        """
+        calls = []
+        cache = Cache('test.in_flight')
+        in_flight = InFlight(cache)
+
+        async def fetch():
+            calls.append('bitcoin')
+            await asyncio.sleep(0.01)
+            return 'bitcoin series'
+
+        async def herd():
+            return await asyncio.gather(*[in_flight.run('bitcoin', fetch) for _ in range(5)])
+
+        assert self.loop.run_until_complete(herd()) == ['bitcoin series'] * 5
+        assert calls == ['bitcoin']
+        assert cache.coalesced == 4
+        assert len(in_flight) == 0
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        """
+        InFlight().run() keeps the shared task running when a caller is cancelled.
+        """
+        in_flight = InFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return 'done'
+
+        async def herd():
+            first = asyncio.ensure_future(in_flight.run('key', fetch))
+            second = asyncio.ensure_future(in_flight.run('key', fetch))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert self.loop.run_until_complete(herd()) == 'done'
+
+
+class SharedBackendTestCase(unittest.TestCase):
+    """
+    Test case for the backends shared by worker processes.
+    """
+    def setUp(self):
+        """
+        Creates a temporary directory for SQLite files.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+
+    def tearDown(self):
+        """
+        Removes the temporary directory.
+        """
+        shutil.rmtree(self.directory)
+
+    def test_sqlite_backend_is_shared_between_caches(self):
+        """
+        SQLiteBackend() entries written by one cache are read by another.
+        """
+        calls = []
+
+        def create():
+            cache = Cache('shared', backend=SQLiteBackend('shared', path=self.path))
+
+            @cache(max_age=60)
+            def fetch(coin):
+                calls.append(coin)
+                return {'coin': coin}
+
+            return fetch
+
+        #
+        #  Each cache stands for a worker
+        #  with its own connection.
+        #
+        worker_a, worker_b = create(), create()
+
+        assert worker_a('bitcoin') == {'coin': 'bitcoin'}
+        assert worker_b('bitcoin') == {'coin': 'bitcoin'}
+        assert calls == ['bitcoin']
+
+    def test_sqlite_backend_evicts_least_recently_used(self):
+        """
+        SQLiteBackend() keeps at most `maxsize` entries per namespace.
+        """
+        cache = Cache('bounded', backend=SQLiteBackend('bounded', path=self.path, maxsize=2))
+        for i in range(5):
+            cache.set(f'key-{i}', i)
+
+        assert len(cache.backend) == 2
+        assert cache.get('key-4') == 4
+        assert cache.stats()['evictions'] == 3
+
+    def test_sqlite_backend_reads_rarely_write(self):
+        """
+        SQLiteBackend() only writes on reads of entries not touched recently.
+        """
+        backend = SQLiteBackend('reads', path=self.path, maxsize=10, touch_after=60)
+        cache = Cache('reads', backend=backend)
+        cache.set('key', 1)
+
+        changes = backend.connection.total_changes
+        for _ in range(10):
+            assert cache.get('key') == 1
+        assert backend.connection.total_changes == changes
+
+        cache.set('other', 2)
+        assert backend.connection.total_changes == changes + 1
+
+        backend.touch_after = 0
+        cache.get('key')
+        assert backend.connection.total_changes == changes + 2
+
+    def test_redis_backend_with_local_stand_in(self):
+        """
+        RedisBackend() stores, expires and clears entries through its client.
+        """
+        client = LocalRedis()
+        cache = Cache('redis', backend=RedisBackend('redis', client=client))
+
+        cache.set('redis:a', [1, 2, 3], max_age=60)
+        cache.set('redis:b', 'short', max_age=0.01)
+        time.sleep(0.02)
+
+        assert cache.get('redis:a') == [1, 2, 3]
+        assert cache.get('redis:b') is None
+
+        cache.clear()
+        assert client.data == {}
+
+
+class OffloadTestCase(unittest.TestCase):
+    """
+    Test case for the Cache().offload() method.
+    """
+    def setUp(self):
+        """
+        Creates an event loop for every test.
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_shared_backends_are_called_off_the_loop(self):
+        """
+        Cache().offload() runs calls to shared backends in another thread.
+        """
+        threads = []
+
+        class RecordingRedis(LocalRedis):
+            def get(self, key):
+                threads.append(threading.get_ident())
+                return super().get(key)
+
+        shared = Cache('offload.shared', backend=RedisBackend('offload', client=RecordingRedis()))
+        shared.set('offload:a', 1)
+
+        assert self.loop.run_until_complete(shared.offload(shared.get, 'offload:a')) == 1
+        assert threads and threading.get_ident() not in threads
+
+        local = Cache('offload.local')
+        local.set('a', 1)
+        assert self.loop.run_until_complete(local.offload(local.get, 'a')) == 1
+
+    def test_decorator_call_async_memoizes_calls(self):
+        """
+        Cache()(...).call_async() shares entries with synchronous calls.
+        """
+        calls = []
+        cache = Cache('offload.decorator', backend=RedisBackend('decorator', client=LocalRedis()))
+
+        @cache(max_age=60)
+        def fetch(coin):
+            calls.append(coin)
+            return {'coin': coin}
+
+        assert self.loop.run_until_complete(fetch.call_async('bitcoin')) == {'coin': 'bitcoin'}
+        assert fetch('bitcoin') == {'coin': 'bitcoin'}
+        assert self.loop.run_until_complete(fetch.call_async('bitcoin')) == {'coin': 'bitcoin'}
+        assert calls == ['bitcoin']
@@ -2,17 +2,35 @@
 Tests for the Chat class.
 """
 import os
+import re
 import json
+import time
 import random
 import plotly
 import unittest
 import requests
 
-from skill.chart import Chart
+from skill.chart import Chart, ImageRenderer, render_pool
 from skill.skill import Crypto
+from skill.artifacts import default_store
 from tests.data import plot_data
+from skill.series import PriceSeries
 from requests.auth import HTTPBasicAuth
 
+def hung_chart(coin, series):
+    """
+    Backend that never finishes in time.
+    """
+    time.sleep(60)
+
+
+def quick_chart(coin, series):
+    """
+    Backend that returns an URL right away.
+    """
+    return f'http://google.com/{coin}'
+
+
 class ChartTestCase(unittest.TestCase):
     """
     Test case for the Chart() class.
@@ -93,48 +111,102 @@ class ChartTestCase(unittest.TestCase):
     #     except requests.exceptions.HTTPError:
     #         pass
 
-    def test_chart_generates_url(self):
+    def mock_chart(self):
         """
-        Chart().generates() returns an URL.
+        Chart rendering in the calling thread with a
+        backend that returns random URLs.
         """
+        def mock_plotly(coin, series):
+            return 'http://google.com/{}/{}'.format(coin, random.randint(0, 10**6))
 
-        class ChartMonkeyPatch(Chart):
-            def mock_plotly(self):
-                return 'http://google.com/{}/{}'.format(
-                    self.coin, str(random.randint(0, 10**6)))
-
-        chart = ChartMonkeyPatch()
-        chart.backend = chart.mock_plotly
+        chart = Chart(workers=0)
+        chart.available_backends['mock'] = mock_plotly
+        chart.backend = 'mock'
+        return chart
 
-        result = chart.generate(coin='Bitcoin', data=plot_data)
+    def test_chart_generates_url(self):
+        """
+        Chart().generates() returns an URL.
+        """
+        result = self.mock_chart().generate(coin='Bitcoin', data=plot_data)
 
-        if not result:
-            pass
-        else:
-            assert isinstance(result, str)
-            assert 'http' in result
+        assert isinstance(result, str)
+        assert 'http' in result
 
     def test_chart_cache(self):
         """
         Chart().generates() returns same chart within certain caching period
         """
-        class ChartMonkeyPatch(Chart):
-            def mock_plotly(self):
-                return 'http://google.com/{}/{}'.format(
-                    self.coin, str(random.randint(0, 10**6)))
-
-        chart = ChartMonkeyPatch()
-        chart.backend = chart.mock_plotly
+        chart = self.mock_chart()
 
         resultA = chart.generate(coin='Bitcoin', data=plot_data)
         resultB = chart.generate(coin='Bitcoin', data=plot_data)
         resultC = chart.generate(coin='litecoin', data=plot_data)
 
-        if not resultC:
-            pass
-        else:
-            assert resultA == resultB
-            assert resultB != resultC
+        assert resultA == resultB
+        assert resultB != resultC
+
+    def test_chart_cache_is_shared_by_instances(self):
+        """
+        Chart().generate() entries are keyed by content, not by instance.
+        """
+        chart = self.mock_chart()
+        result = chart.generate(coin='Ethereum', data=plot_data)
+
+        assert self.mock_chart().generate(coin='Ethereum', data=PriceSeries.from_dict(plot_data)) == result
+        assert chart.generate(coin='Ethereum', data=plot_data, backend='image') != result
+        assert not hasattr(chart, 'coin') and not hasattr(chart, 'data')
+
+    def test_evicted_artifacts_are_rendered_again(self):
+        """
+        Chart().generate() renders charts again when their artifact was evicted.
+        """
+        chart = Chart(backend='image', workers=0)
+        url = chart.generate(coin='Dogecoin', data=plot_data)
+        default_store().max_bytes, max_bytes = 0, default_store().max_bytes
+        try:
+            default_store().put(b'other chart')
+        finally:
+            default_store().max_bytes = max_bytes
+
+        assert url[len('/charts/'):-len('.png')] not in default_store()
+        assert chart.generate(coin='Dogecoin', data=plot_data) == url
+        assert url[len('/charts/'):-len('.png')] in default_store()
+
+    def test_timeouts_recycle_the_pool(self):
+        """
+        Chart().refresh() frees the workers of a chart that timed out.
+        """
+        chart = Chart(workers=1, timeout=0.5)
+        chart.available_backends.update(hung=hung_chart, quick=quick_chart)
+
+        pool = render_pool(1, 'hung')
+        pool.submit(quick_chart, 'Bitcoin', None).result()
+        processes = list(pool._processes.values())
+
+        assert chart.refresh(coin='Bitcoin', data=plot_data, backend='hung') is None
+        assert render_pool(1, 'hung') is not pool
+        for process in processes:
+            process.join(timeout=5)
+            assert not process.is_alive()
+
+        started = time.perf_counter()
+        assert chart.refresh(coin='Bitcoin', data=plot_data, backend='quick') == \
+            'http://google.com/Bitcoin'
+        assert time.perf_counter() - started < 5
+
+    def test_failures_are_retried_soon(self):
+        """
+        Chart().refresh() caches failed charts for `retry_after` seconds only.
+        """
+        chart = Chart(workers=1, timeout=0.5, retry_after=30)
+        chart.available_backends.update(hung=hung_chart, quick=quick_chart)
+
+        assert chart.refresh(coin='Litecoin', data=plot_data, backend='hung') is None
+        assert 0 < chart.ttl(coin='Litecoin', data=plot_data, backend='hung') <= 30
+
+        chart.refresh(coin='Litecoin', data=plot_data, backend='quick')
+        assert chart.ttl(coin='Litecoin', data=plot_data, backend='quick') > 30
 
     def test_wrong_backend_raises_value_error(self):
         """
@@ -151,9 +223,39 @@ class ChartTestCase(unittest.TestCase):
 
     def test_s3_image_chart(self):
         """
-        Chart(backend='image').generate() generates an image plot and returns S3 URL.
+        Chart(backend='image').generate() stores an image plot and returns its URL.
         """
         chart = Chart(backend='image').generate(coin='Bitcoin', data=plot_data)
 
-        assert chart == "https://s3.amazonaws.com/bertie-ai-skill-crypto-values/bitcoin-overall-closing-prices-from-november-01-2017-to-july-10-2018.png"
+        assert re.match(r'^/charts/[0-9a-f]{40}\.png$', chart)
+        assert chart[len('/charts/'):-len('.png')] in default_store()
+
+
+
+class ImageRendererTestCase(unittest.TestCase):
+    """
+    Test case for the ImageRenderer() class.
+    """
+    def test_render_returns_png(self):
+        """
+        ImageRenderer().render() returns PNG bytes.
+        """
+        series = PriceSeries.from_dict(plot_data)
+        image = ImageRenderer().render('Bitcoin Closing Prices', series)
+
+        assert image.startswith(b'\x89PNG')
+
+    def test_render_reuses_figure(self):
+        """
+        ImageRenderer().render() swaps the data of a single figure.
+        """
+        renderer = ImageRenderer()
+        series = PriceSeries.from_dict(plot_data)
+
+        renderer.render('Bitcoin Closing Prices', series)
+        figure, line = renderer.figure, renderer.line
+        renderer.render('Litecoin Closing Prices', series)
 
+        assert renderer.figure is figure and renderer.line is line
+        assert len(renderer.axes.lines) == 1
+        assert renderer.axes.get_title() == 'Litecoin Closing Prices'
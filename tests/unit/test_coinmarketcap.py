@@ -2,10 +2,69 @@
 """
 Tests for the Crypto class.
 """
+import asyncio
 import unittest
 
 from datetime import datetime
-from skill.coinmarketcap import CoinMarketCap
+from skill.coinmarketcap import CoinMarketCap, AsyncCoinMarketCap, _parse_historic
+
+#
+#  Snippet of a historical-data page. Rows are in
+#  descending order and one volume is missing.
+#
+HISTORIC_PAGE = b'''
+<html><body><div class="table-responsive"><table class="table">
+<thead><tr>
+  <th class="text-left">Date</th><th>Open*</th><th>High</th><th>Low</th>
+  <th>Close**</th><th>Volume</th><th>Market Cap</th>
+</tr></thead>
+<tbody>
+<tr class="text-right">
+  <td class="text-left">Jul 10, 2018</td>
+  <td data-format-fiat data-format-value="6739.21">6,739.21</td>
+  <td>6,767.74</td><td>6,320.72</td><td>6,329.95</td>
+  <td>4,052,430,000</td><td>108,379,000,000</td>
+</tr>
+<tr class="text-right">
+  <td class="text-left">Jul 09, 2018</td>
+  <td>6,775.08</td><td>6,838.68</td><td>6,724.34</td><td>6,741.75</td>
+  <td>-</td><td>116,054,000,000</td>
+</tr>
+</tbody></table></div>
+<table><tr><td>Unrelated</td></tr></table>
+</body></html>
+'''
+
+
+class ParseHistoricTestCase(unittest.TestCase):
+    """
+    Test case for the parser of historical-data pages.
+    """
+    def test_parse_historic_returns_sorted_columns(self):
+        """
+        _parse_historic() returns typed columns in ascending date order.
+        """
+        series = _parse_historic(HISTORIC_PAGE)
+
+        assert series.dates_as_strings() == ['2018-07-09', '2018-07-10']
+        assert series.close.tolist() == [6741.75, 6329.95]
+        assert series.open.tolist() == [6775.08, 6739.21]
+        assert series.market_cap.tolist() == [116054000000.0, 108379000000.0]
+
+    def test_parse_historic_missing_values_are_nan(self):
+        """
+        _parse_historic() converts values reported as `-` into NaN.
+        """
+        series = _parse_historic(HISTORIC_PAGE)
+
+        assert series.to_dict(columns=('volume',))['volume'] == [None, 4052430000.0]
+
+    def test_parse_historic_requires_table(self):
+        """
+        _parse_historic() raises ValueError for pages without a table.
+        """
+        with self.assertRaises(ValueError):
+            _parse_historic(b'<html><body><p>Not found</p></body></html>')
 
 
 class CoinMarketCapTestCase(unittest.TestCase):
@@ -69,4 +128,131 @@ class CoinMarketCapTestCase(unittest.TestCase):
         """
         with self.assertRaises(ValueError):
             self.coin_market_cap.current('foobarcoin')
-            
+
+
+class AsyncCoinMarketCapTestCase(unittest.TestCase):
+    """
+    Test case for the AsyncCoinMarketCap() class.
+    """
+    @classmethod
+    def setUpClass(self):
+        """
+        Method that instantiate the Test Case.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.coin_market_cap = AsyncCoinMarketCap()
+
+    @classmethod
+    def tearDownClass(self):
+        """
+        Closes the connection pool and the loop.
+        """
+        self.loop.run_until_complete(self.coin_market_cap.close())
+        self.loop.close()
+
+    def test_listings_return_list(self):
+        """
+        AsyncCoinMarketCap().listings() returns list of currencies.
+        """
+        results = self.loop.run_until_complete(self.coin_market_cap.listings())
+        assert isinstance(results, list)
+
+    def test_historic_data_fetched_concurrently(self):
+        """
+        AsyncCoinMarketCap().historic() can fetch many coins concurrently.
+        """
+        coins = ['bitcoin', 'litecoin']
+        results = self.loop.run_until_complete(asyncio.gather(
+            *[self.coin_market_cap.historic(coin) for coin in coins]))
+
+        for series in results:
+            for record in series:
+                date = datetime.strptime(record['date'], '%Y-%m-%d')
+                assert isinstance(date, datetime)
+
+    def test_raises_value_error_if_coin_doesnt_exist(self):
+        """
+        AsyncCoinMarketCap().current() raises ValueError if coin doesn't exist.
+        """
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(self.coin_market_cap.current('foobarcoin'))
+
+
+#
+#  Excerpt of the listings returned by
+#  the stand-in upstream.
+#
+LISTINGS = [
+    {'id': 1, 'name': 'Bitcoin', 'symbol': 'BTC', 'website_slug': 'bitcoin'},
+    {'id': 2, 'name': 'Litecoin', 'symbol': 'LTC', 'website_slug': 'litecoin'}
+]
+
+
+class StaticPriceStore:
+    """
+    PriceStore() stand-in that has every day.
+    """
+    def missing(self, coin, first, last):
+        return []
+
+    def load(self, coin, first, last):
+        return f'{coin} series'
+
+
+class AsyncCoinIndexTestCase(unittest.TestCase):
+    """
+    Test case for the index of AsyncCoinMarketCap(),
+    without network access.
+    """
+    def setUp(self):
+        """
+        Creates a client whose requests are recorded
+        and answered with LISTINGS.
+        """
+        self.loop = asyncio.new_event_loop()
+        self.coin_market_cap = AsyncCoinMarketCap(price_store=StaticPriceStore())
+        self.requests = []
+
+        async def get(endpoint, url, as_json=True):
+            self.requests.append(endpoint)
+            return {'data': LISTINGS}
+
+        self.coin_market_cap._get = get
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_index_is_kept_until_listings_expire(self):
+        """
+        AsyncCoinMarketCap().index() is only rebuilt when the listings expire.
+        """
+        index = self.loop.run_until_complete(self.coin_market_cap.index())
+        for _ in range(3):
+            assert self.loop.run_until_complete(self.coin_market_cap.index()) is index
+        assert self.requests == ['listings']
+
+        self.coin_market_cap.cache.clear()
+        self.coin_market_cap._index_expires = 0
+        assert self.loop.run_until_complete(self.coin_market_cap.index()) is index
+        assert self.requests == ['listings', 'listings']
+
+    def test_cached_historic_data_skips_the_listings(self):
+        """
+        AsyncCoinMarketCap().historic() finds cached data without reading the listings.
+        """
+        lookups = []
+        listings = self.coin_market_cap.listings
+
+        async def counted():
+            lookups.append(True)
+            return await listings()
+
+        self.coin_market_cap.listings = counted
+
+        for ticker in ('bitcoin', 'bitcoin', 1, 'bitcoin'):
+            series = self.loop.run_until_complete(self.coin_market_cap.historic(ticker))
+            assert series == 'bitcoin series'
+        assert len(lookups) == 1
+
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(self.coin_market_cap.historic('foobarcoin'))
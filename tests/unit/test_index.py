@@ -0,0 +1,72 @@
+"""
+Tests for the CoinIndex class.
+"""
+import unittest
+
+from skill.index import CoinIndex
+
+
+#
+#  Excerpt of CoinMarketCap.listings(). Two coins
+#  share the `BTG` symbol.
+#
+LISTINGS = [
+    {'id': 1, 'name': 'Bitcoin', 'symbol': 'BTC', 'website_slug': 'bitcoin'},
+    {'id': 2, 'name': 'Litecoin', 'symbol': 'LTC', 'website_slug': 'litecoin'},
+    {'id': 2083, 'name': 'Bitcoin Gold', 'symbol': 'BTG', 'website_slug': 'bitcoin-gold'},
+    {'id': 1935, 'name': 'Bitgem', 'symbol': 'BTG', 'website_slug': 'bitgem'}
+]
+
+
+class CoinIndexTestCase(unittest.TestCase):
+    """
+    Test case for the CoinIndex() class.
+    """
+    def setUp(self):
+        """
+        Builds an index of the listings.
+        """
+        self.index = CoinIndex(LISTINGS)
+
+    def test_find_maps_ids_and_slugs(self):
+        """
+        CoinIndex().find() finds coins by ID and by slug.
+        """
+        assert self.index.find(2)['website_slug'] == 'litecoin'
+        assert self.index.find('litecoin')['id'] == 2
+
+    def test_find_raises_for_unknown_coins(self):
+        """
+        CoinIndex().find() raises ValueError for unknown coins.
+        """
+        for coin in (3, 'namecoin', None):
+            with self.assertRaises(ValueError):
+                self.index.find(coin)
+
+    def test_lookups_by_name_and_symbol(self):
+        """
+        CoinIndex() looks coins up by lowercase name and by symbol.
+        """
+        assert self.index.by_name('BITCOIN GOLD')['id'] == 2083
+        assert self.index.by_name('Dogecoin') is None
+        assert [c['id'] for c in self.index.by_symbol('BTG')] == [2083, 1935]
+        assert self.index.by_symbol('DOGE') == []
+
+    def test_columns_follow_listing_order(self):
+        """
+        CoinIndex() exposes parallel columns in listing order.
+        """
+        assert self.index.ids == (1, 2, 2083, 1935)
+        assert self.index.slugs == ('bitcoin', 'litecoin', 'bitcoin-gold', 'bitgem')
+        assert len(self.index) == 4
+        assert 'bitgem' in self.index and 1935 in self.index
+
+    def test_build_reuses_index_of_same_listings(self):
+        """
+        CoinIndex.build() only rebuilds the index when listings change.
+        """
+        assert CoinIndex.build(list(LISTINGS), previous=self.index) is self.index
+
+        refreshed = CoinIndex.build(LISTINGS[:2], previous=self.index)
+        assert refreshed is not self.index
+        assert 'bitgem' not in refreshed
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the Lexicon class.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from skill.lexicon import Lexicon, load_lexicon, fingerprint
+
+
+def listing(*names):
+    """
+    Creates a listing with the same shape as
+    CoinMarketCap.listings().
+    """
+    return [{
+        'id': i,
+        'name': name,
+        'symbol': name[:3].upper(),
+        'website_slug': name.lower()
+    } for i, name in enumerate(names)]
+
+
+class LexiconTestCase(unittest.TestCase):
+    """
+    Test case for the Lexicon() class.
+    """
+    def setUp(self):
+        """
+        Creates a temporary directory for lexicon files.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'lexicon.json')
+        self.looked_up = []
+
+    def tearDown(self):
+        """
+        Removes the temporary directory.
+        """
+        shutil.rmtree(self.directory)
+
+    def is_word(self, name):
+        self.looked_up.append(name)
+        return name == 'Ark'
+
+    def test_dictionary_words_and_undesirable_coins_are_excluded(self):
+        """
+        Lexicon.build() excludes dictionary words and undesirable coins.
+        """
+        lexicon = Lexicon.build(listing('Bitcoin', 'Ark', 'Crypto'), is_word=self.is_word)
+
+        assert [c['name'] for c in lexicon.coins] == ['Bitcoin']
+        assert len(lexicon) == 3
+
+    def test_save_and_load_round_trip(self):
+        """
+        Lexicon().save() writes a file that Lexicon.load() reads back.
+        """
+        coins = listing('Bitcoin', 'Ark')
+        Lexicon.build(coins, is_word=self.is_word).save(self.path)
+        lexicon = Lexicon.load(self.path)
+
+        assert lexicon.fingerprint == fingerprint(coins)
+        assert [c['name'] for c in lexicon.coins] == ['Bitcoin']
+
+    def test_only_new_names_are_looked_up(self):
+        """
+        Lexicon.build() reuses exclusion flags of a previous lexicon.
+        """
+        previous = Lexicon.build(listing('Bitcoin', 'Ark'), is_word=self.is_word)
+        self.looked_up = []
+        Lexicon.build(listing('Bitcoin', 'Ark', 'Litecoin'), previous=previous,
+                      is_word=self.is_word)
+
+        assert self.looked_up == ['Litecoin']
+
+    def test_load_lexicon_reuses_file_for_same_listing(self):
+        """
+        load_lexicon() doesn't rebuild a lexicon for an unchanged listing.
+        """
+        coins = listing('Bitcoin')
+        Lexicon.build(coins, is_word=self.is_word).save(self.path)
+        modified = os.path.getmtime(self.path)
+
+        lexicon = load_lexicon(coins, self.path)
+
+        assert os.path.getmtime(self.path) == modified
+        assert [c['name'] for c in lexicon.coins] == ['Bitcoin']
+
+    def test_missing_file_loads_as_none(self):
+        """
+        Lexicon.load() returns None if there is no lexicon file.
+        """
+        assert Lexicon.load(self.path) is None
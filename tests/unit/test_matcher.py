@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the CoinMatcher class.
+"""
+import unittest
+
+from skill.matcher import CoinMatcher, RegexCoinMatcher, Sentences, chunks, split
+
+
+class CoinMatcherTestCase(unittest.TestCase):
+    """
+    Test case for the CoinMatcher() class.
+    """
+    @classmethod
+    def setUpClass(cls):
+        """
+        Method that instantiates the test case.
+        """
+        cls.coins = (
+            ['Bitcoin', 'Bitcoin Cash', 'Litecoin', '$PAC'],
+            ['BTC', 'BCH', 'LTC', 'PAC'],
+            ['bitcoin', 'bitcoin-cash', 'litecoin', 'paccoin']
+        )
+        cls.matcher = CoinMatcher(*cls.coins)
+
+    def test_plurals_and_symbols_are_found(self):
+        """
+        CoinMatcher().find() finds names, plurals and symbols of the same coin.
+        """
+        results = self.matcher.find('bitcoin bitcoins BTC')
+
+        assert len(results) == 1
+        assert results[0]['cryptocurrency'] == 'bitcoin'
+        assert results[0]['findings'] == [
+            {'name_start': 0, 'name_end': 7, 'sentence_start': 0, 'sentence_end': 20},
+            {'name_start': 8, 'name_end': 16, 'sentence_start': 0, 'sentence_end': 20},
+            {'name_start': 17, 'name_end': 20, 'sentence_start': 0, 'sentence_end': 20}
+        ]
+
+    def test_overlapping_names_are_found(self):
+        """
+        CoinMatcher().find() finds coins whose names overlap.
+        """
+        results = self.matcher.find('Bitcoin Cash')
+
+        assert [r['cryptocurrency'] for r in results] == ['bitcoin', 'bitcoin-cash']
+
+    def test_symbols_are_case_sensitive(self):
+        """
+        CoinMatcher().find() only finds symbols with the same case.
+        """
+        assert self.matcher.find('ltc and btc') == []
+
+        results = self.matcher.find('LTC')
+        assert results[0]['findings'] == [
+            {'symbol_start': 0, 'symbol_end': 3, 'sentence_start': 0, 'sentence_end': 3}
+        ]
+
+    def test_words_are_not_matched_inside_other_words(self):
+        """
+        CoinMatcher().find() respects word boundaries.
+        """
+        assert self.matcher.find('Bitcoinx xLTC') == []
+
+    def test_matches_regex_matcher(self):
+        """
+        CoinMatcher().find() returns the same output as RegexCoinMatcher().find().
+        """
+        reference = RegexCoinMatcher(*self.coins)
+        texts = [
+            '',
+            'Bitcoin Cash, bitcoins and BCH. BTC, LTC',
+            'The $PAC coin ($PAC) and PAC. LTC LTC litecoins Litecoin',
+            'bitcoin\nBITCOIN cash\n\nBitcoin_Cash BCH'
+        ]
+        for text in texts:
+            assert self.matcher.find(text) == reference.find(text)
+
+    def test_findings_point_to_their_sentence(self):
+        """
+        CoinMatcher().find() reports sentence offsets instead of copying the text.
+        """
+        text = 'Markets were calm.  Then Bitcoin rose!\nLTC fell. The end'
+        results = self.matcher.find(text)
+
+        assert all('sentence' not in result for result in results)
+        sentences = [
+            text[f['sentence_start']:f['sentence_end']]
+            for result in results for f in result['findings']
+        ]
+        assert sentences == ['Then Bitcoin rose!', 'LTC fell.']
+
+    def test_sentences_skip_whitespace(self):
+        """
+        Sentences() splits at terminal punctuation and newlines, without whitespace.
+        """
+        text = ' One. Two?! 3.5 coins\n\n  Four '
+        sentences = Sentences(text)
+
+        assert [text[s:e] for s, e in zip(sentences.starts, sentences.ends)] == \
+            ['One.', 'Two?!', '3.5 coins', 'Four']
+        assert sentences.span(7, 9) == (6, 11)
+        assert sentences.span(0, len(text)) == (1, 29)
+
+    def test_split_keeps_offsets(self):
+        """
+        split() cuts text after runs of newlines, keeping chunk offsets.
+        """
+        text = 'Bitcoin rose.\n\nLTC fell.\nEnd'
+        parts = list(split(text))
+
+        assert [chunk for _, chunk in parts] == ['Bitcoin rose.\n\n', 'LTC fell.\n', 'End']
+        assert all(text[offset:offset + len(chunk)] == chunk for offset, chunk in parts)
+
+    def test_incremental_scan_matches_full_scan(self):
+        """
+        CoinMatcher().find() returns the same output with and without chunks.
+        """
+        full = CoinMatcher(*self.coins, incremental=False)
+        article = [
+            'Bitcoin Cash and bitcoins fell.',
+            'LTC rose, unlike BTC.\n',
+            'Litecoin_Cash is not a coin. $PAC is.',
+            '',
+            'bitcoin'
+        ]
+        text = '\n'.join(article)
+        edited = text.replace('unlike BTC', 'like Bitcoin and BTC')
+
+        for document in (text, edited):
+            assert self.matcher.find(document) == full.find(document)
+
+    def test_edits_only_scan_changed_chunks(self):
+        """
+        CoinMatcher().find() scans only the chunks of a document that changed.
+        """
+        matcher = CoinMatcher(*self.coins)
+        paragraphs = [f'Paragraph {i} about Bitcoin and LTC.' for i in range(10)]
+        matcher.find('\n'.join(paragraphs))
+
+        misses = chunks.misses
+        paragraphs[4] = 'A new paragraph about Litecoin.'
+        results = matcher.find('\n'.join(paragraphs))
+
+        assert chunks.misses == misses + 1
+        assert results == CoinMatcher(*self.coins, incremental=False).find('\n'.join(paragraphs))
+
+    def test_full_scans_skip_chunks(self):
+        """
+        CoinMatcher().find() scans without chunks when asked to.
+        """
+        text = 'Bitcoin and LTC.\nBCH.'
+        self.matcher.find(text)
+
+        hits, misses = chunks.hits, chunks.misses
+        assert self.matcher.find(text, incremental=False) == self.matcher.find(text)
+        assert (chunks.hits, chunks.misses) == (hits + 2, misses)
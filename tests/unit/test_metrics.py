@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the metrics module.
+"""
+import unittest
+
+from skill import metrics
+from skill.cache import Cache
+from skill.metrics import Counter, Histogram
+
+
+class MetricsTestCase(unittest.TestCase):
+    """
+    Test case for the Counter() and Histogram() classes.
+    """
+    def tearDown(self):
+        """
+        Removes the metrics created by a test.
+        """
+        for name in ('test_events_total', 'test_seconds'):
+            metrics.registry.pop(name, None)
+
+    def test_counter_counts_by_label(self):
+        """
+        Counter().inc() keeps a count per set of labels.
+        """
+        counter = Counter('test_events_total', 'Events.', labels=('kind',))
+        counter.inc(kind='a')
+        counter.inc(2, kind='a')
+        counter.inc(kind='b')
+
+        assert counter.value(kind='a') == 3
+        assert counter.value(kind='c') == 0
+
+    def test_histogram_buckets_are_cumulative(self):
+        """
+        Histogram().samples() reports cumulative buckets, sum and count.
+        """
+        histogram = Histogram('test_seconds', 'Durations.', buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value)
+
+        samples = {(name, labels): value for name, labels, value in histogram.samples()}
+        assert samples[('test_seconds_bucket', (('le', 0.1),))] == 1
+        assert samples[('test_seconds_bucket', (('le', 1),))] == 3
+        assert samples[('test_seconds_bucket', (('le', '+Inf'),))] == 4
+        assert samples[('test_seconds_sum', ())] == 6.05
+        assert histogram.count() == 4
+
+    def test_timer_observes_block(self):
+        """
+        Histogram().time() observes the duration of a block.
+        """
+        histogram = Histogram('test_seconds', 'Durations.', labels=('stage',))
+        with histogram.time(stage='find'):
+            pass
+
+        assert histogram.count(stage='find') == 1
+
+    def test_render_uses_prometheus_text_format(self):
+        """
+        render() writes HELP, TYPE and samples, including cache counters.
+        """
+        counter = Counter('test_events_total', 'Events.', labels=('kind',))
+        counter.inc(kind='say "hi"')
+        cache = Cache('test.metrics')
+        cache.get('missing')
+
+        text = metrics.render()
+        assert '# HELP test_events_total Events.\n# TYPE test_events_total counter\n' in text
+        assert 'test_events_total{kind="say \\"hi\\""} 1.0\n' in text
+        assert 'cache_misses_total{cache="test.metrics"} 1.0\n' in text
+        assert text.endswith('\n')
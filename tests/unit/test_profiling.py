@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the RequestProfiler class.
+"""
+import asyncio
+import unittest
+
+from skill.metrics import STAGE_SECONDS
+from skill.matcher import CoinMatcher
+from skill.profiling import RequestProfiler
+
+
+class StaticRequest:
+    """
+    Sanic request stand-in.
+    """
+    def __init__(self, headers=None, args=None):
+        self.headers = headers or {}
+        self.args = args or {}
+
+
+def slow_scan(text):
+    """
+    Function expected among the hottest ones.
+    """
+    total = 0
+    for _ in range(20000):
+        total += len(text)
+
+    return total
+
+
+class RequestProfilerTestCase(unittest.TestCase):
+    """
+    Test case for the RequestProfiler() class.
+    """
+    def setUp(self):
+        """
+        Creates an event loop for every test.
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_requests_need_the_token(self):
+        """
+        RequestProfiler().requested() accepts the token in a header or a query parameter.
+        """
+        profiler = RequestProfiler(token='secret')
+
+        assert profiler.requested(StaticRequest(headers={'x-profile': 'secret'}))
+        assert profiler.requested(StaticRequest(args={'profile': 'secret'}))
+        assert not profiler.requested(StaticRequest(headers={'x-profile': 'guess'}))
+        assert not profiler.requested(StaticRequest())
+        assert not RequestProfiler(token=None).requested(
+            StaticRequest(headers={'x-profile': 'secret'}))
+
+    def test_non_ascii_values_are_rejected(self):
+        """
+        RequestProfiler().requested() compares non-ASCII values without failing.
+        """
+        assert not RequestProfiler(token='secret').requested(StaticRequest(args={'profile': 'é'}))
+        assert RequestProfiler(token='clé').requested(StaticRequest(headers={'x-profile': 'clé'}))
+
+    def test_run_reports_stages_and_functions(self):
+        """
+        RequestProfiler().run() returns the result with stage times and hot functions.
+        """
+        async def detect():
+            with STAGE_SECONDS.time(stage='find'):
+                found = slow_scan('Bitcoin and Litecoin')
+            await asyncio.sleep(0.01)
+            return found
+
+        profiler = RequestProfiler(token='secret', top=5)
+        result, report = self.loop.run_until_complete(profiler.run(detect))
+
+        assert result == slow_scan('Bitcoin and Litecoin')
+        assert list(report['stages']) == ['find']
+        assert report['seconds'] >= report['stages']['find']
+        assert len(report['functions']) == 5
+        assert any('slow_scan' in f['function'] for f in report['functions'])
+
+    def test_other_tasks_are_not_traced(self):
+        """
+        RequestProfiler().run() only collects stages of the profiled task.
+        """
+        async def other():
+            with STAGE_SECONDS.time(stage='other'):
+                await asyncio.sleep(0.01)
+
+        async def detect():
+            await asyncio.sleep(0.02)
+
+        async def both():
+            profiler = RequestProfiler(token='secret')
+            _, (_, report) = await asyncio.gather(other(), profiler.run(detect))
+            return report
+
+        report = self.loop.run_until_complete(both())
+        assert report['stages'] == {}
+
+    def test_full_scans_show_the_automaton(self):
+        """
+        RequestProfiler().run() reports the automaton when a text seen before is scanned in full.
+        """
+        matcher = CoinMatcher(['Bitcoin', 'Litecoin'], ['BTC', 'LTC'], ['bitcoin', 'litecoin'])
+        text = '\n\n'.join(['Bitcoin is up and LTC is down.'] * 200)
+        matcher.find(text)
+
+        async def detect():
+            return matcher.find(text, incremental=False)
+
+        profiler = RequestProfiler(token='secret', top=10)
+        result, report = self.loop.run_until_complete(profiler.run(detect))
+
+        assert result == matcher.find(text)
+        assert any('finditer' in f['function'] for f in report['functions'])
@@ -0,0 +1,159 @@
+"""
+Tests for the Refresher class.
+"""
+import asyncio
+import unittest
+
+from skill.cache import Cache
+from skill.refresher import Refresher
+
+cached = Cache('test.refresher')
+
+
+class StaticAsyncCoinMarketCap:
+    """
+    Records the historic() calls made by the refresher.
+    """
+    def __init__(self):
+        self.calls = []
+
+    async def historic(self, coin, refresh_within=0):
+        self.calls.append((coin, refresh_within))
+        return f'{coin} series'
+
+
+class StaticChart:
+    """
+    Chart stand-in whose charts are cached
+    like the ones of Chart(). Backends in
+    `failing` render no chart.
+    """
+    renders = []
+
+    def __init__(self):
+        self.backend = 'plotly'
+        self.failing = set()
+
+    def key(self, coin, data, backend=None):
+        return cached.make_key('generate', (coin, data, backend or self.backend))
+
+    def ttl(self, coin, data, backend=None):
+        return cached.ttl(self.key(coin, data, backend))
+
+    def refresh(self, coin, data, backend=None):
+        backend = backend or self.backend
+        StaticChart.renders.append(backend)
+        url = None if backend in self.failing else f'http://example.com/{coin}.{backend}'
+        cached.set(self.key(coin, data, backend), url, max_age=60 if url is None else 60*60)
+        return url
+
+    def generate(self, coin, data, backend=None):
+        return cached.get(self.key(coin, data, backend))
+
+
+class StaticSkill:
+    """
+    Crypto() stand-in.
+    """
+    def __init__(self):
+        self.async_coin_market_cap = StaticAsyncCoinMarketCap()
+        self.chart = StaticChart()
+
+
+class RefresherTestCase(unittest.TestCase):
+    """
+    Test case for the Refresher() class.
+    """
+    def setUp(self):
+        """
+        Creates a refresher of a stand-in skill.
+        """
+        cached.clear()
+        StaticChart.renders = []
+        self.skill = StaticSkill()
+        self.refresher = Refresher(self.skill, top=2, interval=60, margin=600)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def track(self, *coins):
+        self.refresher.track([{'id': c, 'name': c.title()} for c in coins])
+
+    def test_hot_returns_most_requested_coins(self):
+        """
+        Refresher().hot() returns the most requested coins.
+        """
+        self.track('bitcoin', 'litecoin')
+        self.track('bitcoin', 'ethereum')
+        self.track('ethereum')
+
+        assert self.refresher.hot() == ['bitcoin', 'ethereum']
+
+    def test_refresh_warms_hot_coins(self):
+        """
+        Refresher().refresh() fetches prices and renders charts of hot coins.
+        """
+        self.track('bitcoin', 'bitcoin', 'litecoin')
+        self.loop.run_until_complete(self.refresher.refresh())
+
+        assert self.skill.async_coin_market_cap.calls == [('bitcoin', 600), ('litecoin', 600)]
+        assert StaticChart.renders == ['plotly', 'plotly']
+        assert self.skill.chart.ttl(coin='Bitcoin', data='bitcoin series') > 600
+
+    def test_refresh_skips_charts_far_from_expiry(self):
+        """
+        Refresher().refresh() only renders charts that are about to expire.
+        """
+        self.track('bitcoin')
+        self.loop.run_until_complete(self.refresher.refresh())
+        self.loop.run_until_complete(self.refresher.refresh())
+        assert StaticChart.renders == ['plotly']
+
+        key = self.skill.chart.key('Bitcoin', 'bitcoin series')
+        cached.set(key, 'http://example.com/old.png', max_age=60)
+        self.loop.run_until_complete(self.refresher.refresh())
+        assert StaticChart.renders == ['plotly', 'plotly']
+
+    def test_refresh_keeps_fallback_charts_warm(self):
+        """
+        Refresher().refresh() renders image charts when the default backend fails.
+        """
+        self.skill.chart.failing.add('plotly')
+        self.track('bitcoin')
+        self.loop.run_until_complete(self.refresher.refresh())
+        assert StaticChart.renders == ['plotly', 'image']
+
+        key = self.skill.chart.key('Bitcoin', 'bitcoin series', 'image')
+        cached.set(key, 'http://example.com/old.png', max_age=60)
+        self.loop.run_until_complete(self.refresher.refresh())
+        assert StaticChart.renders == ['plotly', 'image', 'plotly', 'image']
+
+        self.skill.chart.failing.clear()
+        self.loop.run_until_complete(self.refresher.refresh())
+        self.loop.run_until_complete(self.refresher.refresh())
+        assert StaticChart.renders[4:] == ['plotly']
+
+    def test_request_counts_decay(self):
+        """
+        Refresher().refresh() forgets coins that stop being requested.
+        """
+        refresher = Refresher(self.skill, top=2, interval=60, margin=600, decay=0.5)
+        refresher.track([{'id': 'bitcoin', 'name': 'Bitcoin'}])
+        for _ in range(3):
+            self.loop.run_until_complete(refresher.refresh())
+        assert refresher.hot() == ['bitcoin']
+
+        self.loop.run_until_complete(refresher.refresh())
+        assert refresher.hot() == []
+
+    def test_start_and_stop(self):
+        """
+        Refresher().start() schedules runs that stop() cancels.
+        """
+        self.refresher.start(self.loop)
+        assert len(self.refresher.scheduler.jobs) == 1
+
+        self.loop.run_until_complete(self.refresher.stop())
+        assert self.refresher.scheduler.jobs == []
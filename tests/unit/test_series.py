@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the PriceSeries class.
+"""
+import unittest
+import numpy as np
+
+from skill.series import PriceSeries
+from tests.data import plot_data
+
+
+class PriceSeriesTestCase(unittest.TestCase):
+    """
+    Test case for the PriceSeries() class.
+    """
+    @classmethod
+    def setUpClass(cls):
+        """
+        Method that instantiates the test case.
+        """
+        cls.records = [
+            {'date': '2018-07-02', 'open': 2.0, 'high': 3.0, 'low': 1.0,
+             'close': 2.5, 'volume': None, 'market_cap': 10.0},
+            {'date': '2018-07-01', 'open': 1.0, 'high': 2.0, 'low': 0.5,
+             'close': 1.5, 'volume': 100.0, 'market_cap': 9.0}
+        ]
+        cls.series = PriceSeries.from_records(cls.records)
+
+    def test_columns_are_typed_arrays(self):
+        """
+        PriceSeries() stores datetime64 dates and float64 values.
+        """
+        assert self.series.date.dtype == np.dtype('datetime64[D]')
+        assert self.series.close.dtype == np.dtype('float64')
+
+    def test_records_are_sorted_by_date(self):
+        """
+        PriceSeries.from_records() sorts records in ascending date order.
+        """
+        assert self.series.dates_as_strings() == ['2018-07-01', '2018-07-02']
+        assert list(self.series) == self.records[::-1]
+
+    def test_to_dict_is_json_serializable(self):
+        """
+        PriceSeries().to_dict() returns lists with ISO dates and None for missing values.
+        """
+        result = self.series.to_dict(columns=('close', 'volume'))
+
+        assert result == {
+            'date': ['2018-07-01', '2018-07-02'],
+            'close': [1.5, 2.5],
+            'volume': [100.0, None]
+        }
+
+    def test_from_dict_accepts_chart_data(self):
+        """
+        PriceSeries.from_dict() accepts the dictionaries used by Chart().
+        """
+        series = PriceSeries.from_dict(plot_data)
+
+        assert len(series) == len(plot_data['date'])
+        assert series.start == min(plot_data['date']).date()
+        assert series.stop == max(plot_data['date']).date()
+
+    def test_repr_depends_on_content(self):
+        """
+        PriceSeries() representations are equal only for equal content.
+        """
+        same = PriceSeries.from_records(self.records)
+        other = PriceSeries.from_records(self.records[:1])
+
+        assert repr(same) == repr(self.series)
+        assert repr(other) != repr(self.series)
@@ -3,11 +3,14 @@
 Tests for the Crypto class.
 """
 import os 
+import asyncio
 import plotly
 import unittest
 from isoweek import Week
 from skill.skill import Crypto
-from tests.data import article_data
+from skill.matcher import CoinMatcher
+from skill.series import PriceSeries
+from tests.data import article_data, plot_data
 
 
 class CryptoTestCase(unittest.TestCase):
@@ -80,3 +83,138 @@ class CryptoTestCase(unittest.TestCase):
 
         results = self.skill.text(text=article_data, limit=1)
         assert len(results) == 1
+
+    def test_batch_matches_text(self):
+        """
+        Crypto().batch() returns the same results as Crypto().text() for each document.
+        """
+        documents = [
+            {'id': 1, 'text': article_data, 'limit': 2},
+            {'id': 2, 'text': 'bitcoin BTC'}
+        ]
+        results = self.skill.batch(documents)
+
+        assert sorted(results.keys()) == [1, 2]
+        for document in documents:
+            expected = self.skill.text(text=document['text'], limit=document.get('limit', 3))
+            assert [r['id'] for r in results[document['id']]] == [r['id'] for r in expected]
+
+    def test_batch_async_matches_batch(self):
+        """
+        Crypto().batch_async() returns the same coins as Crypto().batch().
+        """
+        documents = [
+            {'id': 1, 'text': article_data, 'limit': 2},
+            {'id': 2, 'text': 'bitcoin BTC'},
+            {'id': 3, 'text': 'Nothing to see here.'}
+        ]
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(self.skill.batch_async(documents))
+            loop.run_until_complete(self.skill.async_coin_market_cap.close())
+        finally:
+            loop.close()
+
+        expected = self.skill.batch(documents)
+        assert list(results.keys()) == [1, 2, 3]
+        for document in documents:
+            assert [r['id'] for r in results[document['id']]] == \
+                [r['id'] for r in expected[document['id']]]
+
+
+class StaticAsyncCoinMarketCap:
+    """
+    AsyncCoinMarketCap() stand-in whose requests
+    time out for the coins in `failing` and never
+    finish for the coins in `hanging`.
+    """
+    def __init__(self, failing=(), hanging=()):
+        self.failing = set(failing)
+        self.hanging = set(hanging)
+
+    async def historic(self, coin):
+        await asyncio.sleep(0)
+        if coin in self.failing:
+            raise asyncio.TimeoutError()
+        if coin in self.hanging:
+            await asyncio.Event().wait()
+
+        return PriceSeries.from_dict(plot_data)
+
+
+class StaticChart:
+    """
+    Chart() stand-in.
+    """
+    async def generate_async(self, coin, data, backend=None):
+        return f'http://example.com/{coin}.png'
+
+    def generate_title(self, coin, data):
+        return f'{coin} Closing Prices'
+
+
+class UnavailableCoinTestCase(unittest.TestCase):
+    """
+    Test case for coins whose prices can't be collected.
+    """
+    def setUp(self):
+        """
+        Creates a skill without network access whose
+        requests for Litecoin time out.
+        """
+        self.skill = Crypto.__new__(Crypto)
+        self.skill.charting_backend = 'static'
+        self.skill.matcher = CoinMatcher(
+            ['Bitcoin', 'Litecoin'], ['BTC', 'LTC'], ['bitcoin', 'litecoin'])
+        self.skill.async_coin_market_cap = StaticAsyncCoinMarketCap(failing={'litecoin'})
+        self.skill.chart = StaticChart()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_text_async_leaves_out_unavailable_coins(self):
+        """
+        Crypto().text_async() returns the other coins when one coin fails.
+        """
+        results = self.loop.run_until_complete(
+            self.skill.text_async('Bitcoin and Litecoin.', limit=3))
+
+        assert [r['id'] for r in results] == ['bitcoin']
+        assert results[0]['chart']['url'] == 'http://example.com/Bitcoin.png'
+
+    def test_batch_async_leaves_out_unavailable_coins(self):
+        """
+        Crypto().batch_async() returns every document when one coin fails.
+        """
+        documents = [
+            {'id': 'a', 'text': 'Litecoin is down.'},
+            {'id': 'b', 'text': 'Bitcoin and Litecoin are up.'}
+        ]
+        results = self.loop.run_until_complete(self.skill.batch_async(documents))
+
+        assert list(results) == ['a', 'b']
+        assert results['a'] == []
+        assert [r['id'] for r in results['b']] == ['bitcoin']
+        assert results['b'][0]['chart']['url'] == 'http://example.com/Bitcoin.png'
+
+    def test_batch_documents_do_not_wait_for_other_coins(self):
+        """
+        Crypto().iter_batch_async() yields a document before coins of later ones are ready.
+        """
+        self.skill.async_coin_market_cap = StaticAsyncCoinMarketCap(hanging={'litecoin'})
+        documents = [
+            {'id': 'a', 'text': 'Bitcoin is up.'},
+            {'id': 'b', 'text': 'Litecoin is down.'}
+        ]
+
+        async def first():
+            batch = self.skill.iter_batch_async(documents)
+            try:
+                return await asyncio.wait_for(batch.__anext__(), timeout=1)
+            finally:
+                await batch.aclose()
+
+        document_id, results = self.loop.run_until_complete(first())
+        assert document_id == 'a'
+        assert [r['id'] for r in results] == ['bitcoin']
@@ -0,0 +1,41 @@
+"""
+Tests for the SpanMetrics class.
+"""
+import unittest
+
+from skill.utils import SpanMetrics
+
+
+class SpanMetricsTestCase(unittest.TestCase):
+    """
+    Test case for the SpanMetrics() class.
+    """
+    def test_spans_include_names_and_symbols(self):
+        """
+        SpanMetrics.spans() extracts name and symbol spans.
+        """
+        results = [
+            {'cryptocurrency': 'bitcoin', 'findings': [
+                {'name_start': 0, 'name_end': 7},
+                {'name_start': 8, 'name_end': 11}
+            ]},
+            {'cryptocurrency': 'litecoin', 'findings': [
+                {'symbol_start': 12, 'symbol_end': 15}
+            ]}
+        ]
+        assert SpanMetrics.spans(results) == {
+            ('bitcoin', 0, 7), ('bitcoin', 8, 11), ('litecoin', 12, 15)
+        }
+
+    def test_precision_recall_returns_correct_numbers(self):
+        """
+        SpanMetrics.precision_recall() returns correct fractions.
+        """
+        predicted = [{('bitcoin', 0, 7), ('bitcoin', 8, 11)}, set(), {('ark', 0, 3)}]
+        expected = [{('bitcoin', 0, 7)}, {('litecoin', 0, 8)}, set()]
+
+        precision, recall, f1 = SpanMetrics.precision_recall(predicted, expected)
+
+        self.assertAlmostEqual(precision, 1 / 3)
+        self.assertAlmostEqual(recall, 1 / 2)
+        self.assertAlmostEqual(f1, 0.4)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the PriceStore class.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from datetime import date, timedelta
+from skill.store import PriceStore
+from skill.series import PriceSeries
+
+
+def make_series(start, days):
+    """
+    Creates a series with one record per day.
+    """
+    records = [{
+        'date': (start + timedelta(days=i)).isoformat(),
+        'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': float(i),
+        'volume': None, 'market_cap': 10.0
+    } for i in range(days)]
+    return PriceSeries.from_records(records)
+
+
+class PriceStoreTestCase(unittest.TestCase):
+    """
+    Test case for the PriceStore() class.
+    """
+    def setUp(self):
+        """
+        Creates a store in a temporary directory.
+        """
+        self.directory = tempfile.mkdtemp()
+        self.store = PriceStore(path=os.path.join(self.directory, 'prices.sqlite'))
+
+    def tearDown(self):
+        """
+        Removes the temporary store.
+        """
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_empty_store_misses_full_range(self):
+        """
+        PriceStore().missing() returns the full range for unknown coins.
+        """
+        start, stop = date(2018, 1, 1), date(2018, 1, 31)
+        assert self.store.missing('bitcoin', start, stop) == [(start, stop)]
+
+    def test_only_new_days_are_missing(self):
+        """
+        PriceStore().missing() only returns days outside the stored range.
+        """
+        start = date(2018, 1, 10)
+        self.store.save('bitcoin', make_series(start, 10), start, date(2018, 1, 19))
+
+        assert self.store.missing('bitcoin', date(2018, 1, 12), date(2018, 1, 15)) == []
+        assert self.store.missing('bitcoin', date(2018, 1, 1), date(2018, 1, 25)) == [
+            (date(2018, 1, 1), date(2018, 1, 9)),
+            (date(2018, 1, 19), date(2018, 1, 25))
+        ]
+
+    def test_load_returns_stored_range(self):
+        """
+        PriceStore().load() returns stored records within a range, across connections.
+        """
+        start = date(2018, 1, 1)
+        self.store.save('bitcoin', make_series(start, 10), start, date(2018, 1, 10))
+        self.store.close()
+
+        store = PriceStore(path=self.store.path)
+        series = store.load('bitcoin', date(2018, 1, 3), date(2018, 1, 5))
+        store.close()
+
+        assert series.dates_as_strings() == ['2018-01-03', '2018-01-04', '2018-01-05']
+        assert series.close.tolist() == [2.0, 3.0, 4.0]
+        assert list(series)[0]['volume'] is None